@@ -0,0 +1,250 @@
+"""
+Local cache of everything an installation downloads, so reinstalls and further machines are served from disk.
+
+Layout of the cache folder (which may be a shared network folder used by several machines):
+
+    objects/ab/ab12...    Downloads by SHA-256 of their content (the worker archive, worker files)
+    refs/<hash of key>    Small JSON file per key (URL or name) naming its current object, size and ETag/date
+    pacman/               Package cache handed to pacman with --cachedir
+    wheels/               Wheelhouse pip installs from with --find-links
+
+Nothing is ever modified in place: objects are written to a temporary name and renamed, refs are replaced
+atomically, so machines sharing the folder need no locking. The total size is kept under a cap by
+deleting the least recently used files; a hit refreshes the modification time of its file.
+
+    python artifact_cache.py [--dir DIR] stats | evict | fetch URL
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from common import ARTIFACT_CACHE_DIR
+
+# --- Constants ---
+MAX_BYTES = 4 * 1024 * 1024 * 1024     # Default size cap of the whole cache
+CHUNK_BYTES = 1024 * 1024
+HTTP_TIMEOUT_SECONDS = 30
+TMP_MAX_AGE_SECONDS = 24 * 3600        # Temporary files older than this were left by a crashed download
+WORKER_ARCHIVE_URL = "https://github.com/official-stockfish/fishtest/archive/master.zip"
+AREAS = ("objects", "pacman", "wheels")  # Folders whose files count against the cap
+
+
+class ArtifactCache:
+    """ Content-addressed download cache with a size cap and least-recently-used eviction. """
+
+    def __init__(self, root=ARTIFACT_CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def pacman_dir(self):
+        return os.path.join(self.root, "pacman")
+
+    @property
+    def wheel_dir(self):
+        return os.path.join(self.root, "wheels")
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _ref_path(self, key):
+        return os.path.join(self.root, "refs", hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def ensure_dirs(self):
+        for name in AREAS + ("refs",):
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+
+    # --- Lookup and storage ---
+    def _read_ref(self, key):
+        try:
+            with open(self._ref_path(key), encoding="utf-8") as f:
+                ref = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return ref if ref.get("key") == key else None
+
+    def _write_ref(self, key, digest, size, validators=None):
+        path = self._ref_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "sha256": digest, "size": size, "stored_at": time.time(), **(validators or {})}, f)
+        os.replace(tmp_path, path)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # A read-only share still serves hits; the file just ages as if unused
+
+    def get(self, key):
+        """ Path of the cached object for a key, or None. Counts as a use for the eviction order. """
+        ref = self._read_ref(key)
+        path = ref and self.object_path(ref["sha256"])
+        if path and os.path.isfile(path):
+            self._touch(path)
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def _store(self, key, chunks, validators=None):
+        """ Writes an iterable of byte chunks as an object, points the key at it and returns its path. """
+        self.ensure_dirs()
+        tmp_path = os.path.join(self.root, "objects", f"{os.getpid()}-{time.monotonic_ns()}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            path = self.object_path(digest.hexdigest())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Same content, same name: whichever machine renames last wins, and both wrote identical bytes
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._write_ref(key, digest.hexdigest(), size, validators)
+        return path
+
+    def put_bytes(self, key, data):
+        return self._store(key, [data])
+
+    def put_file(self, key, source_path):
+        with open(source_path, "rb") as f:
+            return self._store(key, iter(lambda: f.read(CHUNK_BYTES), b""))
+
+    def fetch(self, url, on_progress=lambda message: None):
+        """
+        Returns a local path with the content of `url`. A cached copy is revalidated (ETag or date), so an
+        unchanged file is not downloaded again; without a connection the cached copy is used as is.
+        Raises OSError if the URL cannot be downloaded and was never cached.
+        """
+        import urllib.error
+        import urllib.request
+        ref = self._read_ref(url)
+        cached = ref and self.object_path(ref["sha256"])
+        if cached and not os.path.isfile(cached):
+            cached = None
+        headers = {"User-Agent": "fishtest-worker-gui"}
+        if cached and ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        if cached and ref.get("last_modified"):
+            headers["If-Modified-Since"] = ref["last_modified"]
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=HTTP_TIMEOUT_SECONDS) as response:
+                on_progress(f"Downloading {url}")
+                validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+                path = self._store(url, iter(lambda: response.read(CHUNK_BYTES), b""), validators)
+                self.misses += 1
+                return path
+        except urllib.error.HTTPError as e:
+            if not cached:
+                raise
+            on_progress(f"Using the cached copy of {url} ({'unchanged' if e.code == 304 else f'HTTP {e.code}'})")
+        except OSError as e:
+            if not cached:
+                raise
+            on_progress(f"Using the cached copy of {url} (offline: {getattr(e, 'reason', e)})")
+        self._touch(cached)
+        self.hits += 1
+        return cached
+
+    # --- Size cap ---
+    def _files(self):
+        """ (mtime, size, path) of every cached file, and the temporary files left by crashed writers. """
+        files, stale = [], []
+        now = time.time()
+        for area in AREAS:
+            for folder, _, names in os.walk(os.path.join(self.root, area)):
+                for name in names:
+                    path = os.path.join(folder, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue  # Removed by another machine meanwhile
+                    if name.endswith((".tmp", ".part")):
+                        if now - stat.st_mtime > TMP_MAX_AGE_SECONDS:
+                            stale.append(path)
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files, stale
+
+    def usage(self):
+        """ (total bytes, number of files) currently in the cache. """
+        files, _ = self._files()
+        return sum(size for _, size, _ in files), len(files)
+
+    def evict(self):
+        """ Deletes least recently used files until the cache fits its cap. Returns (files, bytes) deleted. """
+        files, stale = self._files()
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total = sum(size for _, size, _ in files)
+        deleted = freed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # In use (pacman, another machine) or already gone
+            total -= size
+            deleted += 1
+            freed += size
+        if deleted:
+            self._prune_refs()
+        return deleted, freed
+
+    def _prune_refs(self):
+        """ Removes refs whose object was evicted. """
+        refs_dir = os.path.join(self.root, "refs")
+        for name in os.listdir(refs_dir) if os.path.isdir(refs_dir) else []:
+            path = os.path.join(refs_dir, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    digest = json.load(f)["sha256"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if not os.path.isfile(self.object_path(digest)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or maintain the download cache.")
+    parser.add_argument("--dir", default=ARTIFACT_CACHE_DIR, help="Cache folder (default: %(default)s)")
+    parser.add_argument("--max-gb", type=float, default=MAX_BYTES / 1024 ** 3, help="Size cap used by 'evict'")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show the size of the cache")
+    commands.add_parser("evict", help="Delete least recently used files beyond the size cap")
+    fetch_parser = commands.add_parser("fetch", help="Download a URL into the cache (e.g. to prepare a shared cache)")
+    fetch_parser.add_argument("url", nargs="?", default=WORKER_ARCHIVE_URL)
+    args = parser.parse_args()
+
+    cache = ArtifactCache(args.dir, int(args.max_gb * 1024 ** 3))
+    if args.command == "fetch":
+        print(cache.fetch(args.url, on_progress=print))
+    elif args.command == "evict":
+        deleted, freed = cache.evict()
+        print(f"Deleted {deleted} files ({freed / 1024 ** 2:.1f} MiB)")
+    total, count = cache.usage()
+    print(f"{args.dir}: {count} files, {total / 1024 ** 2:.1f} MiB of {cache.max_bytes / 1024 ** 3:g} GiB")
+
+
+if __name__ == "__main__":
+    main()
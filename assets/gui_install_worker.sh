@@ -1,73 +1,84 @@
 #!/bin/bash
-# NON-INTERACTIVE fishtest worker installer for GUI use
+# NON-INTERACTIVE fishtest worker installer stages for GUI use
+#
+# The manager runs each stage as one step of its install pipeline (see installer.py), so that steps
+# that do not depend on each other overlap and a failed installation resumes at the failed step:
+#   gui_install_worker.sh packages [CACHE_DIR]          Update MSYS2 and install the build tools (from the app folder)
+#   gui_install_worker.sh venv [CACHE_DIR]              Create the Python environment (from the new worker folder)
+#   gui_install_worker.sh config USER PASSWORD CORES    Write fishtest.cfg (from the new worker folder)
+# CACHE_DIR is the manager's download cache (MSYS2 path); it keeps packages and wheels for reinstalls.
 
-# Arguments from the GUI
-usr_name="$1"
-usr_pwd="$2"
-n_cores="$3"
+stage="$1"
 
-echo "--- Starting non-interactive worker installation ---"
-echo "Username: $usr_name"
+case "$stage" in
+packages)
+    cache_dir="$2"
+    pacman_cache_args=()
+    if [ -n "$cache_dir" ]; then
+        echo "Download cache: $cache_dir"
+        mkdir -p "$cache_dir/pacman"
+        pacman_cache_args=(--cachedir "$cache_dir/pacman")
+    fi
 
-# n_cores should be a positive integer
-# but if we are reinstalling it might contain a string like "2 ; = 2 cores"
-# so we extract the first integer from it
-n_cores=$(echo "$n_cores" | grep -oE '[0-9]+' | head -n 1)
-# if n_cores is empty or not a number, default to 1
-if ! [[ "$n_cores" =~ ^[0-9]+$ ]]; then
-    echo "Invalid number of cores specified. Defaulting to 1 core."
-    n_cores=1
-fi
-echo "Cores: $n_cores"
+    echo "--- Updating system and installing required packages ---"
+    pacman -Syuu --noconfirm "${pacman_cache_args[@]}"
+    pacman -S --noconfirm --needed "${pacman_cache_args[@]}" unzip make mingw-w64-ucrt-x86_64-gcc mingw-w64-ucrt-x86_64-python || exit 1
 
-# 1. Update system and install essential packages
-echo "--- Updating system and installing required packages ---"
-pacman -Syuu --noconfirm
-pacman -S --noconfirm --needed unzip make mingw-w64-ucrt-x86_64-gcc mingw-w64-ucrt-x86_64-python
+    # With a download cache the packages are kept there (the manager caps its size) for the next install
+    if [ -z "$cache_dir" ]; then
+        echo "--- Cleaning package cache to save disk space ---"
+        pacman -Scc --noconfirm
+    fi
+    ;;
 
-echo "--- Cleaning package cache to save disk space ---"
-pacman -Scc --noconfirm
+venv)
+    cache_dir="$2"
+    echo "--- Setting up Python virtual environment ---"
+    rm -rf env
+    python3 -m venv "env" || exit 1
+    if [ -n "$cache_dir" ]; then
+        # Refresh the cached wheels when online, then install only from them, so offline reinstalls work too
+        mkdir -p "$cache_dir/wheels"
+        env/bin/python3 -m pip download -q --retries 1 --timeout 15 -d "$cache_dir/wheels" pip setuptools wheel requests \
+            || echo "Could not refresh the cached wheels; installing from the cache"
+        env/bin/python3 -m pip install -q --upgrade --no-index --find-links "$cache_dir/wheels" pip setuptools wheel || exit 1
+        env/bin/python3 -m pip install -q --no-index --find-links "$cache_dir/wheels" requests || exit 1
+    else
+        env/bin/python3 -m pip install -q --upgrade pip setuptools wheel || exit 1
+        env/bin/python3 -m pip install -q requests || exit 1
+    fi
+    ;;
 
-# 2. Delete old worker directory to ensure a clean slate
-echo "--- Removing old worker directory if it exists ---"
-rm -rf worker
+config)
+    usr_name="$2"
+    usr_pwd="$3"
+    n_cores="$4"
+    echo "Username: $usr_name"
 
-# 3. Download and extract the fishtest worker
-echo "--- Downloading and extracting fishtest worker ---"
-tmp_dir=___${RANDOM}
-mkdir ${tmp_dir} && pushd ${tmp_dir} > /dev/null
-wget https://github.com/official-stockfish/fishtest/archive/master.zip
-unzip -q master.zip "fishtest-master/worker/**" # -q for quiet
-pushd fishtest-master/worker > /dev/null
+    # n_cores should be a positive integer
+    # but if we are reinstalling it might contain a string like "2 ; = 2 cores"
+    # so we extract the first integer from it
+    n_cores=$(echo "$n_cores" | grep -oE '[0-9]+' | head -n 1)
+    # if n_cores is empty or not a number, default to 1
+    if ! [[ "$n_cores" =~ ^[0-9]+$ ]]; then
+        echo "Invalid number of cores specified. Defaulting to 1 core."
+        n_cores=1
+    fi
+    echo "Cores: $n_cores"
 
-# 4. Setup a virtual environment and install dependencies
-echo "--- Setting up Python virtual environment ---"
-python3 -m venv "env"
-env/bin/python3 -m pip install -q --upgrade pip setuptools wheel
-env/bin/python3 -m pip install -q requests
+    # Write fishtest.cfg using the worker's own logic
+    echo "--- Generating fishtest.cfg ---"
+    env/bin/python3 worker.py "$usr_name" "$usr_pwd" --concurrency "$n_cores" --only_config --no_validation
+    if [ $? -eq 0 ]; then
+        echo "Successfully created fishtest.cfg"
+    else
+        echo "Error: Failed to create fishtest.cfg"
+        exit 1
+    fi
+    ;;
 
-# 5. Write fishtest.cfg using the worker's own logic
-echo "--- Generating fishtest.cfg ---"
-env/bin/python3 worker.py "$usr_name" "$usr_pwd" --concurrency "$n_cores" --only_config --no_validation
-if [ $? -eq 0 ]; then
-    echo "Successfully created fishtest.cfg"
-else
-    echo "Error: Failed to create fishtest.cfg"
-    exit 1
-fi
-
-# 6. Create the fishtest.cmd launcher
-cat << EOF > fishtest.cmd
-@echo off
-set "HERE=%~dp0"
-set "PATH=C:\msys64\ucrt64\bin;C:\msys64\usr\bin;%PATH%"
-cd /d "%HERE%"
-env\\bin\\python3.exe worker.py
-EOF
-
-echo "--- Finalizing installation ---"
-popd > /dev/null && popd > /dev/null
-mv $tmp_dir/fishtest-master/worker .
-rm -rf $tmp_dir
-
-echo "--- Installation complete! ---"
\ No newline at end of file
+*)
+    echo "Unknown installation stage: '$stage'"
+    exit 2
+    ;;
+esac
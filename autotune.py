@@ -0,0 +1,146 @@
+"""
+Finds the concurrency that gives the most engine throughput on this machine.
+
+The installed engine's `bench` is run as N single-threaded processes at once, for a few values of N. More
+processes raise the total nodes/second until cores, SMT siblings or memory bandwidth are saturated; past
+that point each process slows down. The recommendation is the N with the highest total nps whose
+per-process nps stays above MIN_PER_THREAD_RATIO of a lone process, so games keep a fair time control.
+
+Results are cached per machine and engine in AUTOTUNE_CACHE_FILE.
+"""
+import glob
+import hashlib
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+
+from common import AUTOTUNE_CACHE_FILE
+
+# --- Constants ---
+MIN_PER_THREAD_RATIO = 0.65      # Slowest acceptable per-process nps, relative to a single process
+BENCH_ARGS = ("bench", "16", "1", "13", "default", "depth")   # Hash MB, threads, depth, positions, limit type
+BENCH_TIMEOUT_SECONDS = 600
+NPS_PATTERN = re.compile(r"Nodes/second\s*:\s*(\d+)")
+
+
+def find_engine(worker_dir):
+    """ Returns the most recently built engine in the worker's testing folder, or None. """
+    candidates = [path for path in glob.glob(os.path.join(worker_dir, "testing", "stockfish*"))
+                  if os.path.isfile(path) and not path.endswith((".nnue", ".txt", ".log"))]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def cpu_counts():
+    """ (logical, physical) CPU counts. Physical falls back to logical without psutil. """
+    logical = os.cpu_count() or 1
+    try:
+        import psutil
+        physical = psutil.cpu_count(logical=False) or logical
+    except ImportError:
+        physical = logical
+    return logical, physical
+
+
+def max_concurrency(logical):
+    """ The fishtest worker wants one CPU left for the system and the worker itself. """
+    return max(1, logical - 1)
+
+
+def concurrency_levels(logical, physical):
+    """ Concurrency values worth measuring: 1, a quarter, half, physical cores and the maximum. """
+    limit = max_concurrency(logical)
+    levels = {1, logical // 4, logical // 2, physical, limit}
+    return sorted(level for level in levels if 1 <= level <= limit)
+
+
+def machine_fingerprint(engine):
+    """ Identifies the machine and engine build a result is valid for. """
+    logical, physical = cpu_counts()
+    stat = os.stat(engine)
+    key = "|".join(map(str, (platform.node(), platform.processor(), platform.machine(),
+                              logical, physical, os.path.basename(engine), stat.st_size)))
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def load_cached(fingerprint, cache_file=AUTOTUNE_CACHE_FILE):
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            return json.load(f).get(fingerprint)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached(result, cache_file=AUTOTUNE_CACHE_FILE):
+    """ Stores a result under its fingerprint, next to results of other machines sharing the folder. """
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[result["fingerprint"]] = result
+    with open(cache_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=1)
+    os.replace(cache_file + ".tmp", cache_file)
+
+
+def run_bench(engine, processes):
+    """ Runs `processes` benches at once. Returns the nps of each. Raises RuntimeError if one fails. """
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    procs = [subprocess.Popen([engine, *BENCH_ARGS], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              stdin=subprocess.DEVNULL, cwd=os.path.dirname(engine), creationflags=creationflags)
+             for _ in range(processes)]
+    results = []
+    try:
+        for proc in procs:
+            output = proc.communicate(timeout=BENCH_TIMEOUT_SECONDS)[0].decode(errors="replace")
+            match = NPS_PATTERN.search(output)
+            if proc.returncode != 0 or not match:
+                raise RuntimeError(f"bench failed (exit code {proc.returncode}): {output.strip()[-200:]}")
+            results.append(int(match.group(1)))
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+    return results
+
+
+def recommend(levels, ratio=MIN_PER_THREAD_RATIO):
+    """ Picks the concurrency with the best total nps among levels whose per-process nps is acceptable. """
+    single = next(level["per_thread_nps"] for level in levels if level["concurrency"] == 1)
+    acceptable = [level for level in levels if level["per_thread_nps"] >= ratio * single]
+    return max(acceptable, key=lambda level: level["total_nps"])["concurrency"]
+
+
+def tune(engine, on_progress=lambda message: None, ratio=MIN_PER_THREAD_RATIO):
+    """ Benchmarks the engine at each concurrency level and returns the result dict (also cached). """
+    logical, physical = cpu_counts()
+    levels = []
+    for concurrency in concurrency_levels(logical, physical):
+        on_progress(f"Running {concurrency} bench process(es) at once...")
+        started = time.monotonic()
+        nps = run_bench(engine, concurrency)
+        level = {
+            "concurrency": concurrency,
+            "total_nps": sum(nps),
+            "per_thread_nps": min(nps),
+            "seconds": round(time.monotonic() - started, 1),
+        }
+        levels.append(level)
+        on_progress(f"Concurrency {concurrency}: {level['total_nps'] / 1e6:.2f} Mnps total, "
+                    f"{level['per_thread_nps'] / 1e6:.2f} Mnps per process (slowest)")
+
+    result = {
+        "fingerprint": machine_fingerprint(engine),
+        "engine": engine,
+        "logical_cpus": logical,
+        "physical_cpus": physical,
+        "threshold": ratio,
+        "levels": levels,
+        "recommended": recommend(levels, ratio),
+        "created_at": time.time(),
+    }
+    save_cached(result)
+    return result
@@ -0,0 +1,114 @@
+"""
+Benchmark of the control API (control_api.py): what polling the status costs, and how long an action
+waits for the state thread.
+
+A ControlServer serves --instances supervisors whose status is republished every --publish seconds,
+like the supervisor does on worker events. The main thread plays the state thread: it drains the
+CallQueue once per 16 ms frame, as the Tk window does. A client in another process then
+
+    status    polls GET /status over one keep-alive connection for --seconds
+    actions   sends POST /stop (the workers are not running, so nothing happens) --actions times
+
+and reports requests/s and latency percentiles. Reads must not post anything to the state thread.
+
+Usage: python benchmarks/bench_control_api.py [--instances N] [--seconds S] [--actions N] [--publish S]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import control_api  # noqa: E402
+import log_ingest  # noqa: E402
+import supervisor  # noqa: E402
+
+FRAME_SECONDS = 0.016   # gui.UI_FRAME_MS
+TOKEN = "bench"
+
+CLIENT = r"""
+import http.client, json, sys, time
+port, path, method, seconds, count = int(sys.argv[1]), sys.argv[2], sys.argv[3], float(sys.argv[4]), int(sys.argv[5])
+connection = http.client.HTTPConnection("127.0.0.1", port)
+headers = {"Authorization": "Bearer bench"}
+latencies = []
+deadline = time.perf_counter() + seconds
+while time.perf_counter() < deadline if seconds else len(latencies) < count:
+    t0 = time.perf_counter()
+    connection.request(method, path, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    latencies.append(time.perf_counter() - t0)
+    assert response.status == 200, response.status
+latencies.sort()
+print(json.dumps([len(latencies), sum(latencies), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]]))
+"""
+
+
+class Manager(list):
+    """ The part of an InstanceManager the server uses. """
+
+    def __init__(self, cores, calls):
+        super().__init__(cores)
+        self.calls = calls
+        self.started = {core.name for core in cores}
+
+
+def run_client(port, path, method, seconds, count, manager, publish):
+    client = subprocess.Popen([sys.executable, "-c", CLIENT, str(port), path, method, str(seconds), str(count)],
+                              stdout=subprocess.PIPE)
+    drained = 0
+    next_publish = time.perf_counter() + publish
+    while client.poll() is None:
+        drained += manager.calls.drain(1000)
+        time.sleep(FRAME_SECONDS)
+        if time.perf_counter() >= next_publish:
+            next_publish += publish
+            for core in manager:
+                core.metrics.publish(core.status())
+    # The client only prints a summary at the end, so its pipe cannot fill up while it runs
+    summary = json.loads(client.stdout.read())
+    client.stdout.close()
+    return summary, drained
+
+
+def report(name, summary, drained, seconds=None):
+    count, total, p50, p99 = summary
+    print(f"{name:<8} {count / (seconds or total):>10,.0f} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f} {drained:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0, help="How long to poll the status")
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--publish", type=float, default=1.0, help="Seconds between status updates")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        calls = log_ingest.CallQueue()
+        cores = [supervisor.WorkerSupervisor(calls, worker_dir=os.path.join(folder, f"worker-{i}"),
+                                             log_dir=os.path.join(folder, "logs"), name=f"w{i}")
+                 for i in range(args.instances)]
+        for core in cores:
+            core.on_logs = lambda records: None
+            core.metrics.publish(core.status())
+        manager = Manager(cores, calls)
+        server = control_api.ControlServer(manager, TOKEN, port=0)
+        server.start()
+        print(f"{args.instances} instances, status republished every {args.publish:g}s, state thread frames of "
+              f"{FRAME_SECONDS * 1e3:g} ms")
+        print(f"{'request':<8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'state calls':>14}")
+        summary, drained = run_client(server.port, "/status", "GET", args.seconds, 0, manager, args.publish)
+        report("status", summary, drained, args.seconds)
+        summary, drained = run_client(server.port, "/stop", "POST", 0, args.actions, manager, args.publish)
+        report("actions", summary, drained)
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
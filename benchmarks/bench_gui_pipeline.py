@@ -0,0 +1,236 @@
+"""
+End-to-end benchmark of the worker output path, from the worker's stdout to the log view.
+
+Runs benchmarks/fake_worker.py as the worker (through the worker_command setting, so the real
+InstanceManager, supervisor, reader threads and call queue are used) at increasing line rates, each in a
+fresh interpreter inside a temporary folder. Reported per rate:
+
+    lines/s      Lines that reached the frontend per second of the run
+    latency      Time from the fake worker writing a stamped line to the frontend rendering it (p50/p99/max)
+    stall        Longest time the event loop could not handle input; >100ms counts as a stall
+    RSS          Resident memory at the start and growth until the end of the run
+
+Frontends:
+    headless  Drains the call queue every UI_FRAME_MS like the GUI and formats records as it does
+              (no widgets, works without a display)
+    tk        The real FishtestManagerApp window (needs a display; on a server use xvfb-run)
+
+--path command sends the output through WorkerSupervisor.run_command() (install/update commands) instead.
+--json FILE saves the results, to compare versions of the manager.
+
+Usage: python benchmarks/bench_gui_pipeline.py [--rates 1000,10000,...] [--seconds S] [--frontend headless|tk]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_WORKER = os.path.join(ROOT, "benchmarks", "fake_worker.py")
+STAMP_PREFIX = "fake_worker: sent at "
+STAMP_EVERY = 50                # Lines between latency stamps
+STALL_SECONDS = 0.1
+
+
+# --- Child: one run in a fresh interpreter, cwd is a temporary folder ---
+class Run:
+    def __init__(self):
+        self.lines = 0
+        self.latencies = []
+        self.stalls = []            # Time the event loop was blocked, per frame or heartbeat
+        self.rss = []
+        self.first_line_at = None
+        self.last_line_at = None
+
+    def records_shown(self, records):
+        now = time.time()
+        if self.first_line_at is None:
+            self.first_line_at = now
+        self.last_line_at = now
+        self.lines += len(records)
+        for record in records:
+            if record.message.startswith(STAMP_PREFIX):
+                self.latencies.append(now - float(record.message[len(STAMP_PREFIX):]))
+
+    def sample_memory(self, process):
+        self.rss.append(process.memory_info().rss)
+
+    def result(self):
+        latencies = sorted(self.latencies) or [0.0]
+        duration = (self.last_line_at or 0) - (self.first_line_at or 0)
+        return {
+            "lines": self.lines,
+            "lines_per_second": self.lines / duration if duration > 0 else 0,
+            "latency_p50_ms": statistics.median(latencies) * 1e3,
+            "latency_p99_ms": latencies[int(len(latencies) * 0.99)] * 1e3,
+            "latency_max_ms": latencies[-1] * 1e3,
+            "longest_stall_ms": max(self.stalls, default=0) * 1e3,
+            "stalls": sum(1 for stall in self.stalls if stall > STALL_SECONDS),
+            "rss_start_mib": self.rss[0] / 1024 ** 2,
+            "rss_growth_mib": (max(self.rss) - self.rss[0]) / 1024 ** 2,
+        }
+
+
+def format_records(records, view):
+    """ The string work of FishtestManagerApp._render_log_records, without the widget. """
+    last_timestamp = None
+    for record in records[-view.maxlen:]:
+        if record.timestamp != last_timestamp:
+            last_timestamp = record.timestamp
+            timestamp = time.strftime("[%H:%M:%S] ", time.localtime(record.timestamp))
+        view.append(f"{timestamp}[{record.level:<7}] {record.message}\n")
+
+
+def run_headless(core, command, path, timeout):
+    import collections
+    import psutil
+    import gui  # Only for its frame constants; no window is created
+    run = Run()
+    process = psutil.Process()
+    view = collections.deque(maxlen=gui.LOG_VIEW_LINES)
+
+    def on_logs(records):
+        format_records(records, view)
+        run.records_shown(records)
+    core.on_logs = on_logs
+
+    run.sample_memory(process)
+    start_run(core, command, path)
+    deadline = time.monotonic() + timeout
+    next_sample = time.monotonic() + 1
+    while time.monotonic() < deadline and not finished(core, path):
+        time.sleep(gui.UI_FRAME_MS / 1000)  # after(UI_FRAME_MS) reschedules from the end of the previous frame
+        t0 = time.monotonic()
+        core.calls.drain(gui.UI_MAX_ITEMS_PER_FRAME)
+        run.stalls.append(time.monotonic() - t0)
+        if t0 >= next_sample:
+            run.sample_memory(process)
+            next_sample = t0 + 1
+    while core.calls.drain(gui.UI_MAX_ITEMS_PER_FRAME):
+        pass
+    run.sample_memory(process)
+    return run
+
+
+def run_tk(command, path, timeout):
+    import psutil
+    import gui
+    run = Run()
+    process = psutil.Process()
+    app = gui.FishtestManagerApp()
+    core = app.supervisor
+    render = app._render_log_records
+
+    def render_and_measure(records, instance=None):
+        render(records, instance)
+        run.records_shown(records)
+    core.on_logs = render_and_measure
+
+    heartbeat = {"expected": None, "deadline": time.monotonic() + timeout, "next_sample": 0}
+
+    def beat():
+        # Anything that keeps Tk busy (draining, rendering, drawing) delays this callback
+        now = time.monotonic()
+        if heartbeat["expected"] is not None:
+            run.stalls.append(max(now - heartbeat["expected"], 0))
+        if now >= heartbeat["next_sample"]:
+            run.sample_memory(process)
+            heartbeat["next_sample"] = now + 1
+        if now > heartbeat["deadline"] or (heartbeat["expected"] is not None and finished(core, path)):
+            app.after(500, app.destroy)  # Lets the last queued output through
+            return
+        heartbeat["expected"] = time.monotonic() + 0.01
+        app.after(10, beat)
+
+    def begin():
+        start_run(core, command, path)
+        beat()
+    run.sample_memory(process)
+    app.after(1000, begin)
+    app.mainloop()
+    return run
+
+
+def start_run(core, command, path):
+    if path == "worker":
+        core.start_worker()
+    else:
+        core.run_command(command, "--- Fake command ---")
+
+
+def finished(core, path):
+    if path == "worker":
+        return core.worker_process is None and not core.worker_starting and core.calls.pending() == 0
+    return not core.is_long_operation_running and core.calls.pending() == 0
+
+
+def child(args):
+    command = (f'"{sys.executable}" "{FAKE_WORKER}" synth --rate {args.rate} --seconds {args.seconds} '
+               f'--stamp {STAMP_EVERY}')
+    os.makedirs("worker", exist_ok=True)
+    with open("manager.cfg", "w") as f:
+        f.write(f"[instance worker]\nworker_command = {command}\n\n[watchdog]\nenabled = no\n")
+    sys.path.insert(0, ROOT)
+    timeout = args.seconds + 60
+    if args.frontend == "tk":
+        run = run_tk(command, args.path, timeout)
+    else:
+        import instances
+        import log_ingest
+        manager = instances.InstanceManager(log_ingest.CallQueue())
+        manager.start()
+        run = run_headless(manager.primary, command, args.path, timeout)
+        manager.shutdown()
+    print(json.dumps(run.result()))
+
+
+# --- Parent: one child per rate ---
+def measure(rate, args):
+    with tempfile.TemporaryDirectory() as folder:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--rate", str(rate), "--seconds", str(args.seconds),
+             "--frontend", args.frontend, "--path", args.path],
+            cwd=folder, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else f"exit code {output.returncode}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rates", default="1000,5000,20000,50000", help="Comma separated lines/sec of the fake worker")
+    parser.add_argument("--seconds", type=float, default=10, help="Length of each run")
+    parser.add_argument("--frontend", choices=("headless", "tk"), default="tk" if os.environ.get("DISPLAY") else "headless")
+    parser.add_argument("--path", choices=("worker", "command"), default="worker")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--rate", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    print(f"frontend: {args.frontend}, path: {args.path}, {args.seconds:g}s per rate")
+    print(f"{'rate':>8} {'lines/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'stall ms':>9} {'stalls':>7} "
+          f"{'RSS MiB':>8} {'growth':>7}")
+    results = {}
+    for rate in (float(rate) for rate in args.rates.split(",")):
+        try:
+            r = measure(rate, args)
+        except RuntimeError as e:
+            print(f"{rate:>8.0f} failed: {e}")
+            continue
+        results[f"{rate:g}"] = r
+        print(f"{rate:>8.0f} {r['lines_per_second']:>9,.0f} {r['latency_p50_ms']:>8.1f} {r['latency_p99_ms']:>8.1f} "
+              f"{r['latency_max_ms']:>8.1f} {r['longest_stall_ms']:>9.1f} {r['stalls']:>7} "
+              f"{r['rss_start_mib']:>8.1f} {r['rss_growth_mib']:>+7.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"frontend": args.frontend, "path": args.path, "seconds": args.seconds, "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of the launch backends: how long it takes to start the worker and to tear its tree down.
+
+A stand-in worker folder is made in a temporary directory (env/bin/python3 runs this Python, worker.py
+starts one child like cutechess and prints "ready"). Every launch starts it the way start_worker() does
+and then kills it the way a force stop does. Reported per variant (median and p90 of --runs launches):
+
+    spawn      Until Popen() returned
+    ready      Until the worker's first line arrived through the pipe
+    teardown   From kill_tree() until the worker and its child are both gone
+    orphans    Children still alive after the teardown (killed by the benchmark afterwards)
+
+Variants: `posix` (direct exec, POSIX only), `posix-bash` (the same through `bash -c`, like the MSYS2
+shell layer) and `msys2` (Windows with MSYS2 installed; there env/bin/python3 is a bash script calling
+this Python, so only the launch chain differs).
+
+Usage: python benchmarks/bench_launch.py [--runs N] [--msys2-path PATH]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import launcher  # noqa: E402
+from common import MSYS2_PATH, windows_to_msys2_path  # noqa: E402
+
+WORKER = ("import subprocess, sys, time\n"
+          "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+          "print(f'ready {child.pid}', flush=True)\n"
+          "time.sleep(60)\n")
+TEARDOWN_TIMEOUT = 5.0
+
+
+def make_worker_dir(folder, bash_python):
+    os.makedirs(os.path.join(folder, "env", "bin"))
+    python = os.path.join(folder, *launcher.WORKER_PYTHON.split("/"))
+    with open(python, "w", newline="\n") as f:
+        f.write(f'#!/bin/sh\nexec "{bash_python}" "$@"\n')
+    os.chmod(python, 0o755)
+    with open(os.path.join(folder, launcher.WORKER_SCRIPT), "w") as f:
+        f.write(WORKER)
+
+
+def alive(pid):
+    # A killed child waits as a zombie until its new parent reaps it; it no longer runs
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def wait_gone(pids, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        pids = [pid for pid in pids if alive(pid)]
+        if not pids:
+            return []
+        time.sleep(0.002)
+    return pids
+
+
+def launch_once(backend, launch):
+    t0 = time.perf_counter()
+    process = backend.popen(launch)
+    spawned = time.perf_counter()
+    line = process.stdout.readline().decode(errors="replace").split()
+    ready = time.perf_counter()
+    if not line or line[0] != "ready":
+        process.kill()
+        raise RuntimeError(f"unexpected worker output: {' '.join(line) or 'nothing'}")
+    child_pid = int(line[1])
+    t1 = time.perf_counter()
+    backend.kill_tree(process.pid)
+    process.wait()
+    orphans = wait_gone([child_pid], TEARDOWN_TIMEOUT)
+    teardown = time.perf_counter()
+    process.stdout.close()
+    for pid in orphans:
+        os.kill(pid, 9)
+    return spawned - t0, ready - t0, teardown - t1, len(orphans)
+
+
+def variants(worker_dir, msys2_path):
+    result = []
+    if sys.platform != "win32":
+        posix = launcher.PosixLauncher()
+        result.append(("posix", posix, posix.worker(worker_dir)))
+        result.append(("posix-bash", posix, posix.bash(worker_dir, f"{launcher.WORKER_PYTHON} {launcher.WORKER_SCRIPT}")))
+    elif os.path.isfile(os.path.join(msys2_path, "msys2_shell.cmd")):
+        msys2 = launcher.Msys2Launcher(msys2_path)
+        result.append(("msys2", msys2, msys2.worker(worker_dir)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20, help="Launches per variant")
+    parser.add_argument("--msys2-path", default=MSYS2_PATH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        bash_python = windows_to_msys2_path(sys.executable) if sys.platform == "win32" else sys.executable
+        make_worker_dir(folder, bash_python)
+        found = variants(folder, args.msys2_path)
+        if not found:
+            print(f"No launch backend to measure: MSYS2 not found in {args.msys2_path}.")
+            return 1
+        print(f"{'variant':<11} {'spawn ms':>15} {'ready ms':>15} {'teardown ms':>15} {'orphans':>8}   (median / p90)")
+        for name, backend, launch in found:
+            launch_once(backend, launch)  # Warm up the file cache
+            runs = [launch_once(backend, launch) for _ in range(args.runs)]
+            columns = []
+            for values in list(zip(*runs))[:3]:
+                values = sorted(values)
+                columns.append(f"{statistics.median(values) * 1e3:7.1f} / {values[int(len(values) * 0.9) - 1] * 1e3:5.1f}")
+            print(f"{name:<11} {columns[0]:>15} {columns[1]:>15} {columns[2]:>15} {sum(run[3] for run in runs):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
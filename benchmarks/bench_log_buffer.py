@@ -0,0 +1,60 @@
+"""
+Benchmark for the in-memory log buffer.
+
+Appends 1M records in batches (the way the UI drains worker output) and reports the insert cost
+and the traced memory after every 100k records. Both should stay flat once the ring is full. tracemalloc slows allocation
+down, so compare the rows with each other rather than reading the absolute ns/record.
+
+Usage: python benchmarks/bench_log_buffer.py [--capacity N] [--records N] [--batch N]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_buffer
+
+LINE = "Games: 1234, Wins: 321, Losses: 300, Draws: 613, Pentanomial: [12, 150, 290, 160, 5]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--capacity", type=int, default=log_buffer.DEFAULT_CAPACITY)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--report-every", type=int, default=100_000)
+    args = parser.parse_args()
+
+    buffer = log_buffer.LogBuffer(args.capacity)
+    tracemalloc.start()
+    print(f"capacity={args.capacity} batch={args.batch}")
+    print(f"{'records':>10} {'ns/record':>10} {'traced MiB':>11} {'kept':>8} {'dropped':>9}")
+
+    appended = 0
+    insert_time = 0.0
+    window_count = 0
+    while appended < args.records:
+        # A fresh string per record, like real output, so evicted messages have to be freed
+        batch = [(f"{LINE} #{appended + i}", "WORKER") for i in range(args.batch)]
+        t0 = time.perf_counter()
+        buffer.extend(batch)
+        insert_time += time.perf_counter() - t0
+        window_count += len(batch)
+        appended += len(batch)
+        if window_count >= args.report_every:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"{appended:>10} {insert_time / window_count * 1e9:>10.0f} {current / 2**20:>11.1f} "
+                  f"{len(buffer):>8} {buffer.dropped:>9}")
+            insert_time = 0.0
+            window_count = 0
+
+    t0 = time.perf_counter()
+    buffer.tail(5000)
+    print(f"tail(5000) of a full buffer: {(time.perf_counter() - t0) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
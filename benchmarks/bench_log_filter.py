@@ -0,0 +1,76 @@
+"""
+Benchmark for the log view filter and search (log_filter.py) on a full log.
+
+Fills LogBuffers with --records records of worker output (split over --instances, with a few INFO and
+ERROR lines in between), then times what the log view does when a filter changes:
+
+    snapshot   Copying the level indexes, on the Tk thread
+    query      Finding the newest LOG_VIEW_LINES matches (in a background thread for searches)
+
+A level filter must stay a few milliseconds however large the log is; a search grows with the records
+of the chosen levels, but never blocks the window for longer than its snapshot.
+
+Usage: python benchmarks/bench_log_filter.py [--records N] [--instances N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_buffer  # noqa: E402
+import log_filter  # noqa: E402
+
+VIEW_LINES = 5000   # gui.LOG_VIEW_LINES, without importing the GUI
+QUERIES = [
+    ("all levels", log_filter.LEVELS, "", False),
+    ("errors only", ("ERROR", "FATAL"), "", False),
+    ("hide worker output", [level for level in log_filter.LEVELS if level != "WORKER"], "", False),
+    ("search, common", log_filter.LEVELS, "Pentanomial", False),
+    ("search, rare", log_filter.LEVELS, "ServerError", False),
+    ("search, no match", log_filter.LEVELS, "no such text", False),
+    ("regex, rare", log_filter.LEVELS, r"task \w+/17\b", True),
+]
+
+
+def fill(instances, records):
+    buffers = [log_buffer.LogBuffer(records // instances) for _ in range(instances)]
+    for start in range(0, records // instances, 50):
+        for number, buffer in enumerate(buffers):
+            batch = []
+            for i in range(start, start + 50):
+                if i % 5000 == 0:
+                    batch.append((f"ServerError: task {number:x}{i:08x}/{i % 97} failed", "ERROR"))
+                elif i % 400 == 0:
+                    batch.append((f"Working on task {number:x}{i:08x}/{i % 97}", "INFO"))
+                else:
+                    batch.append((f"Games: {i}, Wins: {i // 3}, Losses: {i // 4}, Draws: {i // 2}, "
+                                  f"Pentanomial: [1, 20, 44, 21, 2]", "WORKER"))
+            buffer.extend(batch)
+    return [(None if number == 0 else f"w{number}", buffer) for number, buffer in enumerate(buffers)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=500_000, help="Records over all instances")
+    parser.add_argument("--instances", type=int, default=2)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    sources = fill(args.instances, args.records)
+    print(f"{sum(len(buffer) for _, buffer in sources):,} records in {args.instances} buffers "
+          f"(filled in {time.perf_counter() - t0:.1f}s)")
+    print(f"{'query':<20} {'snapshot ms':>12} {'query ms':>9} {'shown':>6}")
+    for name, levels, text, regex in QUERIES:
+        query = log_filter.LogQuery(levels, text, regex=regex)
+        t0 = time.perf_counter()
+        lists = log_filter.snapshot(sources, query.levels, None if query.pattern is not None else VIEW_LINES)
+        t1 = time.perf_counter()
+        found = log_filter.newest(lists, query, VIEW_LINES)
+        t2 = time.perf_counter()
+        print(f"{name:<20} {(t1 - t0) * 1e3:>12.1f} {(t2 - t1) * 1e3:>9.1f} {len(found):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark for the cost of the metrics endpoint on worker output handling.
+
+Replays the recorded worker session in benchmarks/corpus through a WorkerSupervisor's line handling
+(parsing, logging, task progress) in batches, as the worker output reader delivers them. Runs without
+metrics counters, with counters, and with counters while a scraper in another process fetches /metrics
+every --interval seconds (0: as fast as it can), and prints lines/sec for each and the scrapes served.
+
+Usage: python benchmarks/bench_metrics.py [--corpus FILE] [--lines N] [--batch N] [--interval S]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import log_ingest
+import metrics
+import supervisor
+
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "corpus", "worker_session.log")
+
+
+class NoMetrics(metrics.WorkerMetrics):
+    """ Counters that count nothing, for the baseline. """
+
+    def worker_started(self):
+        pass
+
+    def task_started(self):
+        pass
+
+    def progress(self, event):
+        pass
+
+
+def replay(core, lines, batch):
+    t0 = time.perf_counter()
+    for i in range(0, len(lines), batch):
+        core._process_worker_lines(lines[i:i + batch])
+    return len(lines) / (time.perf_counter() - t0)
+
+
+SCRAPER = r"""
+import sys, time, urllib.request
+while True:
+    with urllib.request.urlopen(sys.argv[1], timeout=5) as response:
+        response.read()
+    time.sleep(float(sys.argv[2]))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--lines", type=int, default=300_000, help="Lines to replay (the corpus is repeated)")
+    parser.add_argument("--batch", type=int, default=50, help="Lines per batch")
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between scrapes")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = f.read().splitlines()
+    lines = (corpus * (args.lines // len(corpus) + 1))[:args.lines]
+
+    with tempfile.TemporaryDirectory() as folder:
+        def new_core():
+            # No worker folder: status files are skipped, everything else runs as in the manager
+            return supervisor.WorkerSupervisor(log_ingest.CallQueue(), worker_dir=os.path.join(folder, "worker"),
+                                               log_dir=os.path.join(folder, "logs"))
+
+        baseline = new_core()
+        baseline.metrics = NoMetrics()
+        without = replay(baseline, lines, args.batch)
+        counters = replay(new_core(), lines, args.batch)
+
+        core = new_core()
+        server = metrics.MetricsServer(lambda: [core], port=0)
+        server.start()
+        scraper = subprocess.Popen([sys.executable, "-c", SCRAPER, server.url, str(args.interval)])
+        time.sleep(0.5)  # Let the scraper start up before timing
+        server.requests = 0
+        scraped = replay(core, lines, args.batch)
+        scrapes = server.requests
+        scraper.kill()
+        scraper.wait()
+        server.stop()
+
+    print(f"corpus: {len(corpus)} lines from {os.path.relpath(args.corpus)}, batches of {args.batch}")
+    print(f"no metrics          : {without:>10,.0f} lines/s over {len(lines):,} lines")
+    print(f"counters            : {counters:>10,.0f} lines/s")
+    print(f"counters + scraping : {scraped:>10,.0f} lines/s ({scrapes:,} scrapes served, interval {args.interval:g}s)")
+    print(f"counted: {core.metrics.games:,} games, {core.metrics.tasks:,} tasks "
+          f"(W/L/D {core.metrics.wins:,}/{core.metrics.losses:,}/{core.metrics.draws:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark for the cost of sampling a worker-sized process tree with the resource monitor.
+
+A tree like the worker's is started (a shell, a Python process and a number of busy or idle children
+standing in for cutechess and the engines), then sampled repeatedly. Reported: CPU time per sample
+and the share of one core this costs at the default interval, which must stay below 1%.
+
+Usage: python benchmarks/bench_resource_monitor.py [--children N] [--samples N] [--interval S]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resource_monitor  # noqa: E402
+
+CHILD = "import time\nend = time.time() + {seconds}\nwhile time.time() < end:\n    sum(range(20000)) if {busy} else time.sleep(0.05)\n"
+PARENT = ("import subprocess, sys\n"
+          "children = [subprocess.Popen([sys.executable, '-c', {child!r}.format(seconds={seconds}, busy=i % 2 == 0)]) for i in range({count})]\n"
+          "[child.wait() for child in children]\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--children", type=int, default=16, help="Processes in the tree below the worker")
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=resource_monitor.SAMPLE_INTERVAL_SECONDS,
+                        help="Interval the overhead is computed for")
+    args = parser.parse_args()
+
+    seconds = 60
+    root = subprocess.Popen([sys.executable, "-c", PARENT.format(child=CHILD, seconds=seconds, count=args.children)])
+    try:
+        time.sleep(1.0)  # Let the children start
+        sampler = resource_monitor.ResourceSampler(root.pid, on_sample=lambda sample: None)
+        sampler.sample()  # The first cpu_percent() of each process only sets its baseline
+
+        costs = []
+        sample = None
+        for _ in range(args.samples):
+            time.sleep(0.05)
+            started = time.thread_time()
+            sample = sampler.sample()
+            costs.append(time.thread_time() - started)
+        costs.sort()
+    finally:
+        for process in sampler.psutil.Process(root.pid).children(recursive=True):
+            process.kill()
+        root.kill()
+
+    mean = sum(costs) / len(costs)
+    p95 = costs[int(len(costs) * 0.95) - 1]
+    print(f"tree              : {sample.processes} processes, {sample.threads} threads, CPU {sample.cpu_percent:.0f}%")
+    print(f"cost per sample   : mean {mean * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms (CPU time of the sampler thread)")
+    print(f"overhead          : {mean / args.interval * 100:.3f}% of one core at a {args.interval:g}s interval "
+          f"(budget {resource_monitor.OVERHEAD_BUDGET * 100:g}%)")
+    history = resource_monitor.ResourceHistory()
+    print(f"history memory    : {len(history.METRICS)} x {resource_monitor.HISTORY_SAMPLES} samples x 8 bytes = "
+          f"{len(history.METRICS) * resource_monitor.HISTORY_SAMPLES * 8 / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
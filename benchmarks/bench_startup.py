@@ -0,0 +1,71 @@
+"""
+Benchmark for the startup cost of the headless path against the GUI path.
+
+Each measurement runs in a fresh interpreter, so nothing is shared between runs. Reported per path:
+wall time of the whole process, time spent importing the frontend module and peak resident memory.
+The GUI path only imports the GUI module (creating the window needs a display); that is where
+customtkinter and tkinter are loaded.
+
+Usage: python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+import_seconds = time.perf_counter() - t0
+loaded_tk = any(name.split(".")[0] in ("tkinter", "customtkinter") for name in sys.modules)
+try:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+except ImportError:
+    import psutil
+    peak_kb = psutil.Process().memory_info().peak_wset // 1024
+print(json.dumps({{"import_seconds": import_seconds, "peak_kb": peak_kb, "loaded_tk": loaded_tk}}))
+"""
+
+
+def measure(module, runs):
+    results = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", CHILD.format(module=module)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        wall = time.perf_counter() - t0
+        result = json.loads(output)
+        result["wall_seconds"] = wall
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'path':<10} {'wall ms':>9} {'import ms':>10} {'peak MiB':>9}  tkinter loaded")
+    for label, module in (("headless", "headless"), ("gui", "gui")):
+        try:
+            results = measure(module, args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"{label:<10} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        wall = statistics.median(r["wall_seconds"] for r in results) * 1e3
+        imports = statistics.median(r["import_seconds"] for r in results) * 1e3
+        peak = statistics.median(r["peak_kb"] for r in results) / 1024
+        print(f"{label:<10} {wall:>9.1f} {imports:>10.1f} {peak:>9.1f}  {results[0]['loaded_tk']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark for the worker output parser.
+
+Replays the recorded worker session in benchmarks/corpus through worker_output's parser and, for
+comparison, through the two uncompiled re.search calls the manager used before. Prints lines/sec for
+both and how many lines of each event type were recognized.
+
+Usage: python benchmarks/bench_worker_output.py [--corpus FILE] [--lines N]
+"""
+import argparse
+import collections
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import worker_output
+
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "corpus", "worker_session.log")
+
+
+def legacy_parse(line):
+    match_start = re.search(r"^Started game (\d+) of (\d+)", line)
+    if match_start:
+        return match_start
+    return re.search(r"^Games: (\d+), Wins:", line)
+
+
+def measure(func, lines):
+    t0 = time.perf_counter()
+    for line in lines:
+        func(line)
+    return len(lines) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Lines to parse (the corpus is repeated)")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = f.read().splitlines()
+    lines = (corpus * (args.lines // len(corpus) + 1))[:args.lines]
+
+    output_parser = worker_output.create_parser()
+    counts = collections.Counter(type(event).__name__ for event in map(output_parser.parse, corpus))
+
+    print(f"corpus: {len(corpus)} lines from {os.path.relpath(args.corpus)}")
+    for name, count in counts.most_common():
+        print(f"  {name if name != 'NoneType' else '(unrecognized)':<16} {count:>6}")
+    print(f"parser : {measure(output_parser.parse, lines):>12,.0f} lines/s over {len(lines):,} lines")
+    print(f"legacy : {measure(legacy_parse, lines):>12,.0f} lines/s (2 event types only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Stand-in for the fishtest worker that prints realistic output without MSYS2 or a fishtest server.
+
+    replay [FILE]   Prints a recorded worker session (default: benchmarks/corpus/worker_session.log)
+    synth           Makes up endless tasks: "Started game X of Y", results, "Games: N, Wins: ..." lines
+
+Lines go out at --rate lines/sec (0: as fast as the pipe takes them). Like the real worker it stops when
+a fish.exit file appears in its folder. With --stamp N every Nth line is "fake_worker: sent at T" (T
+from time.time()), which the manager logs like any other line, so a frontend can measure how long a
+line takes from the worker to the screen.
+
+Run it in place of the real worker by setting `worker_command` of an instance in manager.cfg:
+
+    [instance worker]
+    worker_command = python ../benchmarks/fake_worker.py synth --rate 500
+
+or hand it to WorkerSupervisor.run_command() to exercise the command output path.
+
+Usage: python benchmarks/fake_worker.py replay|synth [options]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "corpus", "worker_session.log")
+EXIT_FILE_NAME = "fish.exit"
+TICK_SECONDS = 0.005        # Output is written in bursts this far apart when rate limited
+STAMP_PREFIX = "fake_worker: sent at "
+NEW, BASE = "New-8f1c4d2a", "Base-4c2a17e9"
+
+
+def replay_lines(path, loop):
+    with open(path, encoding="utf-8") as f:
+        corpus = [line for line in f.read().splitlines() if not line.startswith("Worker is stopping")]
+    while True:
+        yield from corpus
+        if not loop:
+            return
+
+
+def synth_lines(games_per_task, concurrency, seed):
+    """ Endless worker output: task headers, then games played `concurrency` at a time with periodic reports. """
+    rng = random.Random(seed)
+    yield "Worker version 281 connecting to https://tests.stockfishchess.org"
+    yield f"Using {concurrency} cores"
+    task = 0
+    while True:
+        task += 1
+        run_id = f"{rng.getrandbits(96):024x}"
+        yield "Fetching task..."
+        yield f"Working on task {run_id}/{task} from https://tests.stockfishchess.org/tests/view/{run_id}"
+        yield "Running fake-patch vs master"
+        yield "CPU factor : 0.862123 - tc adjusted to 8.70+0.09"
+        wins = losses = draws = 0
+        started = 0
+        for finished in range(1, games_per_task + 1):
+            while started < min(finished - 1 + concurrency, games_per_task):
+                started += 1
+                white, black = (NEW, BASE) if started % 2 else (BASE, NEW)
+                yield f"Started game {started} of {games_per_task} ({white} vs {black})"
+            white, black = (NEW, BASE) if finished % 2 else (BASE, NEW)
+            outcome = rng.random()
+            if outcome < 0.25:
+                wins += 1
+                result = "1-0 {White wins by adjudication}" if white == NEW else "0-1 {Black wins by adjudication}"
+            elif outcome < 0.5:
+                losses += 1
+                result = "0-1 {Black wins by adjudication}" if white == NEW else "1-0 {White wins by adjudication}"
+            else:
+                draws += 1
+                result = "1/2-1/2 {Draw by adjudication}"
+            yield f"Finished game {finished} ({white} vs {black}): {result}"
+            score = (wins + draws / 2) / finished
+            yield f"Score of {NEW} vs {BASE}: {wins} - {losses} - {draws}  [{score:.3f}] {finished}"
+            if finished % 8 == 0 or finished == games_per_task:
+                yield "Elo difference: 3.7 +/- 10.5, LOS: 35.2 %, DrawRatio: 43.5 %"
+                yield f"Games: {finished}, Wins: {wins}, Losses: {losses}, Draws: {draws}, Pentanomial: [0, 0, 0, 0, 0]"
+        yield "Finished match"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("mode", choices=("replay", "synth"))
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS, help="Recorded output for 'replay'")
+    parser.add_argument("--rate", type=float, default=0, help="Lines per second (0: unlimited)")
+    parser.add_argument("--seconds", type=float, default=0, help="Stop after this long (0: no limit)")
+    parser.add_argument("--lines", type=int, default=0, help="Stop after this many lines (0: no limit)")
+    parser.add_argument("--loop", action="store_true", help="Replay the recording over and over")
+    parser.add_argument("--games", type=int, default=200, help="Games per task for 'synth'")
+    parser.add_argument("--concurrency", type=int, default=4, help="Games in flight for 'synth'")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stamp", type=int, default=0, help="Print a timestamp line every N lines (0: never)")
+    parser.add_argument("--exit-code", type=int, default=0, help="Exit code at the end (e.g. 1 to look like a crash)")
+    args = parser.parse_args()
+
+    if args.mode == "replay":
+        lines = replay_lines(args.corpus, args.loop)
+    else:
+        lines = synth_lines(args.games, args.concurrency, args.seed)
+    out = sys.stdout
+    start = time.monotonic()
+    sent = stamps = 0
+    burst = []
+    for line in lines:
+        burst.append(line)
+        sent += 1
+        if args.lines and sent >= args.lines:
+            break
+        due = start + sent / args.rate if args.rate else 0
+        now = time.monotonic()
+        if due - now < TICK_SECONDS and len(burst) < 1000:
+            continue  # Behind schedule (or unlimited): keep filling this burst
+        if args.stamp and sent // args.stamp > stamps:
+            # Stamped right before the write, so the time measured downstream starts when the line leaves
+            stamps = sent // args.stamp
+            burst.append(f"{STAMP_PREFIX}{time.time():.6f}")
+        out.write("\n".join(burst) + "\n")
+        out.flush()
+        burst = []
+        if os.path.exists(EXIT_FILE_NAME):
+            print(f"Worker is stopping: {EXIT_FILE_NAME} file found", flush=True)
+            return 0
+        if args.seconds and now - start >= args.seconds:
+            break
+        if due > now:
+            time.sleep(due - now)
+    if burst:
+        out.write("\n".join(burst) + "\n")
+    out.flush()
+    return args.exit_code
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except (BrokenPipeError, KeyboardInterrupt):
+        sys.exit(1)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+# --- Constants ---
+APP_NAME = "Fishtest Worker Manager"
+APP_VERSION = "v1.1.1"
+REPO_OWNER = "dav1312"
+REPO_NAME = "fishtest-worker-gui"
+
+WORKER_DIR = os.path.abspath("worker")
+CONFIG_FILE_NAME = "fishtest.cfg"
+CONFIG_FILE = os.path.join(WORKER_DIR, CONFIG_FILE_NAME)
+EXIT_FILE_NAME = "fish.exit"
+STATUS_FILE_NAME = "manager_status.json"
+LOG_DIR = os.path.abspath("logs")
+MANAGER_CONFIG_FILE = os.path.abspath("manager.cfg")
+AUTOTUNE_CACHE_FILE = os.path.abspath("autotune_cache.json")
+ARTIFACT_CACHE_DIR = os.path.abspath("cache")
+INSTALL_STATE_FILE = os.path.abspath("install_state.json")
+TASK_HISTORY_FILE = os.path.abspath("task_history.sqlite3")
+CONTROL_TOKEN_FILE = os.path.abspath("control_token")
+# Per-user folder shared by every copy of the manager on the machine (e.g. the cached release check)
+USER_CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+                              or os.path.join(os.path.expanduser("~"), ".cache"), REPO_NAME)
+RELEASE_CHECK_FILE = os.path.join(USER_CACHE_DIR, "release_check.json")
+MSYS2_PATH = "C:\\msys64"
+USERNAME_DEFAULT = "your_username"
+
+def get_asset_path(relative_path):
+    """ Get absolute path to asset, works for dev and for PyInstaller """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, "assets", relative_path)
+
+def windows_to_msys2_path(path):
+    # Converts C:\Users\... to /c/Users/... and \\server\share\... to //server/share/...
+    drive, rest = os.path.splitdrive(os.path.abspath(path))
+    if drive.startswith(("\\\\", "//")):
+        return "//" + (drive[2:] + rest).replace("\\", "/")
+    drive_letter = drive.rstrip(":\\/").lower()
+    rest = rest.replace("\\", "/").lstrip("/\\")
+    return f"/{drive_letter}/{rest}"
@@ -0,0 +1,172 @@
+"""
+Load-aware concurrency: fewer worker cores while the machine is used for something else, all of them
+when it is not. Off unless enabled in the [concurrency] section of manager.cfg.
+
+Every SAMPLE_INTERVAL_SECONDS the system CPU use is measured and the CPU use of the workers (from the
+resource monitor) is taken out, which leaves the load of everything else ("other load", in cores).
+Together with the time since the last keyboard or mouse input (Windows only) this gives a target:
+
+    cores = max_cores - other load - reserve_cores (only while the user is active), within [min_cores, max_cores]
+
+split over the running instances like "Split Cores". Changes are never made in the middle of a task:
+each worker is asked to finish its task (fish.exit), its concurrency is written to fishtest.cfg and it
+is started again. Against flapping, the other load is averaged over LOAD_WINDOW_SECONDS, a raise needs
+RAISE_MARGIN_CORES of headroom on top, and a new target must hold for LOWER_HOLD_SECONDS (lowering) or
+RAISE_HOLD_SECONDS (raising) before anything is changed. Every decision is logged.
+"""
+import collections
+import math
+import os
+import sys
+import threading
+import time
+
+# --- Constants ---
+SAMPLE_INTERVAL_SECONDS = 15.0
+LOAD_WINDOW_SECONDS = 120.0      # Other load is averaged over this long
+LOWER_HOLD_SECONDS = 120.0       # A lower target must hold this long before the workers are switched
+RAISE_HOLD_SECONDS = 600.0       # Raising waits longer: a busy desktop matters more than a few idle cores
+RAISE_MIN_INTERVAL_SECONDS = 1800.0   # Shortest time between a change and the next raise
+RAISE_MARGIN_CORES = 0.5         # Headroom needed on top of a raise, so a load near a boundary does not flap
+DEFAULT_RESERVE_CORES = 1        # Cores left free while someone uses the machine
+DEFAULT_IDLE_MINUTES = 10.0      # No input for this long means nobody is at the machine
+
+
+def user_idle_seconds():
+    """ Seconds since the last keyboard or mouse input, or None where this is not known (outside Windows). """
+    if sys.platform != "win32":
+        return None
+    import ctypes
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(info)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000
+
+
+def target_cores(other_load, user_active, min_cores, max_cores, reserve_cores, cpu_count):
+    """ Worker cores for a given other load (in cores): what is left of the machine, within [min_cores, max_cores]. """
+    free = cpu_count - other_load - (reserve_cores if user_active else 0)
+    return min(max(math.floor(free), min_cores), max_cores)
+
+
+class ConcurrencyPolicy:
+    """
+    Chooses the total concurrency of the running instances of an InstanceManager and applies it at task
+    boundaries. A ticker thread measures the system CPU and the user's idle time and posts them to
+    check() on the state thread, where all decisions are made.
+    """
+
+    def __init__(self, manager, min_cores=1, max_cores=None, reserve_cores=DEFAULT_RESERVE_CORES,
+                 idle_seconds=DEFAULT_IDLE_MINUTES * 60, clock=time.monotonic, cpu_count=None):
+        self.manager = manager
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.min_cores = max(min_cores, 1)
+        self.max_cores = max(min(max_cores or self.cpu_count, self.cpu_count), self.min_cores)
+        self.reserve_cores = reserve_cores
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+
+        self.loads = collections.deque()   # (clock, other load in cores)
+        self.candidate = None              # (target, clock when it was first proposed)
+        self.changed_at = None             # Clock value of the last change
+        self._ticker_stop = threading.Event()
+
+    def describe(self):
+        if sys.platform != "win32":
+            return f"{self.min_cores}-{self.max_cores} cores (input idle time is only known on Windows)"
+        return (f"{self.min_cores}-{self.max_cores} cores, {self.reserve_cores:g} kept free while the machine is in use "
+                f"(idle after {self.idle_seconds / 60:g} minutes without input)")
+
+    # --- Ticker ---
+    def start(self):
+        import psutil
+        psutil.cpu_percent()  # The first call only sets the baseline
+
+        def tick():
+            while not self._ticker_stop.wait(SAMPLE_INTERVAL_SECONDS):
+                self.manager.calls.post(self.check, psutil.cpu_percent(), user_idle_seconds())
+        threading.Thread(target=tick, daemon=True, name="ConcurrencyPolicy").start()
+
+    def shutdown(self):
+        self._ticker_stop.set()
+
+    # --- Decisions ---
+    def _running(self):
+        """ The instances the policy may switch: running, not stopping, with a numeric concurrency. """
+        cores = []
+        for core in self.manager:
+            if core.name in self.manager.started and core.worker_process is not None and not core.stop_requested:
+                try:
+                    cores.append((core, int(core.concurrency)))
+                except ValueError:
+                    pass
+        return cores
+
+    def check(self, system_percent, idle):
+        """ One measurement: system CPU in percent of the whole machine, user idle seconds (None: unknown). """
+        now = self.clock()
+        running = self._running()
+        worker_load = sum(core.resources.last.cpu_percent for core, _ in running if core.resources.last is not None) / 100
+        self.loads.append((now, max(system_percent / 100 * self.cpu_count - worker_load, 0.0)))
+        while self.loads[0][0] < now - LOAD_WINDOW_SECONDS:
+            self.loads.popleft()
+        if not running:
+            self.candidate = None
+            return
+
+        other_load = sum(load for _, load in self.loads) / len(self.loads)
+        user_active = idle is not None and idle < self.idle_seconds
+        current = sum(cores for _, cores in running)
+        lower = target_cores(other_load, user_active, self.min_cores, self.max_cores, self.reserve_cores, self.cpu_count)
+        higher = target_cores(other_load + RAISE_MARGIN_CORES, user_active, self.min_cores, self.max_cores,
+                              self.reserve_cores, self.cpu_count)
+        if lower < current:
+            target, hold = lower, LOWER_HOLD_SECONDS
+        elif higher > current:
+            target, hold = higher, RAISE_HOLD_SECONDS
+        else:
+            if self.candidate is not None:
+                running[0][0].log(f"Concurrency policy: keeping {current} cores "
+                              f"({self._reason(other_load, user_active, idle)}).", level="DEBUG")
+            self.candidate = None
+            return
+
+        # A target in the same direction keeps the time it was first proposed; the latest value is applied
+        if self.candidate is None or (self.candidate[0] < current) != (target < current):
+            self.candidate = (target, now)
+            running[0][0].log(f"Concurrency policy: {target} cores would suit better than {current} "
+                              f"({self._reason(other_load, user_active, idle)}); switching if this holds "
+                              f"for {hold / 60:g} minutes.", level="DEBUG")
+            return
+        self.candidate = (target, self.candidate[1])
+        if now - self.candidate[1] < hold:
+            return
+        if target > current and self.changed_at is not None and now - self.changed_at < RAISE_MIN_INTERVAL_SECONDS:
+            return
+        self._apply(running, current, target, self._reason(other_load, user_active, idle))
+
+    def _apply(self, running, current, target, reason):
+        import instances  # The manager module imports this one
+        self.candidate = None
+        self.changed_at = self.clock()
+        running[0][0].log(f"Concurrency policy: {'lowering' if target < current else 'raising'} the workers "
+                          f"from {current} to {target} cores ({reason}). They switch when their current task "
+                          f"is done.", level="WARNING")
+        for (core, cores), new_cores in zip(running, instances.split_concurrency(target, len(running))):
+            if new_cores != cores:
+                core.restart_with_concurrency(new_cores)
+
+    @staticmethod
+    def _reason(other_load, user_active, idle):
+        if idle is None:
+            user = "input idle time unknown"
+        elif user_active:
+            user = "the machine is in use"
+        else:
+            user = f"no input for {idle / 60:.0f} minutes"
+        return f"other programs use {other_load:.1f} cores, {user}"
@@ -0,0 +1,402 @@
+"""
+Opt-in local control API ([control] in manager.cfg): lets scripts start, stop and reconfigure the workers
+and read their state over HTTP, e.g. to drain every machine of a fleet before maintenance.
+
+    GET  /status       status() of every instance, as in manager_status.json
+    GET  /progress     State, progress line, task figures and rate of every instance
+    POST /start        Start the workers
+    POST /stop         Let the workers finish their task and exit (fish.exit)
+    POST /force-stop   Kill the workers with their engines
+    POST /config       Change concurrency, cpu_affinity or cpu_priority (JSON body, see update_config)
+
+`?instance=NAME` (repeatable) selects instances, by default all that this manager runs. Every request needs
+`Authorization: Bearer <token>`. Answers are JSON, errors {"error": "..."}.
+
+The server runs an asyncio loop on a thread of its own and listens on localhost (or a Unix socket). Reads
+are answered from the status the supervisors publish (WorkerMetrics.status, replaced whole) without
+involving the state thread, and an encoded answer is reused until one of its statuses is replaced, so
+polling costs next to nothing. Actions are posted to the CallQueue and run on the state thread (the Tk
+thread in the GUI) like a click on a button; the request waits for their result.
+"""
+import asyncio
+import concurrent.futures
+import hmac
+import http
+import json
+import os
+import secrets
+import socket
+import stat
+import threading
+import urllib.parse
+
+import process_tuning
+from common import CONTROL_TOKEN_FILE
+
+# --- Constants ---
+DEFAULT_BIND = "127.0.0.1"
+DEFAULT_PORT = 9188
+ACTION_TIMEOUT_SECONDS = 10.0   # Longest wait for the state thread; a modal dialog in the GUI blocks it
+IDLE_TIMEOUT_SECONDS = 30.0     # Keep-alive connections without a request are closed after this long
+MAX_HEADER_LINES = 64
+MAX_BODY_BYTES = 64 * 1024
+MAX_CACHED_ANSWERS = 64
+PROGRESS_KEYS = ("state", "progress", "task", "throughput", "concurrency", "updated_at")
+
+
+class ApiError(Exception):
+    """ A request that cannot be served; answered with `status` and the message. """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def load_token(path=CONTROL_TOKEN_FILE):
+    """ The token stored in `path`, created on first use (readable by the current user only on POSIX). """
+    try:
+        with open(path, encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def _remove_stale_socket(path):
+    """ Removes a Unix socket left behind by a manager that did not exit cleanly. Raises OSError if one listens. """
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(f"'{path}' exists and is not a socket")
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"another manager already listens on '{path}'")
+
+
+class ControlServer:
+    """
+    Serves the control API for the instances of an InstanceManager that it runs (manager.started),
+    picked up per request, so instances added later are included.
+    """
+
+    def __init__(self, manager, token, bind=DEFAULT_BIND, port=DEFAULT_PORT, socket_path=None):
+        self.manager = manager
+        self.token = token
+        self.bind = bind
+        self.port = port
+        self.socket_path = socket_path
+        self.requests = 0
+        self.actions = 0      # Requests that had to wait for the state thread
+        self._answers = {}    # (path, names) -> (statuses the answer was made from, encoded answer)
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        if self.socket_path:
+            return f"unix:{self.socket_path}"
+        return f"http://{self.bind}:{self.port}/"
+
+    def start(self):
+        """ Starts listening. Raises OSError if the address cannot be used. """
+        loop = asyncio.new_event_loop()
+        try:
+            if self.socket_path:
+                _remove_stale_socket(self.socket_path)
+                self._server = loop.run_until_complete(asyncio.start_unix_server(self._handle, self.socket_path))
+                os.chmod(self.socket_path, 0o600)
+            else:
+                self._server = loop.run_until_complete(asyncio.start_server(self._handle, self.bind, self.port))
+                self.port = self._server.sockets[0].getsockname()[1]
+        except BaseException:
+            loop.close()
+            raise
+        self._loop = loop
+        self._thread = threading.Thread(target=self._serve, daemon=True, name="ControlServer")
+        self._thread.start()
+
+    def _serve(self):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            # Open keep-alive connections are dropped; their handlers end on the cancellation
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = self._server = self._thread = None
+        if self.socket_path:
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    # --- HTTP ---
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT_SECONDS)
+                except ApiError as e:
+                    writer.write(self._response(e.status, {"error": str(e)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body, keep_alive = request
+                try:
+                    status, payload = 200, await self._dispatch(method, path, query, headers, body)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            pass  # Gone, idle or sending lines longer than the stream limit
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """ (method, path, query, headers, body, keep_alive), or None once the client closed the connection. """
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(400, "malformed request line") from None
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ApiError(431, "too many header lines")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise ApiError(400, "invalid Content-Length") from None
+        if not 0 <= length <= MAX_BODY_BYTES:
+            raise ApiError(413, f"the body may have at most {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        url = urllib.parse.urlsplit(target)
+        return method.upper(), url.path, urllib.parse.parse_qs(url.query), headers, body, keep_alive
+
+    def _response(self, status, payload, keep_alive):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload, indent=1).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 401:
+            head += "WWW-Authenticate: Bearer\r\n"
+        return (head + "\r\n").encode("latin-1") + data
+
+    async def _dispatch(self, method, path, query, headers, body):
+        self.requests += 1
+        if not hmac.compare_digest(headers.get("authorization", "").encode(), f"Bearer {self.token}".encode()):
+            raise ApiError(401, "missing or wrong token")
+        names = query.get("instance", [])
+        reads = {"/status": self._status, "/progress": self._progress}
+        actions = {"/start": self.start_workers, "/stop": self.stop_workers, "/force-stop": self.force_stop_workers,
+                   "/config": self.update_config}
+        if path in reads:
+            if method != "GET":
+                raise ApiError(405, f"use GET for {path}")
+            return self._read(path, names, reads[path])
+        if path in actions:
+            if method != "POST":
+                raise ApiError(405, f"use POST for {path}")
+            try:
+                options = json.loads(body) if body.strip() else {}
+            except ValueError as e:
+                raise ApiError(400, f"the body is not JSON: {e}") from None
+            if not isinstance(options, dict):
+                raise ApiError(400, "the body must be a JSON object")
+            return await self._on_state_thread(lambda: actions[path](self._select(names), options))
+        raise ApiError(404, f"unknown path {path}; try /status, /progress, /start, /stop, /force-stop or /config")
+
+    async def _on_state_thread(self, action):
+        """ Runs action() on the state thread and returns its result. """
+        self.actions += 1
+        future = concurrent.futures.Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return  # The request timed out before the state thread got to it
+            try:
+                future.set_result(action())
+            except Exception as e:
+                future.set_exception(e)
+
+        self.manager.calls.post(run)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), ACTION_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise ApiError(503, "the manager did not respond in time; nothing was done") from None
+
+    def _select(self, names):
+        cores = [core for core in list(self.manager) if core.name in self.manager.started]
+        if not names:
+            return cores
+        known = {core.name: core for core in cores}
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ApiError(404, f"unknown instance(s): {', '.join(unknown)}; known: {', '.join(known)}")
+        return [known[name] for name in names]
+
+    # --- Reads (server thread) ---
+    def _read(self, path, names, render):
+        statuses = tuple((core.name, core.metrics.status) for core in self._select(names))
+        key = (path, tuple(names))
+        cached = self._answers.get(key)
+        if (cached is not None and len(cached[0]) == len(statuses)
+                and all(a[0] == b[0] and a[1] is b[1] for a, b in zip(cached[0], statuses))):
+            return cached[1]
+        answer = json.dumps({"instances": {name: render(status or {}) for name, status in statuses}},
+                            indent=1).encode("utf-8")
+        if len(self._answers) >= MAX_CACHED_ANSWERS:
+            self._answers.clear()
+        self._answers[key] = (statuses, answer)
+        return answer
+
+    @staticmethod
+    def _status(status):
+        return status
+
+    @staticmethod
+    def _progress(status):
+        return {key: status.get(key) for key in PROGRESS_KEYS}
+
+    # --- Actions (state thread) ---
+    def start_workers(self, cores, options):
+        """ Starts every selected worker that is installed, configured and idle. """
+        results = {}
+        for core in cores:
+            if core.worker_process is not None or core.worker_starting:
+                results[core.name] = "already running"
+            elif core.is_long_operation_running:
+                results[core.name] = f"busy: {core.current_operation or 'an operation is running'}"
+            elif not core.is_worker_installed():
+                results[core.name] = "not installed"
+            elif not core.has_credentials():
+                results[core.name] = "no Fishtest credentials"
+            else:
+                core.watchdog.cancel_restart()  # Starting now replaces a scheduled restart
+                core.log("Starting the worker (control API).")
+                core.start_worker()
+                results[core.name] = "starting"
+        return {"instances": results}
+
+    def stop_workers(self, cores, options):
+        """ Asks every selected worker to finish its task and exit; cancels scheduled restarts. """
+        results = {}
+        for core in cores:
+            if core.worker_process is None:
+                results[core.name] = "restart cancelled" if core.stop_worker_gracefully() else "not running"
+            elif core.stop_requested and core.pending_concurrency is None:
+                results[core.name] = "stopping"
+            else:
+                core.log("Stop requested (control API).")
+                results[core.name] = "stopping" if core.stop_worker_gracefully() else "failed, see the log"
+        return {"instances": results}
+
+    def force_stop_workers(self, cores, options):
+        results = {}
+        for core in cores:
+            if core.worker_process is None:
+                results[core.name] = "restart cancelled" if core.watchdog.restart_pending else "not running"
+                core.stop_worker_forcefully()
+            else:
+                core.log("Force stop requested (control API).")
+                core.stop_worker_forcefully()
+                results[core.name] = "killed"
+        return {"instances": results}
+
+    def update_config(self, cores, options):
+        """
+        Applies {"concurrency": N, "cpu_affinity": "0-7", "cpu_priority": "below_normal", "restart": false}
+        (every key optional) to the selected instances. A new concurrency is saved to fishtest.cfg and used
+        from the next start; with "restart": true running workers restart with it once their task is done.
+        CPU settings are saved to manager.cfg and apply from the next start. Every instance reports what
+        changed; "failed" lists those where saving did not work.
+        """
+        unknown = set(options) - {"concurrency", "cpu_affinity", "cpu_priority", "restart"}
+        if unknown:
+            raise ApiError(400, f"unknown setting(s): {', '.join(sorted(unknown))}")
+        concurrency = options.get("concurrency")
+        if concurrency is not None and (isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1):
+            raise ApiError(400, "concurrency must be a positive integer")
+        for key in ("cpu_affinity", "cpu_priority"):
+            if not isinstance(options.get(key, ""), str):
+                raise ApiError(400, f"{key} must be a string")
+        # Invalid values are refused before anything changes; only saving can fail per instance
+        if "cpu_affinity" in options:
+            try:
+                process_tuning.parse_cpu_list(options["cpu_affinity"])
+            except ValueError as e:
+                raise ApiError(400, f"invalid cpu_affinity: {e}") from None
+        if options.get("cpu_priority", process_tuning.DEFAULT_PRIORITY) not in process_tuning.PRIORITIES:
+            raise ApiError(400, f"cpu_priority must be one of: {', '.join(process_tuning.PRIORITIES)}")
+
+        results, failed = {}, []
+        for core in cores:
+            done = []
+            try:
+                if "cpu_affinity" in options or "cpu_priority" in options:
+                    error = self.manager.set_process_settings(
+                        core.name, options.get("cpu_affinity", process_tuning.format_cpu_list(core.cpu_affinity)),
+                        options.get("cpu_priority", core.cpu_priority))
+                    if error:
+                        raise ValueError(error)
+                    done.append("CPU settings saved")
+                if concurrency is not None:
+                    if options.get("restart") and core.worker_process is not None and not core.stop_requested:
+                        if not core.restart_with_concurrency(concurrency):
+                            raise ValueError("could not ask the worker to stop, see the log")
+                        done.append(f"restarting with {concurrency} cores after the current task")
+                    else:
+                        core.config.set('parameters', 'concurrency', str(concurrency))
+                        if not core.save_config():
+                            raise ValueError(f"could not save {core.config_file}, see the log")
+                        done.append(f"{concurrency} cores saved")
+                if core.worker_process is not None and not (concurrency is not None and options.get("restart")):
+                    done.append("applies from the next start")
+            except (OSError, ValueError) as e:
+                failed.append(core.name)
+                done.append(f"failed: {e}")
+            results[core.name] = ", ".join(done) or "nothing to change"
+            core.write_status_file()
+            core.on_state_changed()
+        return {"instances": results, "failed": failed}
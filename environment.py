@@ -0,0 +1,100 @@
+import os
+import time
+
+# --- Constants ---
+RECHECK_SECONDS = 1.0       # Cached facts are trusted this long before the folders are stat'ed again
+REPLACE_RETRIES = 5         # os.replace attempts while another process (the worker) has the file open
+REPLACE_RETRY_DELAY = 0.05
+
+
+def file_signature(path):
+    """ (mtime_ns, size) of a file or folder, or None if it does not exist. Changes whenever it is rewritten. """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_config_atomic(config, path):
+    """
+    Writes a ConfigParser to `path` through a temporary file and a rename, so a crash or a full disk
+    mid-write leaves either the old or the new file, never a truncated one.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        config.write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            # Windows refuses to replace a file another process is reading; that takes milliseconds
+            if attempt == REPLACE_RETRIES - 1:
+                os.remove(tmp_path)
+                raise
+            time.sleep(REPLACE_RETRY_DELAY)
+
+
+class EnvironmentState:
+    """
+    Cached answers to "is MSYS2 installed", "is the worker installed" and similar questions.
+
+    Creating, deleting or renaming a file changes the modification time of its folder, so instead of
+    probing every file on every call, the few folders that contain them are stat'ed, at most once per
+    RECHECK_SECONDS, and the files are only probed again when one of those folders changed. Call
+    invalidate() after changing the files yourself to see the change right away.
+    """
+
+    def __init__(self, worker_dir, msys2_path, clock=time.monotonic):
+        self.clock = clock
+        self._probes = {
+            "msys2_installed": os.path.join(msys2_path, "msys2_shell.cmd"),
+            "msys2_uninstaller": os.path.join(msys2_path, "uninstall.exe"),
+            "worker_dir_exists": worker_dir,
+            "worker_installed": os.path.join(worker_dir, "worker.py"),
+        }
+        self._folders = sorted({os.path.dirname(path) for path in self._probes.values()})
+        self._signatures = None
+        self._checked_at = 0.0
+        self._facts = {}
+        self.probes = 0    # Times the files were actually probed, for diagnostics
+
+    def invalidate(self):
+        self._signatures = None
+
+    def refresh(self):
+        """ Re-probes the files if a watched folder changed. Returns True if the facts were re-read. """
+        now = self.clock()
+        if self._signatures is not None and now - self._checked_at < RECHECK_SECONDS:
+            return False
+        self._checked_at = now
+        signatures = [file_signature(folder) for folder in self._folders]
+        if signatures == self._signatures:
+            return False
+        self._signatures = signatures
+        self._facts = {name: os.path.exists(path) for name, path in self._probes.items()}
+        self.probes += 1
+        return True
+
+    def _fact(self, name):
+        self.refresh()
+        return self._facts[name]
+
+    @property
+    def msys2_installed(self):
+        return self._fact("msys2_installed")
+
+    @property
+    def msys2_uninstaller_exists(self):
+        return self._fact("msys2_uninstaller")
+
+    @property
+    def worker_dir_exists(self):
+        return self._fact("worker_dir_exists")
+
+    @property
+    def worker_installed(self):
+        return self._fact("worker_installed")
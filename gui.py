@@ -0,0 +1,1147 @@
+import customtkinter as ctk
+import itertools
+import tkinter.scrolledtext
+import tkinter.messagebox
+import threading
+import os
+import sys
+import time
+import instances
+import log_filter
+import log_ingest
+import process_tuning
+import resource_monitor
+import startup_profile
+import task_history
+import ui_diagnostics
+# Rarely used paths (update check, elevation, installation, auto-tune, links) import their modules on first use,
+# so they do not slow down the first paint: release_check, ctypes, webbrowser, autotune, installer
+from common import (APP_NAME, APP_VERSION, REPO_OWNER, REPO_NAME, WORKER_DIR, MSYS2_PATH, CONFIG_FILE_NAME,
+                    get_asset_path)
+
+# --- Constants ---
+UI_FRAME_MS = 33                 # Interval at which queued output and callbacks are applied (~30 fps)
+UI_MAX_ITEMS_PER_FRAME = 2000    # Upper bound of queued items handled in one frame to keep the window responsive
+LOG_VIEW_LINES = 5000            # Most recent records rendered in the log viewer
+LOG_VIEW_TRIM_SLACK = 500        # Extra lines allowed before trimming, so the widget is trimmed in chunks
+LOG_SEARCH_DELAY_MS = 300        # Typing pause after which the log search runs
+HISTORY_VIEW_TASKS = 500         # Most recent tasks listed in the task history window
+SPARKLINE_WIDTH = 150            # Size of the resource monitor sparklines, in pixels
+SPARKLINE_HEIGHT = 28
+
+class FishtestManagerApp(ctk.CTk):
+    def __init__(self):
+        super().__init__()
+        startup_profile.mark("Tk init")
+
+        self.calls = log_ingest.CallQueue()
+        self.diagnostics = None
+        self.diagnostics_label = None
+        self.instances = instances.InstanceManager(self.calls)
+        # The primary instance keeps the big START/STOP controls; extra instances get a row each
+        self.supervisor = self.instances.primary
+        for core in self.instances:
+            self._attach_instance(core)
+        self.config = self.supervisor.config
+        self.log_view_lines = 0
+        self.log_query = log_filter.LogQuery()   # What the log view shows (see _apply_log_filter)
+        self._log_filter_generation = 0          # Results of an older filter or search are dropped
+        self._log_search_after = None
+        self.instance_rows = {}
+
+        self._setup_window()
+        self._create_widgets()
+        startup_profile.mark("widgets")
+        self.instances.start()
+        self._load_config()
+        startup_profile.mark("config load")
+        self.after(100, self._initial_environment_check)
+        self.after(101, self._update_all_controls_state) # Defer check to allow window to draw
+        self.after(UI_FRAME_MS, self._drain_ui_queue)
+        self.bind("<Control-D>", self._toggle_diagnostics_overlay)  # Ctrl+Shift+D
+        if ui_diagnostics.active():
+            self._enable_diagnostics()
+
+        # Start update check in background
+        self.after(2000, self._check_latest_version)
+
+        self.protocol("WM_DELETE_WINDOW", self._on_closing)
+
+    def _is_admin(self):
+        try:
+            import ctypes
+            return ctypes.windll.shell32.IsUserAnAdmin()
+        except:
+            return False
+
+    def _setup_window(self):
+        self.title(f"{APP_NAME} ({APP_VERSION})")
+        self.geometry("900x650")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(3, weight=1)
+        self.iconbitmap(get_asset_path("icon.ico"))
+
+    def _create_widgets(self):
+        # --- Top Control Frame ---
+        top_frame = ctk.CTkFrame(self)
+        top_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+        top_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
+
+        self.setup_button = ctk.CTkButton(top_frame, text="Install/Re-Install Worker", command=lambda: self._run_with_elevation(self._run_full_setup, 'install'))
+        self.setup_button.grid(row=0, column=0, padx=5, pady=10)
+
+        self.update_button = ctk.CTkButton(top_frame, text="Update MSYS2 Environment", command=lambda: self._run_with_elevation(self._update_msys2, 'update'))
+        self.update_button.grid(row=0, column=1, padx=5, pady=10)
+
+        self.update_worker_button = ctk.CTkButton(top_frame, text="Update Worker Files", command=self._update_worker_files)
+        self.update_worker_button.grid(row=0, column=2, padx=5, pady=10)
+
+        self.settings_button = ctk.CTkButton(top_frame, text="Settings", command=self._open_settings_window)
+        self.settings_button.grid(row=0, column=3, padx=5, pady=10)
+
+        self.uninstall_button = ctk.CTkButton(top_frame, text="Uninstall...", command=self._handle_uninstall_click, fg_color="#C00000", hover_color="#A00000")
+        self.uninstall_button.grid(row=0, column=4, padx=5, pady=10)
+
+        # --- Update Notification Button (created when an update is found) ---
+        self.top_frame = top_frame
+        self.new_version_button = None
+
+        # --- Main Action Frame ---
+        action_frame = ctk.CTkFrame(self, fg_color="transparent")
+        action_frame.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
+        action_frame.grid_columnconfigure(0, weight=1)
+
+        self.worker_button = ctk.CTkButton(action_frame, text="START WORKER", command=self._toggle_worker, height=50, font=("Arial", 16, "bold"))
+        self.worker_button.grid(row=0, column=0, padx=200, pady=5, sticky="ew")
+        self.worker_button.bind("<Button-3>", self._force_stop_worker_event) # Right-click to force stop
+
+        self.status_label = ctk.CTkLabel(action_frame, text="Status: Initializing...", font=("Arial", 14))
+        self.status_label.grid(row=1, column=0, pady=(5,0))
+
+        # --- Progress bar for worker tasks ---
+        self.task_progress_label = ctk.CTkLabel(action_frame, text="", font=("Arial", 12))
+        self.task_progress_label.grid(row=2, column=0, pady=(5,0), sticky="ew")
+
+        self.task_progress_bar = ctk.CTkProgressBar(action_frame)
+        self.task_progress_bar.grid(row=3, column=0, padx=50, pady=(5,10), sticky="ew")
+        self.task_progress_bar.set(0)
+
+        # Initially hide them until the worker starts
+        self.task_progress_label.grid_remove()
+        self.task_progress_bar.grid_remove()
+
+        # --- Resource monitor (created when the first sample arrives) ---
+        self.action_frame = action_frame
+        self.resource_frame = None
+
+        # --- Installation steps (created when an installation starts) ---
+        self.install_frame = None
+        self.install_rows = {}
+
+        # --- Instances Frame ---
+        self.instances_frame = ctk.CTkFrame(self)
+        self.instances_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="ew")
+        self.instances_frame.grid_columnconfigure(2, weight=1)
+
+        header = ctk.CTkFrame(self.instances_frame, fg_color="transparent")
+        header.grid(row=0, column=0, columnspan=6, padx=5, pady=5, sticky="ew")
+        header.grid_columnconfigure(0, weight=1)
+        self.instances_label = ctk.CTkLabel(header, text="", font=("Arial", 12, "bold"))
+        self.instances_label.grid(row=0, column=0, padx=5, sticky="w")
+        self.start_all_button = ctk.CTkButton(header, text="Start All", width=90, command=self._start_all_workers)
+        self.start_all_button.grid(row=0, column=1, padx=5)
+        self.stop_all_button = ctk.CTkButton(header, text="Stop All", width=90, command=self._stop_all_workers)
+        self.stop_all_button.grid(row=0, column=2, padx=5)
+        self.split_cores_button = ctk.CTkButton(header, text="Split Cores", width=90, command=self._split_cores)
+        self.split_cores_button.grid(row=0, column=3, padx=5)
+        self.add_instance_button = ctk.CTkButton(header, text="Add Instance...", width=110, command=self._open_add_instance_window)
+        self.add_instance_button.grid(row=0, column=4, padx=5)
+        self.history_button = ctk.CTkButton(header, text="Task History", width=100, command=self._open_history_window)
+        self.history_button.grid(row=0, column=5, padx=5)
+        self._rebuild_instance_rows()
+
+        # --- Log Frame ---
+        log_frame = ctk.CTkFrame(self)
+        log_frame.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        log_frame.grid_rowconfigure(1, weight=1)
+        log_frame.grid_columnconfigure(0, weight=1)
+        self.log_frame = log_frame
+        self._create_log_filter_bar(log_frame)
+
+        self.log_text = tkinter.scrolledtext.ScrolledText(log_frame, wrap=ctk.WORD, state='disabled',
+                                                          bg="#2B2B2B", fg="#DCE4EE", font=("Consolas", 10),
+                                                          relief="flat", borderwidth=0)
+        self.log_text.grid(row=1, column=0, sticky="nsew")
+
+        # --- Color Tags ---
+        self.log_text.tag_config("INFO", foreground="#4FC1FF")      # Light Blue
+        self.log_text.tag_config("WARNING", foreground="#FFD700")   # Gold/Yellow
+        self.log_text.tag_config("ERROR", foreground="#FF453A")     # Red
+        self.log_text.tag_config("SUCCESS", foreground="#32D74B")   # Bright Green
+        self.log_text.tag_config("FATAL", foreground="#FF00FF")     # Magenta
+        self.log_text.tag_config("TIMESTAMP", foreground="#808080") # Gray
+        self.log_text.tag_config("WORKER", foreground="#DCE4EE")    # Standard Text
+        self.log_text.tag_config("CMD", foreground="#B0B0B0")       # Dimmer Text for shell output
+        self.log_text.tag_config("MATCH", background="#5A4A00")     # Search hits
+        self.log_text.tag_config("CURRENT_MATCH", background="#B08900", foreground="#000000")
+        self.log_text.tag_raise("CURRENT_MATCH")
+
+    def _create_log_filter_bar(self, log_frame):
+        """ Level toggles and a search box above the log (see log_filter.py). """
+        bar = ctk.CTkFrame(log_frame, fg_color="transparent")
+        bar.grid(row=0, column=0, padx=5, pady=(5, 0), sticky="ew")
+        self.log_level_vars = {}
+        for level in log_filter.LEVELS:
+            var = self.log_level_vars[level] = tkinter.BooleanVar(value=True)
+            ctk.CTkCheckBox(bar, text=level.capitalize(), variable=var, command=self._apply_log_filter, width=0,
+                            checkbox_width=14, checkbox_height=14, font=("", 11)).pack(side="left", padx=(0, 8))
+
+        self.log_filter_label = ctk.CTkLabel(bar, text="", font=("", 11), width=0)
+        self.log_filter_label.pack(side="right", padx=(5, 0))
+        ctk.CTkButton(bar, text="\u25bc", width=26, height=24, command=self._jump_to_log_match).pack(side="right", padx=1)
+        ctk.CTkButton(bar, text="\u25b2", width=26, height=24,
+                      command=lambda: self._jump_to_log_match(backwards=True)).pack(side="right", padx=1)
+        self.log_regex_var = tkinter.BooleanVar(value=False)
+        ctk.CTkCheckBox(bar, text="Regex", variable=self.log_regex_var, command=self._apply_log_filter, width=0,
+                        checkbox_width=14, checkbox_height=14, font=("", 11)).pack(side="right", padx=5)
+        self.log_search_entry = ctk.CTkEntry(bar, placeholder_text="Search log (Ctrl+F)", width=170, height=24)
+        self.log_search_entry.pack(side="right")
+        self.log_search_entry.bind("<KeyRelease>", self._on_log_search_typed)
+        self.log_search_entry.bind("<Return>", lambda event: self._jump_to_log_match())
+        self.log_search_entry.bind("<Shift-Return>", lambda event: self._jump_to_log_match(backwards=True))
+        self.log_search_entry.bind("<Escape>", lambda event: self._clear_log_search())
+        self.bind("<Control-f>", lambda event: self.log_search_entry.focus_set())
+
+    # --- Configuration and State Management ---
+    def _load_config(self):
+        self.supervisor.load_config()
+        self.status_label.configure(text=f"Status: Idle | User: {self.supervisor.username} | Cores: {self.supervisor.concurrency}")
+
+    def _save_config(self):
+        if self.supervisor.save_config():
+            self._load_config()
+
+    def _initial_environment_check(self):
+        """ Log initial environment status without changing UI components. """
+        if self.supervisor.launcher.needs_msys2 and not self.supervisor.is_msys2_installed():
+            self.add_log("MSYS2 not found. Please run 'Install/Re-Install Worker'.")
+        elif not self.supervisor.is_worker_installed() and not self.supervisor.launcher.needs_msys2:
+            self.add_log(f"Worker files are missing. 'Install/Re-Install Worker' is Windows-only: set up the fishtest worker "
+                         f"in '{os.path.abspath(WORKER_DIR)}' by hand (worker.py and its Python environment in 'env').", level="WARNING")
+        elif not self.supervisor.is_worker_installed():
+            self.add_log("Worker files are missing. Run 'Install/Re-Install Worker' to set them up.")
+        else:
+            self.add_log("Full environment setup is complete.", level="SUCCESS")
+            if not self.supervisor.has_credentials():
+                self.add_log("Before starting the worker, open the 'Settings' and enter your Fishtest username and password. Then, click 'START WORKER'.")
+                self.after(500, self._open_settings_window)
+            else:
+                self.add_log("You may now start the worker by clicking 'START WORKER'.")
+
+    def _update_all_controls_state(self):
+        """ Master function to set the state of all controls based on app state. """
+        self._update_instance_controls()
+
+        # Case 1: Worker is running
+        if self.supervisor.is_worker_running():
+            for button in [self.setup_button, self.update_button, self.update_worker_button, self.settings_button, self.uninstall_button]:
+                button.configure(state='disabled')
+            if self.supervisor.pending_concurrency is not None:
+                self.worker_button.configure(text=f"SWITCHING TO {self.supervisor.pending_concurrency} CORES...", state="disabled")
+            elif self.supervisor.stop_requested:
+                self.worker_button.configure(text="STOPPING...", state="disabled")
+            else:
+                self.worker_button.configure(text="STOP WORKER", fg_color="#C00000", hover_color="#A00000", state="normal")
+            self.status_label.configure(text=f"Status: Running | User: {self.supervisor.username} | Cores: {self.supervisor.concurrency}")
+            return
+
+        # Case 2: A long setup/update/uninstall operation is running
+        if self.supervisor.is_long_operation_running:
+            for button in [self.setup_button, self.update_button, self.update_worker_button, self.settings_button, self.uninstall_button, self.worker_button]:
+                button.configure(state='disabled')
+            self.status_label.configure(text=f"Status: {self.supervisor.current_operation}...")
+            return
+
+        # Case 3: App is idle
+        self._load_config()  # This will refresh the status label to Idle
+        watchdog = self.supervisor.watchdog
+        if watchdog.restart_pending:
+            restart_time = time.strftime("%H:%M:%S", time.localtime(time.time() + watchdog.restart_at - watchdog.clock()))
+            self.status_label.configure(text=f"Status: Restarting at {restart_time} (attempt {watchdog.failures}) | User: {self.supervisor.username} | Cores: {self.supervisor.concurrency}")
+        elif watchdog.gave_up:
+            self.status_label.configure(text=f"Status: Stopped after {watchdog.failures} failed restarts | User: {self.supervisor.username} | Cores: {self.supervisor.concurrency}")
+
+        msys2_installed = self.supervisor.is_msys2_installed()
+        worker_installed = self.supervisor.is_worker_installed()
+        worker_dir_exists = self.supervisor.environment.worker_dir_exists
+        msys2_uninstaller_exists = self.supervisor.environment.msys2_uninstaller_exists
+
+        # The installer and MSYS2 only exist on Windows; elsewhere the worker is set up by hand
+        needs_msys2 = self.supervisor.launcher.needs_msys2
+        self.setup_button.configure(state='normal' if needs_msys2 else 'disabled')
+        self.settings_button.configure(state='normal')
+        self.update_button.configure(state='normal' if needs_msys2 and msys2_installed else 'disabled')
+        self.update_worker_button.configure(state='normal' if worker_installed else 'disabled')
+        self.worker_button.configure(state='normal' if worker_installed else 'disabled',
+                                     text="START WORKER", fg_color="#1F6AA5", hover_color="#144870")
+        if watchdog.restart_pending:
+            self.worker_button.configure(text="CANCEL RESTART", fg_color="#C00000", hover_color="#A00000")
+
+        if worker_dir_exists:
+            self.uninstall_button.configure(text="Delete Worker Folder", state='normal')
+        elif msys2_uninstaller_exists and needs_msys2:
+            self.uninstall_button.configure(text="Uninstall MSYS2", state='normal')
+        else:
+            self.uninstall_button.configure(text="Uninstall", state='disabled')
+
+        # Extra instances run in the same MSYS2 environment, so keep it untouched while any of them runs
+        if self.instances.any_running():
+            for button in [self.setup_button, self.update_button, self.update_worker_button, self.uninstall_button]:
+                button.configure(state='disabled')
+
+    # --- Update Checker Logic ---
+    def _check_latest_version(self):
+        """ Reports the latest release; only asks GitHub (in a background thread) when the shared cached answer is stale. """
+        import release_check
+        try:
+            url, hours = instances.load_release_check_settings()
+        except ValueError as e:
+            self.add_log(f"Ignoring invalid [update] settings in manager.cfg: {e}", level="WARNING")
+            url, hours = release_check.RELEASES_URL, release_check.CHECK_TTL_SECONDS / 3600
+        if hours <= 0:
+            return
+        check = release_check.ReleaseCheck(url, ttl=hours * 3600)
+        state = check.load()
+        if check.due(state):
+            threading.Thread(target=lambda: self._post_ui(self._on_release_checked, check.run()), daemon=True).start()
+        else:
+            self._on_release_checked(check.cached(state))
+
+    def _on_release_checked(self, result):
+        import release_check
+        if result.message:
+            self.add_log(result.message, level="WARNING" if result.status == "failed" else "INFO")
+        if not result.tag:
+            return
+        if release_check.is_newer(result.tag, APP_VERSION):
+            self._show_update_notification(result.tag)
+        elif result.status != "failed":
+            age = time.time() - result.checked_at if result.checked_at else 0
+            checked = "just checked" if age < 60 else f"checked {age / 3600:.1f} h ago"
+            self.add_log(f"You are using the latest version of the app ({APP_VERSION}, {checked}).")
+
+    def _show_update_notification(self, latest_tag):
+        if self.new_version_button is None:
+            self.new_version_button = ctk.CTkButton(self.top_frame, text="New Version Available!",
+                                                    command=self._open_release_page,
+                                                    fg_color="#229965", hover_color="#1F7A52", text_color="white")
+            self.new_version_button.grid(row=1, column=0, columnspan=5, padx=5, pady=(0, 10), sticky="ew")
+        self.new_version_button.configure(text=f"New Version Available: {latest_tag}")
+        self.add_log(f"A new version of the Manager is available ({latest_tag}).")
+
+    def _open_release_page(self):
+        self._open_url(f"https://github.com/{REPO_OWNER}/{REPO_NAME}/releases/latest")
+
+    def _open_url(self, url):
+        import webbrowser
+        webbrowser.open(url)
+
+    # --- Core Actions ---
+    def _run_with_elevation(self, action_func, action_arg_name):
+        """ Checks for admin rights. If not present, re-launches the app with elevation. If present, runs the action. """
+        if self._is_admin():
+            action_func()
+        else:
+            try:
+                # Use sys.argv[0] for robustness (works for .py and frozen .exe)
+                script_path = os.path.abspath(sys.argv[0])
+                # We need to pass the script path and our argument to the new elevated process
+                params = f'"{script_path}" --run-as-admin={action_arg_name}'
+                import ctypes
+                ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, params, None, 1)
+                self.instances.shutdown()
+                self.destroy()  # Close the current non-admin window
+            except Exception as e:
+                tkinter.messagebox.showerror("Elevation Failed", f"Could not re-launch with admin rights: {e}")
+
+    def _run_full_setup(self):
+        import installer  # Only needed here; keeps zipfile out of the startup path
+        user = self.config.get('login', 'username')
+        password = self.config.get('login', 'password')
+        cores = self.config.get('parameters', 'concurrency')
+        app_dir = os.path.abspath(".")
+        pipeline = installer.InstallPipeline(
+            installer.worker_install_steps(app_dir, WORKER_DIR, MSYS2_PATH, self.instances.artifact_cache, user, password, cores),
+            installer.install_fingerprint(user, password, cores, app_dir, MSYS2_PATH))
+
+        message = "This will install the MSYS2 environment and download the fishtest worker files.\nThis may take several minutes.\n\nNote: Any existing 'worker' folder in this directory will be deleted and replaced.\n\nContinue?"
+        resume_point = pipeline.resume_point()
+        if resume_point:
+            message = message.replace("\n\nContinue?", f"\n\nA previous installation did not finish; it continues at '{resume_point}'.\n\nContinue?")
+        if not tkinter.messagebox.askyesno("Confirm Installation", message):
+            return
+
+        self.supervisor.run_pipeline(pipeline, "Installing MSYS2 and the worker", on_complete=self._on_worker_installed)
+
+    def _on_worker_installed(self):
+        # pacman and pip added to the cache; trim it to its cap without blocking the window
+        threading.Thread(target=self.instances.artifact_cache.evict, daemon=True).start()
+        self._initial_environment_check()
+
+    def _update_msys2(self):
+        command = f'"{get_asset_path("04_update_msys2.cmd")}"'
+        self._run_command_in_thread(
+            command,
+            start_message="--- Updating MSYS2 environment ---",
+            end_message="--- MSYS2 Update finished ---"
+        )
+
+    def _update_worker_files(self):
+        """ Replaces only the worker files that changed upstream; the environment, settings and nets stay. """
+        error = self.instances.update_worker_files(on_complete=self._initial_environment_check)
+        if error:
+            self.add_log(error, level="WARNING")
+
+    def _handle_uninstall_click(self):
+        self.supervisor.environment.invalidate()  # Act on the current state of the disk, not a cached one
+        worker_dir_exists = self.supervisor.environment.worker_dir_exists
+        msys2_uninstaller_exists = self.supervisor.environment.msys2_uninstaller_exists
+
+        if worker_dir_exists and not self.supervisor.launcher.needs_msys2:
+            self._delete_worker_folder()
+        elif worker_dir_exists:
+            self._run_with_elevation(self._delete_worker_folder, 'delete_worker')
+        elif msys2_uninstaller_exists and self.supervisor.launcher.needs_msys2:
+            self._run_with_elevation(self._uninstall_msys2, 'uninstall_msys2')
+
+    def _delete_worker_folder(self):
+        if not tkinter.messagebox.askyesno("Confirm Deletion",
+                                           "WARNING: This is a destructive action.\n\n"
+                                           "This will permanently delete the 'worker' folder and all its contents, including your configuration file.\n\n"
+                                           "Are you sure you want to continue?",
+                                           icon='warning'):
+            return
+
+        if not self.supervisor.launcher.needs_msys2:
+            self.supervisor.delete_worker_folder(on_complete=self._initial_environment_check)
+            self._update_all_controls_state()
+            return
+
+        worker_dir_abs = os.path.abspath(WORKER_DIR)
+        command = f'if exist "{worker_dir_abs}" (echo Removing worker directory... & rd /s /q "{worker_dir_abs}") else (echo Worker directory not found.)'
+
+        self._run_command_in_thread(
+            command,
+            start_message="--- Deleting worker folder ---",
+            end_message="--- Worker folder deleted ---"
+        )
+
+    def _uninstall_msys2(self):
+        if not tkinter.messagebox.askyesno("Confirm Uninstallation",
+                                           "WARNING: This is a destructive action.\n\n"
+                                           "This will run the MSYS2 uninstaller and remove the entire MSYS2 environment.\n\n"
+                                           "Are you sure you want to continue?",
+                                           icon='warning'):
+            return
+
+        msys2_uninstaller = os.path.join(MSYS2_PATH, "uninstall.exe")
+        command = f'if exist "{msys2_uninstaller}" (echo Uninstalling MSYS2... & start /wait "" "{msys2_uninstaller}" /S) else (echo MSYS2 not found.)'
+
+        self._run_command_in_thread(
+            command,
+            start_message="--- Starting MSYS2 Uninstallation ---",
+            end_message="--- MSYS2 Uninstallation finished ---"
+        )
+
+    # --- Worker Start/Stop Logic ---
+    def _toggle_worker(self):
+        # Check if the object exists, rather than checking if Windows thinks it's running.
+        if self.supervisor.worker_process is not None:
+            self._stop_worker_gracefully()
+        elif self.supervisor.watchdog.cancel_restart():
+            self._update_all_controls_state()
+        else:
+            self._start_worker()
+
+    def _start_worker(self):
+        if self.install_frame is not None:
+            self.install_frame.grid_remove()
+        self._show_progress_widgets()
+        self.supervisor.start_worker()
+
+    def _show_progress_widgets(self):
+        # Reset the progress widgets and make them visible
+        self.task_progress_bar.set(0)
+        self.task_progress_label.configure(text="")
+        self.task_progress_label.grid()
+        self.task_progress_bar.grid()
+
+    def _stop_worker_gracefully(self):
+        self.worker_button.configure(text="STOPPING...", state="disabled")
+        if not self.supervisor.stop_worker_gracefully():
+            # Re-enable button if the stop request failed
+            self._update_all_controls_state()
+
+    def _force_stop_worker_event(self, event):
+        # Check if the object exists, rather than checking if Windows thinks it's running.
+        if self.supervisor.worker_process is not None:
+            if tkinter.messagebox.askyesno("Force Stop", "Are you sure you want to force stop the worker? Current game progress may be lost."):
+                self.supervisor.stop_worker_forcefully()
+
+    # --- Worker instances ---
+    def _attach_instance(self, core):
+        timed = self._timed
+        if core is self.instances.primary:
+            core.on_logs = timed("_render_log_records", self._render_log_records)
+            core.on_state_changed = timed("_on_worker_state_changed", self._on_worker_state_changed)
+            core.on_progress_changed = timed("_update_progress_display", self._update_progress_display)
+            core.on_resources_changed = timed("_update_resource_display", self._update_resource_display)
+            core.on_steps_changed = timed("_update_install_display", self._update_install_display)
+        else:
+            core.on_logs = timed("_render_log_records", lambda records, name=core.name: self._render_log_records(records, name))
+            core.on_state_changed = self._update_all_controls_state  # Timed itself while diagnostics are on
+            core.on_progress_changed = timed("_update_instance_row", lambda core=core: self._update_instance_row(core))
+            core.on_resources_changed = timed("_update_instance_row", lambda core=core: self._update_instance_row(core))
+
+    def _rebuild_instance_rows(self):
+        """ Creates one row (name, state, progress, start/stop, remove) per extra instance. """
+        for widgets in self.instance_rows.values():
+            for widget in widgets.values():
+                widget.destroy()
+        self.instance_rows = {}
+
+        for row, core in enumerate((core for core in self.instances if core is not self.instances.primary), start=1):
+            widgets = {
+                "name": ctk.CTkLabel(self.instances_frame, text=core.name, width=90, anchor="w"),
+                "state": ctk.CTkLabel(self.instances_frame, text="", width=150, anchor="w"),
+                "progress": ctk.CTkLabel(self.instances_frame, text="", anchor="w"),
+                "bar": ctk.CTkProgressBar(self.instances_frame, width=120),
+                "button": ctk.CTkButton(self.instances_frame, text="Start", width=70,
+                                        command=lambda core=core: self._toggle_instance(core)),
+                "remove": ctk.CTkButton(self.instances_frame, text="Remove", width=70, fg_color="#555555", hover_color="#444444",
+                                        command=lambda core=core: self._remove_instance(core)),
+            }
+            for column, key in enumerate(("name", "state", "progress", "bar", "button", "remove")):
+                widgets[key].grid(row=row, column=column, padx=5, pady=(0, 5), sticky="ew" if key == "progress" else "w")
+            widgets["button"].bind("<Button-3>", lambda event, core=core: self._force_stop_instance(core))  # Right-click to force stop
+            self.instance_rows[core.name] = widgets
+            self._update_instance_row(core)
+
+    def _update_instance_row(self, core):
+        widgets = self.instance_rows.get(core.name)
+        if widgets is None:
+            return
+        state_text = f"{core.state().capitalize()} | Cores: {core.concurrency}"
+        if core.worker_process is not None and core.resources.last is not None:
+            state_text += f" | CPU {core.resources.last.cpu_percent / 100:.1f}"
+        widgets["state"].configure(text=state_text)
+        widgets["progress"].configure(text=core.progress_text() if core.worker_process is not None else "")
+        widgets["bar"].set(core.progress_fraction() if core.worker_process is not None else 0)
+        if core.watchdog.restart_pending:
+            widgets["button"].configure(text="Cancel", state='normal')
+            widgets["remove"].configure(state='disabled')
+        elif core.worker_process is None:
+            # The install steps and the worker update change the files every instance runs from
+            busy = core.is_long_operation_running or self.supervisor.is_long_operation_running
+            widgets["button"].configure(text="Start", state='normal' if core.is_worker_installed() and not busy else 'disabled')
+            widgets["remove"].configure(state='disabled' if busy else 'normal')
+        else:
+            widgets["button"].configure(text="Stopping" if core.stop_requested else "Stop",
+                                        state='disabled' if core.stop_requested else 'normal')
+            widgets["remove"].configure(state='disabled')
+
+    def _update_instance_controls(self):
+        running = sum(core.worker_process is not None for core in self.instances)
+        self.instances_label.configure(text=f"Instances: {running} of {len(self.instances)} running")
+        busy = self.supervisor.is_long_operation_running
+        self.start_all_button.configure(state='disabled' if busy or running == len(self.instances) else 'normal')
+        self.stop_all_button.configure(state='normal' if running else 'disabled')
+        self.split_cores_button.configure(state='disabled' if busy else 'normal')
+        self.add_instance_button.configure(state='normal' if self.supervisor.is_worker_installed() and not busy else 'disabled')
+        for core in self.instances:
+            self._update_instance_row(core)
+
+    def _toggle_instance(self, core):
+        if core.worker_process is not None:
+            core.stop_worker_gracefully()
+        elif core.watchdog.cancel_restart():
+            pass
+        elif core.is_long_operation_running or self.supervisor.is_long_operation_running:
+            core.log(f"Instance '{core.name}' is busy ({(core.current_operation or self.supervisor.current_operation).lower()}); "
+                     "start it once that has finished.", level="WARNING")
+        elif not core.has_credentials():
+            core.log(f"Instance '{core.name}' has no Fishtest credentials in '{core.config_file}'.", level="ERROR")
+        else:
+            core.start_worker()
+        self._update_all_controls_state()
+
+    def _force_stop_instance(self, core):
+        if core.worker_process is not None:
+            if tkinter.messagebox.askyesno("Force Stop", f"Are you sure you want to force stop instance '{core.name}'? Current game progress may be lost."):
+                core.stop_worker_forcefully()
+
+    def _start_all_workers(self):
+        if self.supervisor.worker_process is None and self.supervisor.is_worker_installed() and self.supervisor.has_credentials():
+            self._show_progress_widgets()
+        self.instances.start_all()
+        self._update_all_controls_state()
+
+    def _stop_all_workers(self):
+        self.instances.stop_all()
+        self._update_all_controls_state()
+
+    def _split_cores(self):
+        total = os.cpu_count() or 1
+        if not tkinter.messagebox.askyesno("Split Cores", f"Divide {total} cores over {len(self.instances)} instance(s) and save each {CONFIG_FILE_NAME}?\n\n"
+                                                         "Running instances use the new value after their next start."):
+            return
+        self.instances.split_cores(total)
+        self._update_all_controls_state()
+
+    def _remove_instance(self, core):
+        if not tkinter.messagebox.askyesno("Remove Instance", f"Stop managing instance '{core.name}'?\n\nIts folder '{core.worker_dir}' is kept on disk."):
+            return
+        if self.instances.remove_instance(core.name):
+            self.add_log(f"Instance '{core.name}' removed. Its folder was kept.")
+            self._rebuild_instance_rows()
+            self._update_all_controls_state()
+
+    def _open_add_instance_window(self):
+        win = ctk.CTkToplevel(self)
+        win.title("Add Instance"); win.geometry("400x260"); win.transient(self); win.grab_set()
+
+        ctk.CTkLabel(win, text="Instance Name:").pack(pady=(10,0))
+        name_entry = ctk.CTkEntry(win, width=250); name_entry.pack()
+
+        ctk.CTkLabel(win, text="Concurrency (Cores):").pack(pady=(10,0))
+        cores_entry = ctk.CTkEntry(win, width=250); cores_entry.pack()
+
+        error_label = ctk.CTkLabel(win, text="", text_color="#FF453A")
+        error_label.pack(pady=(5,0))
+
+        name_entry.insert(0, str(len(self.instances) + 1))
+        cores_entry.insert(0, self.supervisor.concurrency)
+
+        def on_done(core):
+            self.add_instance_button.configure(state='normal')
+            if core is not None:
+                self._attach_instance(core)
+                self._rebuild_instance_rows()
+            self._update_all_controls_state()
+
+        def create():
+            name = name_entry.get().strip()
+            error = self.instances.validate_name(name)
+            if error is None and not cores_entry.get().strip().isdigit():
+                error = "Concurrency must be a whole number."
+            if error:
+                error_label.configure(text=error)
+                return
+            win.destroy()
+            self.add_instance_button.configure(state='disabled')
+            self.instances.add_instance(name, int(cores_entry.get()), on_done)
+        ctk.CTkButton(win, text="Create", command=create).pack(pady=15)
+
+    # --- Task history ---
+    def _open_history_window(self):
+        win = ctk.CTkToplevel(self)
+        win.title("Task History"); win.geometry("1000x560"); win.transient(self)
+        win.grid_columnconfigure(0, weight=1)
+        win.grid_rowconfigure(2, weight=1)
+
+        filter_frame = ctk.CTkFrame(win, fg_color="transparent")
+        filter_frame.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="ew")
+        ctk.CTkLabel(filter_frame, text="Instance:").pack(side="left", padx=(0, 5))
+        instance_menu = ctk.CTkOptionMenu(filter_frame, values=["All"] + [core.name for core in self.instances], width=140,
+                                          command=lambda _: refresh())
+        instance_menu.pack(side="left")
+        ctk.CTkButton(filter_frame, text="Refresh", width=90, command=lambda: refresh()).pack(side="left", padx=10)
+
+        totals_label = ctk.CTkLabel(win, text="Loading...", font=("Consolas", 11), justify="left", anchor="w")
+        totals_label.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        table = tkinter.scrolledtext.ScrolledText(win, wrap="none", bg="#2B2B2B", fg="#DCE4EE", font=("Consolas", 10),
+                                                  relief="flat", borderwidth=0)
+        table.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="nsew")
+
+        def show(totals, rows):
+            if not win.winfo_exists():
+                return
+            totals_label.configure(text="\n".join(task_history.format_totals(label, values) for label, values in totals))
+            table.configure(state="normal")
+            table.delete("1.0", "end")
+            table.insert("end", task_history.format_rows(rows) if rows else "No tasks recorded yet.")
+            table.configure(state="disabled")
+
+        def load(instance):
+            # SQLite queries stay off the Tk thread, like every other disk access
+            history = self.instances.task_history
+            try:
+                instances = None if instance is None else [instance]
+                totals = [(label, history.totals(since, instances)) for label, since in task_history.period_starts()]
+                rows = history.recent(HISTORY_VIEW_TASKS, instances=instances)
+            except Exception as e:
+                self.calls.post(self.add_log, f"Could not read the task history: {e}", "ERROR")
+                return
+            self.calls.post(show, totals, rows)
+
+        def refresh():
+            instance = instance_menu.get()
+            threading.Thread(target=load, args=(None if instance == "All" else instance,), daemon=True).start()
+        refresh()
+
+    # --- Concurrency auto-tune ---
+    def _autotune_concurrency(self, settings_window=None):
+        import autotune
+        import tkinter.filedialog
+        parent = settings_window or self
+        if self.instances.any_running():
+            tkinter.messagebox.showerror("Auto-tune", "Stop all workers first. The benchmark needs the CPU to itself.", parent=parent)
+            return
+        engine = autotune.find_engine(self.supervisor.worker_dir)
+        if engine is None:
+            # No task was run yet, so no engine was built: let the user point to a Stockfish binary
+            engine = tkinter.filedialog.askopenfilename(title="Choose a Stockfish binary to benchmark", parent=parent)
+            if not engine:
+                return
+
+        cached = autotune.load_cached(autotune.machine_fingerprint(engine))
+        if cached:
+            created = time.strftime('%Y-%m-%d %H:%M', time.localtime(cached["created_at"]))
+            use_cache = tkinter.messagebox.askyesno("Auto-tune", f"This machine was benchmarked on {created} (recommended concurrency: {cached['recommended']}).\n\n"
+                                                                 "Use that result? Choose 'No' to run the benchmark again.", parent=parent)
+        else:
+            use_cache = False
+            if not tkinter.messagebox.askyesno("Auto-tune", "This runs the engine benchmark at several concurrency levels to find the best setting for this machine.\n"
+                                                            "It uses all cores and may take a few minutes.\n\nContinue?", parent=parent):
+                return
+
+        if settings_window is not None:
+            settings_window.destroy()
+        self.supervisor.run_autotune(engine, use_cache, on_complete=self._apply_autotune_result)
+        self._update_all_controls_state()
+
+    def _apply_autotune_result(self, result):
+        # With several instances the recommended total is divided between them
+        self.instances.split_cores(result["recommended"])
+        self._update_all_controls_state()
+
+    # --- Update display logic to include ETA ---
+    def _update_progress_display(self):
+        """Updates the progress bar and label widgets based on the supervisor's task state."""
+        self.task_progress_bar.set(self.supervisor.progress_fraction())
+        self.task_progress_label.configure(text=self.supervisor.progress_text())
+
+    # --- Resource monitor ---
+    def _update_resource_display(self):
+        """ Refreshes the labels and sparklines from the primary worker's latest resource sample. """
+        history = self.supervisor.resources
+        sample = history.last
+        if sample is None:
+            return
+        if self.resource_frame is None:
+            self._create_resource_frame()
+        if not self.resource_frame.winfo_ismapped():
+            self.resource_frame.grid()
+
+        try:
+            cores = int(self.supervisor.concurrency)
+        except ValueError:
+            cores = 0
+        self.resource_labels["cpu"].configure(text=f"CPU {sample.cpu_percent / 100:.1f} / {cores} cores")
+        self.resource_labels["memory"].configure(text=f"Memory {resource_monitor.format_bytes(sample.rss)}")
+        self.resource_labels["threads"].configure(text=f"Threads {sample.threads} in {sample.processes} processes")
+        self.resource_labels["io"].configure(text=f"Disk I/O {resource_monitor.format_bytes(sample.read_rate + sample.write_rate)}/s")
+        self.resource_overhead_label.configure(text=f"Monitor overhead: {sample.overhead * 100:.2f}% of one core")
+
+        series = history.series
+        io = [read + write for read, write in zip(series["read_rate"].values(), series["write_rate"].values())]
+        # Scale CPU to the configured cores, so a worker that does not use its cores shows a low line
+        self._draw_sparkline("cpu", series["cpu_percent"].values(), cores * 100)
+        self._draw_sparkline("memory", series["rss"].values())
+        self._draw_sparkline("threads", series["threads"].values())
+        self._draw_sparkline("io", io)
+
+    def _create_resource_frame(self):
+        self.resource_frame = ctk.CTkFrame(self.action_frame, fg_color="transparent")
+        self.resource_frame.grid(row=4, column=0, pady=(0, 5))
+        self.resource_labels = {}
+        self.sparklines = {}
+        for column, (metric, color) in enumerate((("cpu", "#4FC1FF"), ("memory", "#32D74B"), ("threads", "#FFD700"), ("io", "#B0B0B0"))):
+            self.resource_labels[metric] = ctk.CTkLabel(self.resource_frame, text="", font=("Arial", 11))
+            self.resource_labels[metric].grid(row=0, column=column, padx=10)
+            canvas = tkinter.Canvas(self.resource_frame, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT,
+                                    bg="#2B2B2B", highlightthickness=0)
+            canvas.grid(row=1, column=column, padx=10)
+            self.sparklines[metric] = (canvas, canvas.create_line(0, 0, 0, 0, fill=color, width=1.5))
+        self.resource_overhead_label = ctk.CTkLabel(self.resource_frame, text="", font=("Arial", 9), text_color="#808080")
+        self.resource_overhead_label.grid(row=2, column=0, columnspan=4)
+
+    # --- Installation steps ---
+    def _update_install_display(self):
+        """ One row per installation step: progress bar (animated while the step cannot tell) and status. """
+        steps = self.supervisor.install_steps
+        if self.install_frame is None or set(self.install_rows) != {step["name"] for step in steps}:
+            self._create_install_frame(steps)
+        for step in steps:
+            label, bar, status_label = self.install_rows[step["name"]]
+            running = step["status"] in ("running", "retrying")
+            if running and step["progress"] is None:
+                if bar.cget("mode") != "indeterminate":
+                    bar.configure(mode="indeterminate")
+                    bar.start()
+            else:
+                if bar.cget("mode") != "determinate":
+                    bar.stop()
+                    bar.configure(mode="determinate")
+                bar.set(step["progress"] or 0)
+            text = {"pending": "waiting", "blocked": "not run", "skipped": "done earlier"}.get(step["status"], step["status"])
+            if step["attempts"] > 1:
+                text += f" (attempt {step['attempts']})"
+            if step["elapsed"] is not None and step["status"] in ("done", "failed"):
+                text += f" - {step['elapsed']:.0f} s"
+            color = {"done": "#32D74B", "skipped": "#32D74B", "failed": "#FF453A", "blocked": "#FFD700"}.get(step["status"], "#DCE4EE")
+            status_label.configure(text=text, text_color=color)
+
+    def _create_install_frame(self, steps):
+        if self.install_frame is not None:
+            self.install_frame.destroy()
+        self.install_frame = ctk.CTkFrame(self.action_frame, fg_color="transparent")
+        self.install_frame.grid(row=5, column=0, pady=(0, 5))
+        self.install_rows = {}
+        for row, step in enumerate(steps):
+            label = ctk.CTkLabel(self.install_frame, text=step["title"], font=("Arial", 11), anchor="w", width=140)
+            label.grid(row=row, column=0, padx=5, sticky="w")
+            bar = ctk.CTkProgressBar(self.install_frame, width=260, height=8)
+            bar.grid(row=row, column=1, padx=5)
+            bar.set(0)
+            status_label = ctk.CTkLabel(self.install_frame, text="", font=("Arial", 11), anchor="w", width=160)
+            status_label.grid(row=row, column=2, padx=5, sticky="w")
+            self.install_rows[step["name"]] = (label, bar, status_label)
+
+    def _draw_sparkline(self, metric, values, maximum=0):
+        canvas, line = self.sparklines[metric]
+        if len(values) < 2:
+            canvas.coords(line, 0, 0, 0, 0)
+            return
+        top = max(maximum, max(values)) or 1
+        step = (SPARKLINE_WIDTH - 1) / (len(values) - 1)
+        points = []
+        for i, value in enumerate(values):
+            points.extend((i * step, SPARKLINE_HEIGHT - 2 - (SPARKLINE_HEIGHT - 4) * value / top))
+        canvas.coords(line, *points)
+
+    # --- Threading and Utilities ---
+    def _post_ui(self, func, *args):
+        """ Queues func(*args) to run on the Tk thread at the next frame. Safe to call from any thread. """
+        self.calls.post(func, *args)
+
+    def _drain_ui_queue(self):
+        """ Applies everything queued by background threads since the last frame, then reschedules itself. """
+        try:
+            self.calls.drain(UI_MAX_ITEMS_PER_FRAME, on_error=lambda: self.report_callback_exception(*sys.exc_info()))
+        finally:
+            self.after(UI_FRAME_MS, self._drain_ui_queue)
+
+    # --- Diagnostics (--diagnostics or Ctrl+Shift+D, see ui_diagnostics.py) ---
+    def _timed(self, name, func):
+        """ func, timed under `name` while diagnostics are on. """
+        return func if self.diagnostics is None else self.diagnostics.timed(name, func)
+
+    def _enable_diagnostics(self):
+        if self.diagnostics is not None:
+            return
+        self.diagnostics = ui_diagnostics.enable()
+        self.calls.diagnostics = self.diagnostics
+        # Frontend callbacks run inside queued handlers; timing them too shows which part of a handler is slow
+        self._update_all_controls_state = self._timed("_update_all_controls_state", self._update_all_controls_state)
+        for core in self.instances:
+            self._attach_instance(core)
+        self._diagnostics_summary_at = time.monotonic() + ui_diagnostics.SUMMARY_SECONDS
+        self.add_log(f"Diagnostics on: UI loop summaries every {ui_diagnostics.SUMMARY_SECONDS}s, "
+                     f"Ctrl+Shift+D shows live figures.", level="DEBUG")
+        self.after(ui_diagnostics.HEARTBEAT_MS, self._diagnostics_heartbeat,
+                   time.monotonic() + ui_diagnostics.HEARTBEAT_MS / 1000)
+
+    def _diagnostics_heartbeat(self, expected):
+        """ Measures how late this timer fires, then logs the summary or refreshes the overlay when due. """
+        now = time.monotonic()
+        self.diagnostics.heartbeat(now - expected)
+        if now >= self._diagnostics_summary_at:
+            self.add_log(self.diagnostics.summary(), level="DEBUG")
+            self.diagnostics.reset()
+            self._diagnostics_summary_at = now + ui_diagnostics.SUMMARY_SECONDS
+        if self.diagnostics_label is not None and self.diagnostics_label.winfo_manager():
+            self.diagnostics_label.configure(text=self.diagnostics.overlay_text())
+        self.after(ui_diagnostics.HEARTBEAT_MS, self._diagnostics_heartbeat,
+                   time.monotonic() + ui_diagnostics.HEARTBEAT_MS / 1000)
+
+    def _toggle_diagnostics_overlay(self, event=None):
+        self._enable_diagnostics()
+        if self.diagnostics_label is None:
+            self.diagnostics_label = ctk.CTkLabel(self.log_frame, text="", font=("Consolas", 10), justify="left",
+                                                  fg_color="#1E1E1E", text_color="#DCE4EE", corner_radius=4)
+        if self.diagnostics_label.winfo_manager():
+            self.diagnostics_label.place_forget()
+        else:
+            self.diagnostics_label.configure(text=self.diagnostics.overlay_text())
+            self.diagnostics_label.place(in_=self.log_text, relx=1.0, rely=0.0, x=-20, y=4, anchor="ne")
+
+    def _run_command_in_thread(self, command, start_message="", end_message="", on_complete=None):
+        self.supervisor.run_command(command, start_message, end_message, on_complete)
+        self._update_all_controls_state()
+
+    def _open_settings_window(self):
+        win = ctk.CTkToplevel(self)
+        win.title("Settings"); win.geometry("400x580"); win.transient(self); win.grab_set()
+
+        ctk.CTkLabel(win, text="Fishtest Username:").pack(pady=(10,0))
+        user_entry = ctk.CTkEntry(win, width=250); user_entry.pack()
+
+        ctk.CTkLabel(win, text="Fishtest Password:").pack(pady=(10,0))
+        pass_entry = ctk.CTkEntry(win, show="*", width=250); pass_entry.pack()
+
+        ctk.CTkLabel(win, text="Concurrency (Cores):").pack(pady=(10,0))
+        cores_frame = ctk.CTkFrame(win, fg_color="transparent"); cores_frame.pack()
+        cores_entry = ctk.CTkEntry(cores_frame, width=165); cores_entry.pack(side="left")
+        ctk.CTkButton(cores_frame, text="Auto-tune", width=80,
+                      command=lambda: self._autotune_concurrency(win)).pack(side="left", padx=(5,0))
+
+        ctk.CTkLabel(win, text="GitHub Personal Access Token (Optional):").pack(pady=(10,0))
+        token_entry = ctk.CTkEntry(win, width=250); token_entry.pack()
+
+        watchdog_check = ctk.CTkCheckBox(win, text="Restart the worker if it stops or hangs")
+        watchdog_check.pack(pady=(15,0))
+        if self.instances.watchdog_enabled:
+            watchdog_check.select()
+
+        ctk.CTkLabel(win, text="Worker CPU Priority:").pack(pady=(10,0))
+        priority_menu = ctk.CTkOptionMenu(win, width=250, values=list(process_tuning.PRIORITIES)); priority_menu.pack()
+
+        ctk.CTkLabel(win, text="Worker CPUs (e.g. 0-7,16-23; empty for all):").pack(pady=(10,0))
+        affinity_entry = ctk.CTkEntry(win, width=250); affinity_entry.pack()
+
+        user_entry.insert(0, self.config.get('login', 'username'))
+        pass_entry.insert(0, self.config.get('login', 'password'))
+        cores_entry.insert(0, self.config.get('parameters', 'concurrency'))
+        token_entry.insert(0, self.config.get('Fishtest', 'github_token', fallback=''))
+        priority_menu.set(self.supervisor.cpu_priority)
+        if self.supervisor.cpu_affinity is not None:
+            affinity_entry.insert(0, process_tuning.format_cpu_list(self.supervisor.cpu_affinity))
+
+        def save():
+            # CPU placement lives in manager.cfg; check it first so nothing is saved if it is invalid
+            error = self.instances.set_process_settings(self.supervisor.name, affinity_entry.get(), priority_menu.get())
+            if error:
+                tkinter.messagebox.showerror("Invalid Settings", error, parent=win)
+                return
+            if bool(watchdog_check.get()) != self.instances.watchdog_enabled:
+                self.instances.set_watchdog_enabled(bool(watchdog_check.get()))
+            self.config.set('login', 'username', user_entry.get())
+            self.config.set('login', 'password', pass_entry.get())
+            self.config.set('parameters', 'concurrency', cores_entry.get())
+            if not self.config.has_section('Fishtest'):
+                self.config.add_section('Fishtest')
+            self.config.set('Fishtest', 'github_token', token_entry.get())
+            self._save_config()
+            win.destroy()
+        ctk.CTkButton(win, text="Save", command=save).pack(pady=20)
+
+        register_label = ctk.CTkLabel(win, text="Don't have an account? Register here!", fg_color="transparent", text_color="#33a2ff", cursor="hand2")
+        register_label.pack(pady=(0, 0))
+        register_label.bind("<Button-1>", lambda e: self._open_url("https://tests.stockfishchess.org/signup"))
+
+    def add_log(self, message, level="INFO"):
+        self.supervisor.log(message, level)
+
+    def add_logs(self, entries):
+        """ Records a list of (message, level) entries; they are rendered through _render_log_records. """
+        self.supervisor.logs(entries)
+
+    def _render_log_records(self, records, instance=None):
+        query = self.log_query
+        if query.active:
+            records = [record for record in records if query.matches(record)]
+            if not records:
+                return
+
+        # Check if user is looking at history (scrolled up)
+        is_at_bottom = self.log_text.yview()[1] == 1.0
+
+        # Only the tail of a large batch can end up visible, so skip the rest
+        if len(records) > LOG_VIEW_LINES:
+            records = records[-LOG_VIEW_LINES:]
+
+        # Build one insert call: text, tags, text, tags, ...
+        chunks = []
+        self._log_chunks(records, instance, chunks)
+        self._insert_log_chunks(chunks, len(records))
+
+        # Only scroll down if we were already at the bottom
+        if is_at_bottom:
+            self.log_text.yview(ctk.END)
+
+    def _log_chunks(self, records, instance, chunks):
+        prefix = f" [{instance}] " if instance else " "
+        spans = self.log_query.spans if self.log_query.pattern is not None else None
+        last_timestamp = None
+        for record in records:
+            if record.timestamp != last_timestamp:
+                last_timestamp = record.timestamp
+                timestamp = time.strftime("[%H:%M:%S] ", time.localtime(record.timestamp))
+            # Use a fixed width for the level tag (7 characters)
+            padded_level = f"[{record.level:<7}]"
+            chunks.extend((timestamp, "TIMESTAMP", padded_level, record.level))
+            head, message = prefix, record.message
+            if spans is not None:
+                # Search hits get the MATCH tag, the text between them none
+                position = 0
+                for start, end in spans(message):
+                    chunks.extend((head + message[position:start], (), message[start:end], "MATCH"))
+                    head, position = "", end
+                message = message[position:]
+            chunks.extend((head + message + "\n", ()))
+
+    def _insert_log_chunks(self, chunks, lines):
+        self.log_text.configure(state='normal')
+        self.log_text.insert(ctk.END, *chunks)
+        self.log_view_lines += lines
+
+        # Keep only the most recent lines in the widget. Trimming in chunks keeps it to one delete now and then.
+        excess = self.log_view_lines - LOG_VIEW_LINES
+        if excess > LOG_VIEW_TRIM_SLACK:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_view_lines -= excess
+
+        self.log_text.configure(state='disabled')
+
+    # --- Log filter and search ---
+    def _log_sources(self):
+        """ (instance prefix, LogBuffer) of every instance, as the log view shows them. """
+        return [(None if core is self.instances.primary else core.name, core.log_records) for core in self.instances]
+
+    def _on_log_search_typed(self, event):
+        if event.keysym in ("Return", "Escape", "Shift_L", "Shift_R"):
+            return
+        if self._log_search_after is not None:
+            self.after_cancel(self._log_search_after)
+        self._log_search_after = self.after(LOG_SEARCH_DELAY_MS, self._apply_log_filter)
+
+    def _clear_log_search(self):
+        self.log_search_entry.delete(0, "end")
+        self._apply_log_filter()
+
+    def _apply_log_filter(self):
+        """
+        Shows the newest LOG_VIEW_LINES records of the chosen levels that match the search. Level filters
+        only read the newest records of each level index; a search scans copies of the indexes in a thread.
+        """
+        self._log_search_after = None
+        levels = [level for level, var in self.log_level_vars.items() if var.get()]
+        try:
+            query = log_filter.LogQuery(levels, self.log_search_entry.get(), regex=self.log_regex_var.get())
+        except ValueError:
+            self.log_filter_label.configure(text="Invalid regex", text_color="#FF453A")
+            return
+        self.log_query = query
+        self._log_filter_generation += 1
+        generation = self._log_filter_generation
+        sources = self._log_sources()
+        marks = [(instance, buffer, buffer.next_seq) for instance, buffer in sources]
+        if query.pattern is None:
+            lists = log_filter.snapshot(sources, query.levels, LOG_VIEW_LINES)
+            self._show_filtered_log(generation, log_filter.newest(lists, query, LOG_VIEW_LINES), marks)
+            return
+        lists = log_filter.snapshot(sources, query.levels)
+        self.log_filter_label.configure(text="Searching...", text_color=("gray10", "gray90"))
+        threading.Thread(target=lambda: self._post_ui(self._show_filtered_log, generation,
+                                                      log_filter.newest(lists, query, LOG_VIEW_LINES), marks),
+                         daemon=True).start()
+
+    def _show_filtered_log(self, generation, found, marks):
+        """ Replaces the log view with `found` and the matching records that arrived while it was searched. """
+        if generation != self._log_filter_generation:
+            return
+        query = self.log_query
+        for instance, buffer, mark in marks:
+            found.extend((instance, record) for record in buffer.tail(buffer.next_seq - mark) if query.matches(record))
+        found = found[-LOG_VIEW_LINES:]
+        chunks = []
+        for instance, items in itertools.groupby(found, key=lambda item: item[0]):
+            self._log_chunks([record for _, record in items], instance, chunks)
+        self.log_text.configure(state='normal')
+        self.log_text.delete("1.0", ctk.END)
+        self.log_view_lines = 0
+        self._insert_log_chunks(chunks, len(found))
+        self.log_text.yview(ctk.END)
+        if not query.active:
+            text = ""
+        elif query.pattern is None:
+            text = f"{len(found)}{'+' if len(found) >= LOG_VIEW_LINES else ''} lines"
+        else:
+            text = f"{len(found)}{'+' if len(found) >= LOG_VIEW_LINES else ''} matching lines"
+        self.log_filter_label.configure(text=text, text_color=("gray10", "gray90"))
+
+    def _jump_to_log_match(self, backwards=False):
+        """ Selects the next (or previous) search hit in the log view, wrapping around at the ends. """
+        text = self.log_text
+        current = text.tag_ranges("CURRENT_MATCH")
+        if backwards:
+            found = text.tag_prevrange("MATCH", current[0] if current else text.index("@0,0")) or text.tag_prevrange("MATCH", ctk.END)
+        else:
+            found = text.tag_nextrange("MATCH", current[1] if current else text.index("@0,0")) or text.tag_nextrange("MATCH", "1.0")
+        text.tag_remove("CURRENT_MATCH", "1.0", ctk.END)
+        if found:
+            text.tag_add("CURRENT_MATCH", *found)
+            text.see(found[0])
+
+    def _on_worker_state_changed(self):
+        # Hide progress UI when worker stops, show it when it starts (also when the watchdog restarts it)
+        if self.supervisor.worker_process is None:
+            self.task_progress_label.grid_remove()
+            self.task_progress_bar.grid_remove()
+            if self.resource_frame is not None:
+                self.resource_frame.grid_remove()
+        elif not self.task_progress_bar.winfo_ismapped():
+            self._show_progress_widgets()
+        self._update_all_controls_state()
+
+    def _on_closing(self):
+        if self.instances.any_running():
+            if tkinter.messagebox.askyesno("Exit", "A worker is still running. Do you want to force stop all workers and exit?"):
+                self.instances.force_stop_all()
+                self.instances.shutdown()
+                self.destroy()
+        else:
+            self.instances.shutdown()
+            self.destroy()
+
+def run_gui():
+    ctk.set_appearance_mode("dark")
+    ctk.set_default_color_theme("blue")
+    app = FishtestManagerApp()
+    if startup_profile.enabled():
+        # Idle callbacks queued from an idle callback run after the pending redraws, i.e. after the first paint
+        def first_paint():
+            startup_profile.mark("first paint")
+            app.add_log(f"Startup: {startup_profile.report()}")
+        app.after_idle(lambda: app.after_idle(first_paint))
+
+    # Check for re-launch argument to auto-run an admin action
+    run_action = None
+    for arg in sys.argv:
+        if arg.startswith('--run-as-admin='):
+            run_action = arg.split('=', 1)[1]
+            break
+
+    if run_action:
+        # Defer the action to allow the window to initialize
+        if run_action == 'install':
+            app.after(100, app._run_full_setup)
+        elif run_action == 'update':
+            app.after(100, app._update_msys2)
+        elif run_action == 'delete_worker':
+            app.after(100, app._delete_worker_folder)
+        elif run_action == 'uninstall_msys2':
+            app.after(100, app._uninstall_msys2)
+
+    app.mainloop()
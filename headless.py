@@ -0,0 +1,321 @@
+"""
+Terminal frontend of the manager. Runs the worker supervisor without Tk.
+
+    main.py --headless run            Start the workers and stream their log until they stop (Ctrl+C stops gracefully,
+                                      a second Ctrl+C force stops)
+    main.py --headless stop [--force] Ask running workers to finish their task and exit (or kill them with --force)
+    main.py --headless status [--json] Show installation state, settings and the progress of running workers
+    main.py --headless autotune [--rerun] Benchmark the engine to find the best concurrency and save it
+    main.py --headless update-worker [--source SRC] Download only the worker files that changed upstream
+    main.py --headless history [--days N] [--json] Show games played per period and the latest tasks
+
+Every command acts on all instances listed in manager.cfg; `--instance NAME` (repeatable) selects some of them.
+
+Nothing here may import customtkinter or tkinter, directly or through another module.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+import instances
+import log_ingest
+import startup_profile
+import supervisor
+import task_history
+from common import APP_NAME, APP_VERSION, EXIT_FILE_NAME
+
+# --- Constants ---
+LOOP_TIMEOUT = 0.5          # Seconds the main loop waits for work before checking signals again
+MAX_ITEMS_PER_LOOP = 5000   # Queued calls handled per loop iteration
+
+
+def _print_records(records, instance=None):
+    prefix = f"[{instance}] " if instance else ""
+    lines = []
+    last_timestamp = None
+    for record in records:
+        if record.timestamp != last_timestamp:
+            last_timestamp = record.timestamp
+            timestamp = time.strftime("[%H:%M:%S]", time.localtime(record.timestamp))
+        lines.append(f"{timestamp} [{record.level:<7}] {prefix}{record.message}\n")
+    sys.stdout.write("".join(lines))
+    sys.stdout.flush()
+
+
+def _select_instances(manager, names):
+    """ Returns the selected supervisors, or None (after printing why) if a name is unknown. """
+    if not names:
+        return list(manager)
+    unknown = [name for name in names if manager.get(name) is None]
+    if unknown:
+        print(f"Unknown instance(s): {', '.join(unknown)}. Known: {', '.join(core.name for core in manager)}")
+        return None
+    return [manager.get(name) for name in names]
+
+
+def cmd_run(args):
+    calls = log_ingest.CallQueue()
+    manager = instances.InstanceManager(calls)
+    cores = _select_instances(manager, args.instance)
+    if cores is None:
+        return 1
+    # Only prefix lines with the instance name when several workers share the terminal
+    for core in cores:
+        core.on_logs = (lambda records, name=core.name: _print_records(records, name)) if len(cores) > 1 else _print_records
+    manager.start(cores)
+
+    startup_profile.mark("config load")
+    startup_profile.report()
+
+    ready = []
+    for core in cores:
+        if not core.is_worker_installed():
+            core.log(f"Worker files not found in '{core.worker_dir}'. Install the worker first.", level="ERROR")
+        elif not core.has_credentials():
+            core.log(f"No Fishtest username/password in '{core.config_file}'.", level="ERROR")
+        else:
+            ready.append(core)
+    if not ready:
+        manager.shutdown()
+        return 1
+
+    interrupts = []
+
+    def on_signal(signum, frame):
+        # Runs on the main thread between loop iterations; hand the work to the loop like any other call
+        interrupts.append(signum)
+        for core in ready:
+            calls.post(core.stop_worker_gracefully if len(interrupts) == 1 else core.stop_worker_forcefully)
+
+    signal.signal(signal.SIGINT, on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, on_signal)
+    if hasattr(signal, "SIGBREAK"):
+        signal.signal(signal.SIGBREAK, on_signal)
+
+    finished = set()
+
+    def on_state_changed(core):
+        # The supervisor clears worker_process once the worker (or its failed start) is over;
+        # the watchdog may still bring it back
+        if core.worker_process is None and not (core.worker_starting or core.watchdog.restart_pending):
+            finished.add(core.name)
+        else:
+            finished.discard(core.name)
+
+    for core in ready:
+        core.log(f"{APP_NAME} {APP_VERSION} (headless) | Instance: {core.name} | User: {core.username} | Cores: {core.concurrency}")
+        core.on_state_changed = lambda core=core: on_state_changed(core)
+        core.start_worker()
+
+    last_progress = {}
+    while not (len(finished) == len(ready) and calls.pending() == 0):
+        calls.drain(MAX_ITEMS_PER_LOOP, timeout=LOOP_TIMEOUT)
+        # Print the progress line when the task state moves, not whenever the rates are recomputed
+        for core in ready:
+            progress = (core.task_current_games, core.task_total_games, core.task_phase)
+            if args.progress and progress != last_progress.get(core.name) and core.progress_text():
+                last_progress[core.name] = progress
+                prefix = f"[{core.name}] " if len(ready) > 1 else ""
+                print(f"{time.strftime('[%H:%M:%S]')} [PROGRESS] {prefix}{core.progress_text()}", flush=True)
+
+    manager.shutdown()
+    return 0
+
+
+def _stop_instance(name, worker_dir, force):
+    """
+    Stops one worker from another process. Returns True if something was stopped or asked to stop.
+    fish.exit is written in both cases: it tells the running manager the stop was requested, so its
+    watchdog neither counts a crash nor restarts the worker, and it cancels a restart already scheduled.
+    """
+    if not os.path.isdir(worker_dir):
+        print(f"[{name}] Worker folder '{worker_dir}' not found.")
+        return False
+    status = supervisor.read_status_file(worker_dir) or {}
+    pid = status.get("worker_pid")
+    running = bool(pid) and supervisor.pid_alive(pid)
+    if force and not running and status.get("state") != "restarting":
+        print(f"[{name}] No running worker found.")
+        return False
+    with open(os.path.join(worker_dir, EXIT_FILE_NAME), "w"):
+        pass
+    if not running and status.get("state") == "restarting":
+        print(f"[{name}] Created {EXIT_FILE_NAME}: the manager will not restart the worker.")
+        return True
+    if not force:
+        print(f"[{name}] Created {EXIT_FILE_NAME}: the worker will stop after its current task.")
+        return True
+    try:
+        instances.load_launcher().kill_tree(pid)
+    except Exception as e:
+        print(f"[{name}] Could not stop worker process {pid}: {e}")
+        return False
+    print(f"[{name}] Force stopped worker process {pid}.")
+    return True
+
+
+def cmd_stop(args):
+    dirs = instances.load_instance_dirs()
+    names = args.instance or list(dirs)
+    unknown = [name for name in names if name not in dirs]
+    if unknown:
+        print(f"Unknown instance(s): {', '.join(unknown)}. Known: {', '.join(dirs)}")
+        return 1
+    results = [_stop_instance(name, dirs[name], args.force) for name in names]
+    return 0 if any(results) else 1
+
+
+def cmd_status(args):
+    calls = log_ingest.CallQueue()
+    manager = instances.InstanceManager(calls)
+    cores = _select_instances(manager, args.instance)
+    if cores is None:
+        return 1
+    info = {
+        "version": APP_VERSION,
+        "msys2_installed": manager.primary.is_msys2_installed(),
+        "launch_backend": manager.launcher.name,
+        "instances": [],
+    }
+    for core in cores:
+        core.load_config()
+        info["instances"].append({
+            "name": core.name,
+            "worker_dir": core.worker_dir,
+            "worker_installed": core.is_worker_installed(),
+            "user": core.username,
+            "concurrency": core.concurrency,
+            "status": supervisor.read_status_file(core.worker_dir) or {"state": "idle"},
+        })
+    if args.json:
+        print(json.dumps(info, indent=2))
+        return 0
+
+    print(f"{APP_NAME} {APP_VERSION}")
+    print(f"MSYS2 installed : {'yes' if info['msys2_installed'] else 'no'}")
+    print(f"Launch backend  : {info['launch_backend']}")
+    for instance in info["instances"]:
+        status = instance["status"]
+        print()
+        print(f"Instance        : {instance['name']} ({instance['worker_dir']})")
+        print(f"Worker installed: {'yes' if instance['worker_installed'] else 'no'}")
+        print(f"User / Cores    : {instance['user']} / {instance['concurrency']}")
+        print(f"State           : {status['state']}")
+        if status.get("watchdog"):
+            wd = status["watchdog"]
+            print(f"Watchdog        : {wd['restarts']} restarts, {wd['crashes']} crashes, {wd['hangs']} hangs, "
+                  f"{wd['downtime_seconds'] / 60:.1f} min down")
+        if status.get("resources"):
+            res = status["resources"]
+            print(f"Resources       : CPU {res['cpu_percent'] / 100:.1f} cores, {res['rss'] / 2**20:.0f} MiB, "
+                  f"{res['threads']} threads in {res['processes']} processes")
+        if status.get("progress"):
+            print(f"Progress        : {status['progress']}")
+        if status.get("updated_at"):
+            print(f"Last update     : {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(status['updated_at']))}")
+    return 0
+
+
+def cmd_autotune(args):
+    calls = log_ingest.CallQueue()
+    manager = instances.InstanceManager(calls)
+    for core in manager:
+        status = supervisor.read_status_file(core.worker_dir)
+        if status and status.get("state") in ("running", "stopping", "restarting"):
+            print(f"Instance '{core.name}' is running. Stop all workers first; the benchmark needs the CPU to itself.")
+            return 1
+    for core in manager:
+        core.on_logs = _print_records
+    manager.start(services=False)
+
+    results = []
+    core = manager.primary
+    core.run_autotune(args.engine, use_cache=not args.rerun, on_complete=results.append)
+    while core.is_long_operation_running or calls.pending():
+        calls.drain(MAX_ITEMS_PER_LOOP, timeout=LOOP_TIMEOUT)
+    if results:
+        # With several instances the recommended total is divided between them
+        manager.split_cores(results[0]["recommended"])
+    manager.shutdown()
+    return 0 if results else 1
+
+
+def cmd_update_worker(args):
+    calls = log_ingest.CallQueue()
+    manager = instances.InstanceManager(calls)
+    for core in manager:
+        status = supervisor.read_status_file(core.worker_dir)
+        if status and status.get("state") in ("running", "stopping", "restarting"):
+            print(f"Instance '{core.name}' is running. Stop all workers before updating their files.")
+            return 1
+    for core in manager:
+        core.on_logs = _print_records
+    manager.start(services=False)
+
+    done = []
+    error = manager.update_worker_files(args.source, on_complete=lambda: done.append(True))
+    if error:
+        print(error)
+    core = manager.primary
+    while core.is_long_operation_running or calls.pending():
+        calls.drain(MAX_ITEMS_PER_LOOP, timeout=LOOP_TIMEOUT)
+    manager.shutdown()
+    return 0 if done else 1
+
+
+def cmd_history(args):
+    history = task_history.TaskHistory()
+    if not os.path.exists(history.path):
+        # Reading must not leave an empty database (and its WAL files) behind in the current folder
+        print(json.dumps({"totals": {}, "tasks": []}) if args.json else "No tasks recorded yet.")
+        return 0
+    since = time.time() - args.days * 86400 if args.days else None
+    totals = [(label, history.totals(start, args.instance)) for label, start in task_history.period_starts()]
+    rows = history.recent(args.limit, since, args.instance)
+    if args.json:
+        print(json.dumps({"totals": dict(totals), "tasks": rows}, indent=2))
+        return 0
+    for label, values in totals:
+        print(task_history.format_totals(label, values))
+    print()
+    print(task_history.format_rows(rows) if rows else "No tasks recorded yet.")
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="main.py --headless", description=f"{APP_NAME} without a window.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Start the workers and stream their output")
+    run_parser.add_argument("--no-progress", dest="progress", action="store_false",
+                            help="Do not log the progress line when it changes")
+    stop_parser = commands.add_parser("stop", help="Stop running workers")
+    stop_parser.add_argument("--force", action="store_true", help="Kill the worker instead of letting it finish its task")
+    status_parser = commands.add_parser("status", help="Show installation state and worker progress")
+    status_parser.add_argument("--json", action="store_true", help="Print machine readable JSON")
+    autotune_parser = commands.add_parser("autotune", help="Find the best concurrency with the engine benchmark")
+    autotune_parser.add_argument("--rerun", action="store_true", help="Ignore the cached result of an earlier run")
+    autotune_parser.add_argument("--engine", help="Stockfish binary to benchmark (default: the newest one the worker built)")
+    update_parser = commands.add_parser("update-worker", help="Update the worker files, downloading only what changed")
+    update_parser.add_argument("--source", help="Local worker folder or stand-in URL serving tree.json "
+                                                "(default: [update] source in manager.cfg, else GitHub)")
+    history_parser = commands.add_parser("history", help="Show games played per period and the latest tasks")
+    history_parser.add_argument("--days", type=float, help="Only list tasks started in the last N days")
+    history_parser.add_argument("--limit", type=int, default=50, help="Tasks to list (default: %(default)s)")
+    history_parser.add_argument("--json", action="store_true", help="Print machine readable JSON")
+    for command_parser in (run_parser, stop_parser, status_parser, history_parser):
+        command_parser.add_argument("--instance", action="append", metavar="NAME",
+                                    help="Only this instance (repeatable); default: all instances in manager.cfg")
+    args = parser.parse_args(argv)
+
+    handlers = {"run": cmd_run, "stop": cmd_stop, "status": cmd_status, "autotune": cmd_autotune,
+                "update-worker": cmd_update_worker, "history": cmd_history}
+    status = handlers[args.command](args)
+    if args.command != "run":
+        # 'run' reports once its workers are started, as it does not return until they stop
+        startup_profile.mark(args.command)
+        startup_profile.report()
+    return status
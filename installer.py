@@ -0,0 +1,321 @@
+"""
+Installation as a graph of named steps, run by an orchestrator instead of one long shell script.
+
+Each step names the steps it depends on; steps whose dependencies are complete run at the same time
+(e.g. downloading the worker while MSYS2 installs), each with its own progress, duration and retries.
+Completed steps are recorded in install_state.json, so running the installation again after a failure
+continues at the first incomplete step. The record is dropped when the inputs (user, cores, paths)
+change, or per step when what it produced is gone.
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+import zipfile
+
+import artifact_cache
+import launcher
+import log_ingest
+import watchdog
+from common import INSTALL_STATE_FILE, MSYS2_PATH, get_asset_path, windows_to_msys2_path
+
+# --- Constants ---
+MAX_PARALLEL_STEPS = 3
+RETRY_BASE_SECONDS = 5.0       # First delay before a failed step is retried, doubling per attempt
+RETRY_MAX_SECONDS = 60.0
+STAGING_DIR_NAME = "worker.install"   # The new worker is assembled here and swapped in by the last step
+WORKER_ARCHIVE_PREFIX = "fishtest-master/worker/"
+# pacman's "(3/12) installing gcc" lines give the share of the step that is done
+PACKAGE_PROGRESS = re.compile(r"\((\d+)/(\d+)\) (?:installing|upgrading|reinstalling|downgrading) ")
+
+
+class StepFailed(Exception):
+    """ A step could not complete; the message says why. """
+
+
+class Step:
+    """ One named unit of the installation. Its action runs on a thread of its own. """
+
+    def __init__(self, name, title, action, deps=(), retries=0, check=None):
+        self.name = name
+        self.title = title
+        self.action = action      # action(step) -> JSON-serializable result, raises on failure
+        self.deps = tuple(deps)
+        self.retries = retries
+        self.check = check        # check(result) -> False if what an earlier run produced is gone
+        self.status = "pending"   # pending, running, retrying, done, skipped (done by an earlier run), failed, blocked
+        self.progress = None      # 0..1 while running, None if the step cannot tell
+        self.attempts = 0
+        self.started_at = None
+        self.duration = None
+        self.error = ""
+        self.result = None
+        self.pipeline = None
+
+    def set_progress(self, fraction):
+        self.progress = min(max(fraction, 0.0), 1.0)
+        self.pipeline._changed(self)
+
+    def output(self, lines):
+        self.pipeline.on_output(self, lines)
+
+    def snapshot(self):
+        elapsed = self.duration
+        if elapsed is None and self.started_at is not None:
+            elapsed = time.monotonic() - self.started_at
+        return {"name": self.name, "title": self.title, "status": self.status, "progress": self.progress,
+                "attempts": self.attempts, "elapsed": elapsed, "error": self.error}
+
+
+class InstallPipeline:
+    """
+    Runs steps in dependency order, up to max_parallel at a time. on_changed(snapshots, changed) and
+    on_output(step, lines) are called from the step threads; frontends post them to their own thread.
+    """
+
+    def __init__(self, steps, fingerprint, state_file=INSTALL_STATE_FILE, max_parallel=MAX_PARALLEL_STEPS,
+                 sleep=time.sleep):
+        names = set()
+        for step in steps:
+            missing = [dep for dep in step.deps if dep not in names]
+            if missing:
+                raise ValueError(f"Step '{step.name}' depends on {missing}, which must be listed before it")
+            names.add(step.name)
+            step.pipeline = self
+        self.steps = steps
+        self.fingerprint = fingerprint
+        self.state_file = state_file
+        self.max_parallel = max_parallel
+        self.sleep = sleep
+        self.on_changed = lambda snapshots, changed: None
+        self.on_output = lambda step, lines: None
+        self._by_name = {step.name: step for step in steps}
+        self._lock = threading.Lock()
+        self._completed = {}      # name -> {"result": ..., "duration": ...}, as saved in the state file
+
+    # --- Resume state ---
+    def _load_state(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state.get("steps", {}) if state.get("fingerprint") == self.fingerprint else {}
+
+    def _save_state(self):
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "steps": self._completed}, f, indent=1)
+        os.replace(tmp_path, self.state_file)
+
+    def resume_point(self):
+        """ Title of the step an earlier, unfinished run stopped at, or None if there is nothing to resume. """
+        saved = self._load_state()
+        if not saved:
+            return None
+        for step in self.steps:
+            if step.name not in saved:
+                return step.title
+        return None
+
+    # --- Running ---
+    def result(self, name):
+        """ What the action of a completed step returned. """
+        return self._by_name[name].result
+
+    def _changed(self, step):
+        self.on_changed([s.snapshot() for s in self.steps], step.snapshot())
+
+    def run(self):
+        """ Runs all steps and blocks until done. Returns True if every step completed. """
+        saved = self._load_state()
+        for step in self.steps:
+            record = saved.get(step.name)
+            # A step that runs again may replace what later steps built on, so those run again too
+            if (record is not None and all(self._by_name[dep].status == "skipped" for dep in step.deps)
+                    and (step.check is None or step.check(record.get("result")))):
+                self._completed[step.name] = record
+                step.status, step.result, step.duration, step.progress = "skipped", record.get("result"), record.get("duration"), 1.0
+                self._changed(step)
+
+        finished = queue.SimpleQueue()
+        running = 0
+        failed = False
+        while True:
+            for step in self.steps:
+                if step.status != "pending":
+                    continue
+                dep_states = [self._by_name[dep].status for dep in step.deps]
+                if any(state in ("failed", "blocked") for state in dep_states):
+                    step.status = "blocked"
+                    self._changed(step)
+                elif not failed and running < self.max_parallel and all(state in ("done", "skipped") for state in dep_states):
+                    step.status = "running"
+                    running += 1
+                    threading.Thread(target=self._run_step, args=(step, finished), daemon=True).start()
+            if running == 0:
+                break
+            # After a failure, the steps already running may finish (and be recorded), nothing new starts
+            failed = finished.get().status == "failed" or failed
+            running -= 1
+
+        success = all(step.status in ("done", "skipped") for step in self.steps)
+        if success:
+            try:
+                os.remove(self.state_file)
+            except OSError:
+                pass
+        return success
+
+    def _run_step(self, step, finished):
+        step.started_at = time.monotonic()
+        for attempt in range(1, step.retries + 2):
+            step.attempts = attempt
+            step.status, step.progress, step.error = "running", None, ""
+            self._changed(step)
+            try:
+                step.result = step.action(step)
+                break
+            except Exception as e:
+                step.error = str(e) or type(e).__name__
+                if attempt > step.retries:
+                    step.status = "failed"
+                    step.duration = time.monotonic() - step.started_at
+                    self._changed(step)
+                    finished.put(step)
+                    return
+                delay = watchdog.backoff_delay(attempt, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS)
+                step.status = "retrying"
+                self._changed(step)
+                step.output([f"{step.title} failed ({step.error}), retrying in {delay:.0f} s"])
+                self.sleep(delay)
+
+        step.duration = time.monotonic() - step.started_at
+        step.status, step.progress = "done", 1.0
+        with self._lock:
+            self._completed[step.name] = {"result": step.result, "duration": step.duration}
+            self._save_state()
+        self._changed(step)
+        finished.put(step)
+
+
+def shell_action(command):
+    """ Action that runs a shell command, streams its output and fails on a non-zero exit code. """
+    def run(step):
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   shell=True, creationflags=launcher.CREATE_NO_WINDOW)
+
+        def on_lines(lines):
+            step.output(lines)
+            for line in reversed(lines):
+                match = PACKAGE_PROGRESS.search(line)
+                if match:
+                    step.set_progress(int(match.group(1)) / max(int(match.group(2)), 1))
+                    break
+
+        reader = log_ingest.OutputReader(process.stdout, on_lines)
+        reader.start()
+        reader.join()
+        rc = process.wait()
+        if rc != 0:
+            raise StepFailed(f"exit code {rc}")
+    return run
+
+
+# --- The worker installation ---
+def install_fingerprint(username, password, cores, app_dir, msys2_path):
+    """ Identifies the inputs of an installation; a saved state is only resumed with the same inputs. """
+    inputs = json.dumps([username, password, cores, os.path.abspath(app_dir), msys2_path])
+    return hashlib.sha256(inputs.encode("utf-8")).hexdigest()
+
+
+def worker_install_steps(app_dir, worker_dir, msys2_path, cache, username, password, cores):
+    """
+    The installation of MSYS2 and the worker as steps. The new worker is assembled next to the old
+    one and only replaces it in the last step, so a failed installation leaves the old worker working.
+    """
+    staging_dir = os.path.join(app_dir, STAGING_DIR_NAME)
+    script = windows_to_msys2_path(get_asset_path("gui_install_worker.sh"))
+    cache_dir = windows_to_msys2_path(cache.root)
+
+    def download(step):
+        return cache.fetch(artifact_cache.WORKER_ARCHIVE_URL, on_progress=lambda message: step.output([message]))
+
+    def extract(step):
+        zip_path = step.pipeline.result("download")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [info for info in archive.infolist()
+                       if info.filename.startswith(WORKER_ARCHIVE_PREFIX) and not info.is_dir()]
+            if not members:
+                raise StepFailed(f"no '{WORKER_ARCHIVE_PREFIX}' folder in {zip_path}")
+            for count, info in enumerate(members, start=1):
+                relpath = info.filename[len(WORKER_ARCHIVE_PREFIX):]
+                target = os.path.join(staging_dir, *relpath.split("/"))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(info) as source, open(target, "wb") as f:
+                    shutil.copyfileobj(source, f)
+                step.set_progress(count / len(members))
+        step.output([f"Extracted {len(members)} files to {staging_dir}"])
+
+    def write_launcher(step):
+        with open(os.path.join(staging_dir, "fishtest.cmd"), "w", newline="\r\n") as f:
+            f.write("@echo off\n"
+                    'set "HERE=%~dp0"\n'
+                    f'set "PATH={msys2_path}\\ucrt64\\bin;{msys2_path}\\usr\\bin;%PATH%"\n'
+                    'cd /d "%HERE%"\n'
+                    "env\\bin\\python3.exe worker.py\n")
+
+    def activate(step):
+        old_dir = worker_dir + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.isdir(worker_dir):
+            os.replace(worker_dir, old_dir)
+        os.replace(staging_dir, worker_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        step.output([f"Installed the worker in {worker_dir}"])
+
+    def staged(*names):
+        return lambda result: all(os.path.exists(os.path.join(staging_dir, name)) for name in names)
+
+    ucrt_bin = os.path.join(msys2_path, "ucrt64", "bin")
+    return [
+        Step("msys2", "Install MSYS2", shell_action(f'"{get_asset_path("00_install_winget_msys2_admin.cmd")}"'),
+             retries=1, check=lambda result: os.path.isfile(os.path.join(msys2_path, "msys2_shell.cmd"))),
+        Step("download", "Download worker", download, retries=2,
+             check=lambda result: bool(result) and os.path.isfile(result)),
+        Step("extract", "Extract worker", extract, deps=["download"], check=staged("worker.py")),
+        Step("launcher", "Write launcher", write_launcher, deps=["extract"], check=staged("worker.py", "fishtest.cmd")),
+        Step("packages", "Install packages", shell_action(launcher.msys2_command(msys2_path, app_dir, f"bash '{script}' packages '{cache_dir}'")),
+             deps=["msys2"], retries=2,
+             check=lambda result: all(os.path.isfile(os.path.join(ucrt_bin, name)) for name in ("python3.exe", "gcc.exe"))),
+        Step("venv", "Python environment", shell_action(launcher.msys2_command(msys2_path, staging_dir, f"bash '{script}' venv '{cache_dir}'")),
+             deps=["packages", "extract"], retries=2, check=staged("worker.py", "env")),
+        Step("config", "Write fishtest.cfg",
+             shell_action(launcher.msys2_command(msys2_path, staging_dir, f"bash '{script}' config '{username}' '{password}' '{cores}'")),
+             deps=["venv"], check=staged("worker.py", "env", "fishtest.cfg")),
+        Step("activate", "Activate worker", activate, deps=["config", "launcher"], retries=1),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the steps of the worker installation without running them.")
+    parser.add_argument("--msys2-path", default=MSYS2_PATH)
+    args = parser.parse_args()
+    # Building the steps and their pipeline is enough to catch a broken step list
+    app_dir = os.path.abspath(".")
+    steps = worker_install_steps(app_dir, os.path.join(app_dir, "worker"), args.msys2_path,
+                                 artifact_cache.ArtifactCache(), "user", "password", "1")
+    InstallPipeline(steps, install_fingerprint("user", "password", "1", app_dir, args.msys2_path))
+    for step in steps:
+        deps = f" (after {', '.join(step.deps)})" if step.deps else ""
+        print(f"{step.name:<9} {step.title}{deps}")
+
+if __name__ == "__main__":
+    main()
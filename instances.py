@@ -0,0 +1,515 @@
+import artifact_cache
+import configparser
+import environment
+import launcher
+import metrics
+import os
+import re
+import shutil
+import socket
+import threading
+
+import process_tuning
+import resource_monitor
+import supervisor
+import task_history
+import watchdog
+from common import ARTIFACT_CACHE_DIR, CONFIG_FILE_NAME, CONTROL_TOKEN_FILE, EXIT_FILE_NAME, LOG_DIR, MANAGER_CONFIG_FILE, STATUS_FILE_NAME, WORKER_DIR
+
+# --- Constants ---
+PRIMARY_INSTANCE = "worker"
+INSTANCE_SECTION_PREFIX = "instance "
+WATCHDOG_SECTION = "watchdog"
+MONITOR_SECTION = "monitor"
+UPDATE_SECTION = "update"
+CACHE_SECTION = "cache"
+METRICS_SECTION = "metrics"
+LAUNCH_SECTION = "launch"
+CONCURRENCY_SECTION = "concurrency"
+CONTROL_SECTION = "control"
+# Per-instance state that must not be copied into a new instance folder
+COPY_IGNORE = shutil.ignore_patterns("__pycache__", "testing", EXIT_FILE_NAME, STATUS_FILE_NAME, CONFIG_FILE_NAME)
+
+
+def load_instance_settings(config_file=MANAGER_CONFIG_FILE):
+    """
+    Returns {name: {"dir": ..., other keys...}} in display order. The primary 'worker' folder is always first;
+    its optional [instance worker] section only holds settings, its folder cannot be moved.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    settings = {PRIMARY_INSTANCE: {}}
+    for section in config.sections():
+        if section.startswith(INSTANCE_SECTION_PREFIX):
+            name = section[len(INSTANCE_SECTION_PREFIX):].strip()
+            settings[name] = dict(config[section])
+    settings[PRIMARY_INSTANCE]["dir"] = WORKER_DIR
+    for values in settings.values():
+        values["dir"] = os.path.abspath(values["dir"])
+    return settings
+
+
+def load_instance_dirs(config_file=MANAGER_CONFIG_FILE):
+    """ Returns {name: worker_dir} in display order. """
+    return {name: values["dir"] for name, values in load_instance_settings(config_file).items()}
+
+
+def save_instance_settings(settings, config_file=MANAGER_CONFIG_FILE):
+    """ Rewrites the instance sections of manager.cfg, keeping any other section. """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    for section in config.sections():
+        if section.startswith(INSTANCE_SECTION_PREFIX):
+            config.remove_section(section)
+    for name, values in settings.items():
+        if name == PRIMARY_INSTANCE:
+            values = {key: value for key, value in values.items() if key != "dir"}
+            if not values:
+                continue
+        config[INSTANCE_SECTION_PREFIX + name] = values
+    environment.write_config_atomic(config, config_file)
+
+
+def load_watchdog_settings(config_file=MANAGER_CONFIG_FILE):
+    """ Returns (enabled, hang timeout in seconds) from the [watchdog] section of manager.cfg. """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    enabled = config.getboolean(WATCHDOG_SECTION, "enabled", fallback=True)
+    hang_minutes = config.getfloat(WATCHDOG_SECTION, "hang_minutes", fallback=watchdog.HANG_TIMEOUT_SECONDS / 60)
+    return enabled, hang_minutes * 60
+
+
+def load_monitor_interval(config_file=MANAGER_CONFIG_FILE):
+    """ Seconds between resource samples, from the [monitor] section of manager.cfg. """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    interval = config.getfloat(MONITOR_SECTION, "interval_seconds", fallback=resource_monitor.SAMPLE_INTERVAL_SECONDS)
+    return min(max(interval, 0.5), resource_monitor.MAX_INTERVAL_SECONDS)
+
+
+def load_update_source(config_file=MANAGER_CONFIG_FILE):
+    """ Where worker updates come from: '' for GitHub, a local folder or a stand-in URL ([update] source). """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return config.get(UPDATE_SECTION, "source", fallback="").strip()
+
+
+def load_release_check_settings(config_file=MANAGER_CONFIG_FILE):
+    """
+    Returns (URL, hours an answer is reused) of the app release check from the [update] section of manager.cfg.
+    check_hours = 0 turns the check off; release_url can point at a local stand-in.
+    """
+    import release_check  # Loaded when the check runs, after the first paint
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    url = config.get(UPDATE_SECTION, "release_url", fallback="").strip() or release_check.RELEASES_URL
+    hours = config.getfloat(UPDATE_SECTION, "check_hours", fallback=release_check.CHECK_TTL_SECONDS / 3600)
+    return url, hours
+
+
+def load_cache_settings(config_file=MANAGER_CONFIG_FILE):
+    """ Returns (folder, size cap in bytes) of the download cache from the [cache] section of manager.cfg. """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    directory = config.get(CACHE_SECTION, "dir", fallback="").strip() or ARTIFACT_CACHE_DIR
+    max_gb = config.getfloat(CACHE_SECTION, "max_gb", fallback=artifact_cache.MAX_BYTES / 1024 ** 3)
+    return os.path.abspath(directory), int(max_gb * 1024 ** 3)
+
+
+def load_metrics_settings(config_file=MANAGER_CONFIG_FILE):
+    """ Returns (enabled, bind address, port) of the metrics endpoint from the [metrics] section of manager.cfg. """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    enabled = config.getboolean(METRICS_SECTION, "enabled", fallback=False)
+    bind = config.get(METRICS_SECTION, "bind", fallback=metrics.DEFAULT_BIND).strip()
+    port = config.getint(METRICS_SECTION, "port", fallback=metrics.DEFAULT_PORT)
+    return enabled, bind, port
+
+
+def load_launcher(config_file=MANAGER_CONFIG_FILE):
+    """
+    The launcher of the backend in the [launch] section of manager.cfg: msys2 or posix (see launcher.py).
+    Raises ValueError for an unknown or unusable backend.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return launcher.create(config.get(LAUNCH_SECTION, "backend", fallback="").strip().lower() or launcher.DEFAULT_BACKEND)
+
+
+def load_concurrency_policy_settings(config_file=MANAGER_CONFIG_FILE):
+    """
+    Returns (enabled, min_cores, max_cores or None for all, reserve_cores, idle seconds) of the load-aware
+    concurrency from the [concurrency] section of manager.cfg. Off by default; then the rest is None.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    enabled = config.getboolean(CONCURRENCY_SECTION, "enabled", fallback=False)
+    if not enabled:
+        return False, None, None, None, None
+    import concurrency_policy  # Only loaded when the policy is enabled
+    min_cores = config.getint(CONCURRENCY_SECTION, "min_cores", fallback=1)
+    max_cores = config.getint(CONCURRENCY_SECTION, "max_cores", fallback=0) or None
+    reserve_cores = config.getfloat(CONCURRENCY_SECTION, "reserve_cores", fallback=concurrency_policy.DEFAULT_RESERVE_CORES)
+    idle_minutes = config.getfloat(CONCURRENCY_SECTION, "idle_minutes", fallback=concurrency_policy.DEFAULT_IDLE_MINUTES)
+    return enabled, min_cores, max_cores, reserve_cores, idle_minutes * 60
+
+
+def load_control_settings(config_file=MANAGER_CONFIG_FILE):
+    """
+    Returns (enabled, bind address, port, Unix socket path or None, token or '') of the control API from the
+    [control] section of manager.cfg. Off by default (then the rest is empty); without a token one is kept in the
+    control_token file.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    enabled = config.getboolean(CONTROL_SECTION, "enabled", fallback=False)
+    if not enabled:
+        return False, None, None, None, ""
+    import control_api  # Only loaded when the API is enabled (asyncio is a large import)
+    bind = config.get(CONTROL_SECTION, "bind", fallback=control_api.DEFAULT_BIND).strip()
+    port = config.getint(CONTROL_SECTION, "port", fallback=control_api.DEFAULT_PORT)
+    socket_path = config.get(CONTROL_SECTION, "socket", fallback="").strip() or None
+    if socket_path and not hasattr(socket, "AF_UNIX"):
+        raise ValueError("Unix sockets are not available on this system")
+    token = config.get(CONTROL_SECTION, "token", fallback="").strip()
+    return enabled, bind, port, socket_path and os.path.abspath(socket_path), token
+
+
+def save_watchdog_enabled(enabled, config_file=MANAGER_CONFIG_FILE):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    if not config.has_section(WATCHDOG_SECTION):
+        config.add_section(WATCHDOG_SECTION)
+    config.set(WATCHDOG_SECTION, "enabled", "yes" if enabled else "no")
+    environment.write_config_atomic(config, config_file)
+
+
+def split_concurrency(total, count):
+    """ Splits `total` cores over `count` instances as evenly as possible, e.g. 10 over 3 -> [4, 3, 3]. """
+    base, extra = divmod(total, count)
+    return [max(base + (1 if i < extra else 0), 1) for i in range(count)]
+
+
+class InstanceManager:
+    """
+    Supervises several worker instances, each with its own folder, fishtest.cfg and concurrency.
+
+    Several smaller workers keep a many-core machine busy while one of them builds engines or downloads
+    nets between tasks. The primary instance is the original 'worker' folder; extra instances are listed
+    in manager.cfg and live in their own 'worker-<name>' folders.
+    """
+
+    def __init__(self, calls, config_file=MANAGER_CONFIG_FILE):
+        self.calls = calls
+        self.config_file = config_file
+        self.supervisors = {}
+        self.settings = load_instance_settings(config_file)
+        self._warnings = []   # (supervisor, message) found while loading, logged once the frontend listens
+        try:
+            self.watchdog_enabled, self.hang_timeout = load_watchdog_settings(config_file)
+        except ValueError as e:
+            self.watchdog_enabled, self.hang_timeout = True, watchdog.HANG_TIMEOUT_SECONDS
+            self._warnings.append((None, f"Ignoring invalid [watchdog] settings in manager.cfg: {e}"))
+        try:
+            self.monitor_interval = load_monitor_interval(config_file)
+        except ValueError as e:
+            self.monitor_interval = resource_monitor.SAMPLE_INTERVAL_SECONDS
+            self._warnings.append((None, f"Ignoring invalid [monitor] settings in manager.cfg: {e}"))
+        try:
+            self.artifact_cache = artifact_cache.ArtifactCache(*load_cache_settings(config_file))
+        except ValueError as e:
+            self.artifact_cache = artifact_cache.ArtifactCache()
+            self._warnings.append((None, f"Ignoring invalid [cache] settings in manager.cfg: {e}"))
+        try:
+            self.launcher = load_launcher(config_file)
+        except ValueError as e:
+            self.launcher = launcher.create()
+            self._warnings.append((None, f"Ignoring [launch] backend in manager.cfg: {e}; using {self.launcher.name}."))
+        self.metrics_server = None
+        self.control_server = None
+        self.concurrency_policy = None
+        self.started = set()   # Names of the instances this manager runs (all but in `--headless run --instance`)
+        self.task_history = task_history.TaskHistory(on_error=self._on_task_history_error)
+        self._task_history_failed = False
+        try:
+            enabled, bind, port = load_metrics_settings(config_file)
+            if enabled:
+                self.metrics_server = metrics.MetricsServer(lambda: [core for core in self if core.name in self.started], bind, port)
+        except ValueError as e:
+            self._warnings.append((None, f"Ignoring invalid [metrics] settings in manager.cfg: {e}"))
+        try:
+            enabled, bind, port, socket_path, token = load_control_settings(config_file)
+            if enabled:
+                import control_api
+                self.control_server = control_api.ControlServer(self, token, bind, port, socket_path)
+        except ValueError as e:
+            self._warnings.append((None, f"Ignoring invalid [control] settings in manager.cfg: {e}"))
+        try:
+            enabled, min_cores, max_cores, reserve_cores, idle_seconds = load_concurrency_policy_settings(config_file)
+            if enabled:
+                import concurrency_policy
+                self.concurrency_policy = concurrency_policy.ConcurrencyPolicy(self, min_cores, max_cores, reserve_cores, idle_seconds)
+        except ValueError as e:
+            self._warnings.append((None, f"Ignoring invalid [concurrency] settings in manager.cfg: {e}"))
+        for name, values in self.settings.items():
+            self._add_supervisor(name, values)
+
+    def _add_supervisor(self, name, values):
+        log_dir = LOG_DIR if name == PRIMARY_INSTANCE else os.path.join(LOG_DIR, name)
+        core = supervisor.WorkerSupervisor(self.calls, worker_dir=values["dir"], log_dir=log_dir, name=name)
+        self._apply_process_settings(core, values)
+        core.launcher = self.launcher
+        core.watchdog.enabled = self.watchdog_enabled
+        core.watchdog.hang_timeout = self.hang_timeout
+        core.resource_interval = self.monitor_interval
+        core.task_recorder.history = self.task_history
+        self.supervisors[name] = core
+        self.settings[name] = values
+        return core
+
+    def _apply_process_settings(self, core, values):
+        """
+        Hands the cpu_affinity/cpu_priority settings of an instance to its supervisor, ignoring bad values, and
+        its worker_command (a stand-in for the worker, see benchmarks/fake_worker.py) if set.
+        """
+        try:
+            core.cpu_affinity = process_tuning.parse_cpu_list(values.get("cpu_affinity", ""))
+        except ValueError as e:
+            core.cpu_affinity = None
+            self._warnings.append((core, f"Ignoring cpu_affinity of instance '{core.name}' in manager.cfg: {e}"))
+        priority = values.get("cpu_priority", process_tuning.DEFAULT_PRIORITY)
+        if priority not in process_tuning.PRIORITIES:
+            self._warnings.append((core, f"Ignoring unknown cpu_priority '{priority}' of instance '{core.name}' in manager.cfg."))
+            priority = process_tuning.DEFAULT_PRIORITY
+        core.cpu_priority = priority
+        core.worker_command = values.get("worker_command", "").strip() or None
+
+    def set_process_settings(self, name, cpu_affinity, cpu_priority):
+        """
+        Saves the CPU set and priority of an instance to manager.cfg. Returns an error message for invalid
+        values (nothing is saved then), or None. Takes effect the next time the worker starts.
+        """
+        try:
+            cpus = process_tuning.parse_cpu_list(cpu_affinity)
+        except ValueError as e:
+            return f"Invalid CPU list: {e}."
+        if cpu_priority not in process_tuning.PRIORITIES:
+            return f"Priority must be one of: {', '.join(process_tuning.PRIORITIES)}."
+        values = self.settings[name]
+        values["cpu_affinity"] = process_tuning.format_cpu_list(cpus)
+        values["cpu_priority"] = cpu_priority
+        self._apply_process_settings(self.supervisors[name], values)
+        save_instance_settings(self.settings, self.config_file)
+        return None
+
+    @property
+    def primary(self):
+        return self.supervisors[PRIMARY_INSTANCE]
+
+    def __iter__(self):
+        return iter(self.supervisors.values())
+
+    def __len__(self):
+        return len(self.supervisors)
+
+    def get(self, name):
+        return self.supervisors.get(name)
+
+    def start(self, cores=None, services=True):
+        """
+        Starts the given supervisors (all by default) and the services shared by them: the task history,
+        the metrics endpoint, the control API and the concurrency policy. One-shot commands pass
+        services=False, so they do not collide with a manager that already runs the workers.
+        """
+        cores = list(self) if cores is None else cores
+        for core in cores:
+            core.start()
+            core.load_config()
+            self.started.add(core.name)
+        for core, message in self._warnings:
+            (core if core in cores else cores[0]).log(message, level="WARNING")
+        self._warnings = []
+        if not services:
+            self.metrics_server = self.control_server = self.concurrency_policy = None
+            return
+        self.task_history.start(core.name for core in cores)
+        if self.metrics_server is not None or self.control_server is not None:
+            # Both serve the published status; publish one before the first change does
+            for core in cores:
+                core.metrics.publish(core.status())
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+                cores[0].log(f"Serving metrics at {self.metrics_server.url} (and /metrics.json).")
+            except OSError as e:
+                cores[0].log(f"Could not serve metrics on {self.metrics_server.bind}:{self.metrics_server.port}: {e}", level="WARNING")
+                self.metrics_server = None
+        if self.control_server is not None:
+            try:
+                hint = "the token from manager.cfg"
+                if not self.control_server.token:
+                    import control_api
+                    self.control_server.token = control_api.load_token()
+                    hint = f"the token in '{CONTROL_TOKEN_FILE}'"
+                self.control_server.start()
+                cores[0].log(f"Control API listening on {self.control_server.url} (requests need {hint}).")
+            except OSError as e:
+                cores[0].log(f"Could not start the control API on {self.control_server.url}: {e}", level="WARNING")
+                self.control_server = None
+        if self.concurrency_policy is not None:
+            if process_tuning.is_available():
+                self.concurrency_policy.start()
+                cores[0].log(f"Concurrency policy on: {self.concurrency_policy.describe()}.")
+            else:
+                cores[0].log("psutil is not installed: the [concurrency] policy in manager.cfg is off.", level="WARNING")
+                self.concurrency_policy = None
+
+    def shutdown(self):
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.control_server is not None:
+            self.control_server.stop()
+        if self.concurrency_policy is not None:
+            self.concurrency_policy.shutdown()
+        for core in self:
+            core.shutdown()
+        self.task_history.close()
+
+    def _on_task_history_error(self, error):
+        """ Called on the history writer thread. Reported once; the workers are not affected. """
+        if not self._task_history_failed:
+            self._task_history_failed = True
+            self.calls.post(self.primary.log, f"Could not write the task history to '{self.task_history.path}': {error}", "WARNING")
+
+    # --- Group operations ---
+    def any_running(self):
+        return any(core.worker_process is not None for core in self)
+
+    def start_all(self):
+        """ Starts every installed, configured and idle instance. Returns the names started. """
+        started = []
+        for core in self:
+            if core.worker_process is None and core.is_long_operation_running:
+                core.log(f"Instance '{core.name}' is busy ({core.current_operation.lower()}); not starting it.", level="WARNING")
+            elif core.worker_process is None and core.is_worker_installed() and core.has_credentials():
+                core.start_worker()
+                started.append(core.name)
+            elif core.worker_process is None:
+                core.log(f"Instance '{core.name}' is not installed or has no credentials; not starting it.", level="WARNING")
+        return started
+
+    def stop_all(self):
+        """ Asks every running instance to finish its task and exit. """
+        for core in self:
+            if core.worker_process is not None and not core.stop_requested:
+                core.stop_worker_gracefully()
+            elif core.worker_process is None:
+                core.watchdog.cancel_restart()
+
+    def force_stop_all(self):
+        for core in self:
+            if core.worker_process is not None:
+                core.stop_worker_forcefully()
+
+    def set_watchdog_enabled(self, enabled):
+        """ Turns automatic restarts and hang detection on or off for all instances and saves it. """
+        self.watchdog_enabled = enabled
+        for core in self:
+            core.watchdog.enabled = enabled
+            if not enabled:
+                core.watchdog.cancel_restart()
+        save_watchdog_enabled(enabled, self.config_file)
+
+    def split_cores(self, total=None):
+        """ Divides the machine's cores (or `total`) over all instances and saves each fishtest.cfg. """
+        total = total or os.cpu_count() or 1
+        for core, cores in zip(self, split_concurrency(total, len(self))):
+            core.config.set('parameters', 'concurrency', str(cores))
+            core.save_config()
+
+    def update_worker_files(self, source=None, on_complete=None):
+        """
+        Updates the files of every installed instance from upstream in one pass, see
+        WorkerSupervisor.update_worker_files. Returns an error message if the update cannot start, or None.
+        The primary runs the update; the other installed instances are marked busy until it is over, so
+        none of them can be started (by hand, the control API or the watchdog) while its files change.
+        """
+        if self.any_running() or any(core.worker_starting or core.watchdog.restart_pending for core in self):
+            return "Stop all workers before updating the worker files."
+        if any(core.is_long_operation_running for core in self):
+            return "Wait for the current operation to finish before updating the worker files."
+        updated = [core for core in self if core.is_worker_installed()]
+        if not updated:
+            return "The worker is not installed yet. Run 'Install/Re-Install Worker' first."
+        followers = [core for core in updated if core is not self.primary]
+
+        def release():
+            for core in followers:
+                core._set_operation(False, "")
+
+        def complete():
+            release()
+            if on_complete: on_complete()
+
+        for core in followers:
+            core._set_operation(True, "Updating worker files")
+        self.primary.update_worker_files(load_update_source(self.config_file) if source is None else source,
+                                         [core.worker_dir for core in updated], complete,
+                                         cache=self.artifact_cache, on_failed=release)
+        return None
+
+    # --- Adding and removing instances ---
+    def instance_dir(self, name):
+        return os.path.abspath(f"worker-{name}")
+
+    def validate_name(self, name):
+        """ Returns an error message for an unusable instance name, or None. """
+        if not re.fullmatch(r"[A-Za-z0-9_-]{1,32}", name or ""):
+            return "Use 1-32 letters, digits, '-' or '_'."
+        if name in self.supervisors:
+            return f"An instance named '{name}' already exists."
+        return None
+
+    def add_instance(self, name, concurrency, on_done):
+        """
+        Copies the primary worker (scripts, venv and nets) into a new folder in a background thread,
+        writes its fishtest.cfg with the primary's credentials and the given concurrency and registers it.
+        on_done(core or None) runs on the state thread.
+        """
+        source = self.primary
+        target_dir = self.instance_dir(name)
+
+        def copy():
+            try:
+                shutil.copytree(source.worker_dir, target_dir, ignore=COPY_IGNORE, symlinks=True)
+            except Exception as e:
+                self.calls.post(source.log, f"Could not create instance '{name}' in '{target_dir}': {e}", "ERROR")
+                self.calls.post(on_done, None)
+                return
+            self.calls.post(finish)
+
+        def finish():
+            core = self._add_supervisor(name, {"dir": target_dir})
+            core.config.read_dict(source.config)
+            core.config.set('parameters', 'concurrency', str(concurrency))
+            core.start()
+            self.started.add(name)
+            core.save_config()
+            save_instance_settings(self.settings, self.config_file)
+            core.log(f"Instance '{name}' created in '{target_dir}' with {concurrency} cores.", level="SUCCESS")
+            on_done(core)
+
+        source.log(f"Creating instance '{name}' from '{source.worker_dir}'...")
+        threading.Thread(target=copy, daemon=True).start()
+
+    def remove_instance(self, name):
+        """ Stops managing an instance. Its folder is left on disk. """
+        core = self.supervisors.get(name)
+        if core is None or name == PRIMARY_INSTANCE or core.worker_process is not None:
+            return False
+        core.shutdown()
+        self.started.discard(name)
+        del self.supervisors[name]
+        del self.settings[name]
+        save_instance_settings(self.settings, self.config_file)
+        return True
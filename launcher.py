@@ -0,0 +1,114 @@
+"""
+How the manager starts the worker and its commands, and how it tears their process trees down.
+
+    msys2  Windows: everything runs through cmd.exe and `msys2_shell.cmd -defterm -ucrt64 -no-start -where DIR
+           -c "..."`. The PID the manager holds is that of the cmd wrapper, not of the worker, so trees
+           are stopped with `taskkill /T` and a dead wrapper does not mean the worker is gone.
+    posix  Linux and other POSIX systems: `env/bin/python3 worker.py` is executed directly from an argv list,
+           without any shell, so the PID is the worker's own. Every launch leads a process group of its
+           own, and the whole group (the worker, cutechess and the engines) is killed in one call.
+
+The backend is `backend` in the [launch] section of manager.cfg (default: msys2 on Windows, posix
+elsewhere). benchmarks/bench_launch.py compares their spawn latency.
+"""
+import collections
+import os
+import signal
+import subprocess
+import sys
+
+import process_tuning
+from common import MSYS2_PATH, windows_to_msys2_path
+
+# --- Constants ---
+BACKENDS = ("msys2", "posix")
+DEFAULT_BACKEND = "msys2" if sys.platform == "win32" else "posix"
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)   # Console-less child processes (Windows only)
+WORKER_PYTHON = "env/bin/python3"   # The worker's virtual environment, relative to its folder
+WORKER_SCRIPT = "worker.py"
+
+# args: argv list, or a command line if shell is true; cwd: folder to run in (None: the current one)
+Launch = collections.namedtuple("Launch", ["args", "cwd", "shell"])
+
+
+def msys2_command(msys2_path, where, command):
+    """ A command line that runs `command` in an MSYS2 UCRT64 shell, in the Windows folder `where`. """
+    return f'"{os.path.join(msys2_path, "msys2_shell.cmd")}" -defterm -ucrt64 -no-start -where "{where}" -c "{command}"'
+
+
+class Msys2Launcher:
+    """ Runs the worker and bash commands inside MSYS2, through cmd.exe. """
+    name = "msys2"
+    needs_msys2 = True
+
+    def __init__(self, msys2_path=MSYS2_PATH):
+        self.msys2_path = msys2_path
+
+    def worker(self, worker_dir):
+        # -where sets the working directory, so the worker needs no 'cd'
+        return self.bash(worker_dir, f"{WORKER_PYTHON} {WORKER_SCRIPT}")
+
+    def bash(self, where, command):
+        """ A bash command run in the folder `where`. """
+        return Launch(msys2_command(self.msys2_path, os.path.abspath(where), command), None, True)
+
+    def bash_path(self, path):
+        """ `path` as bash sees it. """
+        return windows_to_msys2_path(path)
+
+    def shell(self, command, cwd=None):
+        """ A command line for the system shell (cmd.exe). """
+        return Launch(command, cwd, True)
+
+    def popen(self, launch, priority=process_tuning.DEFAULT_PRIORITY):
+        """ Starts a launch with its output (stdout and stderr) in one pipe; children inherit the priority class. """
+        return subprocess.Popen(launch.args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=launch.cwd,
+                                shell=launch.shell,
+                                creationflags=CREATE_NO_WINDOW | process_tuning.priority_creationflags(priority))
+
+    def kill_tree(self, pid):
+        """ Kills a process started by popen() and everything it started. Raises an exception if that failed. """
+        subprocess.run(f"taskkill /F /PID {pid} /T", check=True, capture_output=True, creationflags=CREATE_NO_WINDOW)
+
+
+class PosixLauncher:
+    """ Executes the worker directly and keeps every launch in a process group of its own. """
+    name = "posix"
+    needs_msys2 = False
+
+    def worker(self, worker_dir):
+        worker_dir = os.path.abspath(worker_dir)
+        return Launch([os.path.join(worker_dir, *WORKER_PYTHON.split("/")), WORKER_SCRIPT], worker_dir, False)
+
+    def bash(self, where, command):
+        return Launch(["bash", "-c", command], os.path.abspath(where), False)
+
+    def bash_path(self, path):
+        return os.path.abspath(path)
+
+    def shell(self, command, cwd=None):
+        """ A command line for the system shell (/bin/sh). """
+        return Launch(command, cwd, True)
+
+    def popen(self, launch, priority=process_tuning.DEFAULT_PRIORITY):
+        # The priority is applied by the ProcessTreeTuner (nice) once the process runs
+        return subprocess.Popen(launch.args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=launch.cwd,
+                                shell=launch.shell, start_new_session=True)
+
+    def kill_tree(self, pid):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Not a group leader, e.g. a worker started by an older manager: only the process itself can be reached
+            os.kill(pid, signal.SIGKILL)
+
+
+def create(backend=DEFAULT_BACKEND, msys2_path=MSYS2_PATH):
+    """ The launcher of a backend in BACKENDS. Raises ValueError for an unknown one. """
+    if backend == "msys2":
+        return Msys2Launcher(msys2_path)
+    if backend == "posix":
+        if sys.platform == "win32":
+            raise ValueError("the posix launch backend needs a POSIX system")
+        return PosixLauncher()
+    raise ValueError(f"unknown launch backend '{backend}' (expected one of: {', '.join(BACKENDS)})")
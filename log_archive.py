@@ -0,0 +1,293 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+
+# --- Constants ---
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024      # Compressed size at which a segment is closed and a new one started
+ARCHIVE_MAX_BYTES = 512 * 1024 * 1024    # Total archive size; the oldest segments are deleted beyond it
+BLOCK_MAX_BYTES = 64 * 1024              # Uncompressed bytes per independently compressed block
+FLUSH_INTERVAL_SECONDS = 5.0             # Longest time a record waits in memory before it is written
+SEGMENT_SUFFIX = ".log.gz"
+INDEX_SUFFIX = ".idx.json"
+
+
+def _encode_record(record):
+    message = record.message.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return f"{record.timestamp:.3f}\t{record.level}\t{message}\n"
+
+
+def _decode_line(line):
+    timestamp, level, message = line.split("\t", 2)
+    message = re.sub(r"\\(.)", lambda m: {"t": "\t", "n": "\n", "r": "\r"}.get(m.group(1), m.group(1)), message)
+    return float(timestamp), level, message
+
+
+class LogArchive:
+    """
+    Appends log records to size-rotated, compressed segment files from a background thread.
+
+    Each segment is a series of gzip members ("blocks"), so the file stays readable with any gzip tool
+    while a single block can be decompressed on its own. Next to every segment a small JSON index keeps
+    its time range, level counts and, per block, the byte offset, time range and level counts, plus the
+    offsets of blocks holding task starts. Searches use the indexes to pick the blocks to decompress.
+    """
+
+    def __init__(self, directory, is_task_start=None, segment_max_bytes=SEGMENT_MAX_BYTES,
+                 archive_max_bytes=ARCHIVE_MAX_BYTES, on_error=None):
+        self.directory = directory
+        self.is_task_start = is_task_start
+        self.segment_max_bytes = segment_max_bytes
+        self.archive_max_bytes = archive_max_bytes
+        self.on_error = on_error
+        self._queue = queue.SimpleQueue()
+        self._closed = threading.Event()
+        self._thread = None
+        self._segment_file = None
+        self._segment_index = None
+        self._segment_path = None
+
+    # --- Producer side (any thread) ---
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, records):
+        """ Queues records for writing. Never blocks on disk I/O. """
+        if not self._closed.is_set():
+            self._queue.put(records)
+
+    def close(self, timeout=2.0):
+        """ Flushes queued records and closes the current segment, waiting at most `timeout` seconds. """
+        self._closed.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # --- Writer thread ---
+    def _run(self):
+        pending = []
+        pending_bytes = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                records = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                records = ()
+
+            if records is None:
+                self._write_block(pending)
+                self._close_segment()
+                return
+
+            for record in records:
+                line = _encode_record(record)
+                pending.append((record, line))
+                pending_bytes += len(line)
+            if pending and deadline is None:
+                deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+
+            if pending and (pending_bytes >= BLOCK_MAX_BYTES or time.monotonic() >= deadline):
+                self._write_block(pending)
+                pending = []
+                pending_bytes = 0
+                deadline = None
+
+    def _write_block(self, pending):
+        if not pending:
+            return
+        try:
+            if self._segment_file is None:
+                self._open_segment(pending[0][0].timestamp)
+
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip member
+            data = compressor.compress("".join(line for _, line in pending).encode("utf-8")) + compressor.flush()
+
+            offset = self._segment_file.tell()
+            self._segment_file.write(data)
+            self._segment_file.flush()
+
+            levels = {}
+            for record, _ in pending:
+                levels[record.level] = levels.get(record.level, 0) + 1
+            first_ts = pending[0][0].timestamp
+            last_ts = pending[-1][0].timestamp
+            self._segment_index["blocks"].append({
+                "offset": offset, "length": len(data), "start": first_ts, "end": last_ts, "levels": levels,
+            })
+            if self.is_task_start is not None:
+                for record, _ in pending:
+                    if self.is_task_start(record):
+                        self._segment_index["task_starts"].append(
+                            {"time": record.timestamp, "offset": offset, "message": record.message})
+
+            index = self._segment_index
+            index["start"] = index["start"] if index["start"] is not None else first_ts
+            index["end"] = last_ts
+            for level, count in levels.items():
+                index["levels"][level] = index["levels"].get(level, 0) + count
+            self._write_index()
+
+            if self._segment_file.tell() >= self.segment_max_bytes:
+                self._close_segment()
+        except Exception as e:
+            self._report_error(e)
+
+    def _open_segment(self, timestamp):
+        os.makedirs(self.directory, exist_ok=True)
+        name = time.strftime("log-%Y%m%d-%H%M%S", time.localtime(timestamp))
+        path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}-{counter}{SEGMENT_SUFFIX}")
+            counter += 1
+        self._segment_path = path
+        self._segment_file = open(path, "ab")
+        self._segment_index = {"segment": os.path.basename(path), "start": None, "end": None,
+                               "levels": {}, "blocks": [], "task_starts": []}
+
+    def _write_index(self):
+        index_path = self._segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._segment_index, f, separators=(",", ":"))
+        os.replace(tmp_path, index_path)
+
+    def _close_segment(self):
+        if self._segment_file is None:
+            return
+        try:
+            self._segment_file.close()
+        finally:
+            self._segment_file = None
+            self._segment_index = None
+            self._segment_path = None
+        try:
+            self._enforce_retention()
+        except Exception as e:
+            self._report_error(e)
+
+    def _enforce_retention(self):
+        segments = list_segments(self.directory)
+        total = sum(os.path.getsize(path) for path, _ in segments)
+        for path, index_path in segments:
+            if total <= self.archive_max_bytes:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+            if os.path.exists(index_path):
+                os.remove(index_path)
+
+    def _report_error(self, error):
+        if self.on_error is not None:
+            self.on_error(error)
+
+
+# --- Reading / searching (works on closed and in-progress segments alike) ---
+def list_segments(directory):
+    """ Returns (segment_path, index_path) pairs, oldest first. """
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(SEGMENT_SUFFIX):
+            path = os.path.join(directory, name)
+            segments.append((path, path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX))
+    return segments
+
+
+def load_index(index_path):
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_block(f, block):
+    f.seek(block["offset"])
+    data = f.read(block["length"])
+    return zlib.decompress(data, 31).decode("utf-8", errors="replace")
+
+
+def search(directory, start=None, end=None, levels=None, pattern=None):
+    """
+    Yields (timestamp, level, message) tuples matching every given filter, oldest first.
+
+    start/end are epoch seconds, levels a set of level names and pattern a compiled regex or a
+    substring. Segments and blocks whose index rules them out are never decompressed.
+    """
+    if isinstance(pattern, str):
+        pattern = re.compile(re.escape(pattern))
+
+    def overlaps(entry):
+        if entry.get("start") is None:
+            return False
+        return (start is None or entry["end"] >= start) and (end is None or entry["start"] <= end)
+
+    def has_levels(entry):
+        return levels is None or any(entry["levels"].get(level) for level in levels)
+
+    for path, index_path in list_segments(directory):
+        index = load_index(index_path)
+        if index is None or not overlaps(index) or not has_levels(index):
+            continue
+        with open(path, "rb") as f:
+            for block in index["blocks"]:
+                if not overlaps(block) or not has_levels(block):
+                    continue
+                # Only "\n" ends a record: splitlines() would also split on "\r" and other breaks inside messages
+                for line in _read_block(f, block).split("\n"):
+                    if not line:
+                        continue
+                    timestamp, level, message = _decode_line(line)
+                    if start is not None and timestamp < start:
+                        continue
+                    if end is not None and timestamp > end:
+                        continue
+                    if levels is not None and level not in levels:
+                        continue
+                    if pattern is not None and not pattern.search(message):
+                        continue
+                    yield timestamp, level, message
+
+
+def task_starts(directory, start=None, end=None):
+    """ Yields (timestamp, segment_path, offset, message) for every indexed task start. Reads only indexes. """
+    for path, index_path in list_segments(directory):
+        index = load_index(index_path)
+        if index is None:
+            continue
+        for entry in index.get("task_starts", []):
+            if (start is None or entry["time"] >= start) and (end is None or entry["time"] <= end):
+                yield entry["time"], path, entry["offset"], entry["message"]
+
+
+if __name__ == "__main__":
+    import argparse
+    import datetime
+
+    parser = argparse.ArgumentParser(description="Search the archived Fishtest Worker Manager logs.")
+    parser.add_argument("directory", help="Log archive directory (the 'logs' folder next to 'worker')")
+    parser.add_argument("--since", help="Start date/time, e.g. 2024-05-14 or '2024-05-14 18:00'")
+    parser.add_argument("--until", help="End date/time, same format as --since")
+    parser.add_argument("--level", action="append", help="Level to include (repeatable), e.g. ERROR")
+    parser.add_argument("--grep", help="Regular expression the message must match")
+    args = parser.parse_args()
+
+    def parse_time(value, end_of_day=False):
+        if not value:
+            return None
+        moment = datetime.datetime.fromisoformat(value)
+        if end_of_day and len(value) <= 10:
+            moment += datetime.timedelta(days=1, microseconds=-1)
+        return moment.timestamp()
+
+    for ts, lvl, msg in search(args.directory, parse_time(args.since), parse_time(args.until, end_of_day=True),
+                               set(level.upper() for level in args.level) if args.level else None,
+                               re.compile(args.grep) if args.grep else None):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))} [{lvl:<7}] {msg}")
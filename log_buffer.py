@@ -0,0 +1,94 @@
+import collections
+import itertools
+import time
+
+# --- Constants ---
+DEFAULT_CAPACITY = 200_000   # Records kept in memory; older ones are dropped
+
+LogRecord = collections.namedtuple("LogRecord", ["seq", "timestamp", "level", "message"])
+
+
+class LogBuffer:
+    """
+    Fixed-capacity ring buffer of structured log records.
+
+    Appending is O(1) and never grows past `capacity`: once full, each new record evicts the oldest.
+    Every record gets a monotonically increasing sequence number, so callers can tell how many
+    records were dropped and address records independently of their position in the ring.
+    `by_level` indexes the same records per level (oldest first), so the records of a few levels can be
+    listed without scanning the others.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.records = collections.deque(maxlen=capacity)
+        self.by_level = {}
+        self.next_seq = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def dropped(self):
+        """ Number of records evicted since the buffer was created. """
+        return self.next_seq - len(self.records)
+
+    def append(self, level, message, timestamp=None):
+        record = LogRecord(self.next_seq, time.time() if timestamp is None else timestamp, level, message)
+        self._evict(1)
+        self.records.append(record)
+        self._level_index(level).append(record)
+        self.next_seq += 1
+        return record
+
+    def extend(self, entries, timestamp=None):
+        """ Appends (message, level) entries sharing one timestamp. Returns the new records. """
+        if timestamp is None:
+            timestamp = time.time()
+        seq = self.next_seq
+        new_records = [LogRecord(seq + i, timestamp, level, message) for i, (message, level) in enumerate(entries)]
+        indexed = new_records
+        if len(new_records) >= self.capacity:
+            self.clear()
+            indexed = new_records[-self.capacity:] if self.capacity else []
+        else:
+            self._evict(len(new_records))
+        self.records.extend(new_records)
+        # A batch is mostly one level (worker output), so look the index up once per run of equal levels
+        level = index = None
+        for record in indexed:
+            if record.level != level:
+                level = record.level
+                index = self._level_index(level)
+            index.append(record)
+        self.next_seq = seq + len(new_records)
+        return new_records
+
+    def _level_index(self, level):
+        index = self.by_level.get(level)
+        if index is None:
+            index = self.by_level[level] = collections.deque()
+        return index
+
+    def _evict(self, count):
+        # The records the ring is about to drop are the oldest of their levels
+        overflow = len(self.records) + count - self.capacity
+        if overflow > 0:
+            for record in itertools.islice(self.records, overflow):
+                self.by_level[record.level].popleft()
+
+    def tail(self, count):
+        """ Returns the last `count` records, oldest first. """
+        if count >= len(self.records):
+            return list(self.records)
+        # Walk from the newest end so the cost depends on `count`, not on the buffer size.
+        records = list(itertools.islice(reversed(self.records), count))
+        records.reverse()
+        return records
+
+    def clear(self):
+        self.records.clear()
+        self.by_level.clear()
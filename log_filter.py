@@ -0,0 +1,77 @@
+"""
+Filtering and searching the in-memory log records of the log view.
+
+A LogQuery keeps the records of some levels and, with a search text, only those whose message contains
+it (a substring, or a regular expression). The level indexes of the LogBuffers (by_level) make a level
+filter cost only the records that are shown: newest() merges the newest records of the chosen levels
+of every instance and stops as soon as enough of them matched. A search has to look at every record of
+the chosen levels until enough matched, so the GUI runs it on snapshot() copies in a background thread.
+"""
+import heapq
+import itertools
+import re
+
+# --- Constants ---
+LEVELS = ("WORKER", "CMD", "INFO", "SUCCESS", "WARNING", "ERROR", "FATAL", "DEBUG")
+
+
+class LogQuery:
+    """ Which records the log view shows. Raises ValueError for an invalid regular expression. """
+
+    def __init__(self, levels=LEVELS, text="", regex=False, ignore_case=True):
+        self.levels = tuple(levels)
+        self.text = text
+        self.regex = regex
+        self.pattern = None   # Finds the hits to highlight
+        self.search = None    # search(message) is true if the message matches
+        if text:
+            try:
+                self.pattern = re.compile(text if regex else re.escape(text), re.IGNORECASE if ignore_case else 0)
+            except re.error as e:
+                raise ValueError(f"invalid regular expression: {e}") from None
+            self.search = self.pattern.search
+            if not regex and ignore_case:
+                # Several times faster than an IGNORECASE pattern, which matters when a search scans the whole log
+                needle = text.lower()
+                self.search = lambda message: needle in message.lower()
+
+    @property
+    def active(self):
+        """ False if the query shows every record, i.e. the view can simply follow the log. """
+        return self.pattern is not None or not set(LEVELS) <= set(self.levels)
+
+    def matches(self, record):
+        return record.level in self.levels and (self.search is None or bool(self.search(record.message)))
+
+    def spans(self, message):
+        """ (start, end) of every match in a message, to highlight them. """
+        if self.pattern is None:
+            return []
+        return [match.span() for match in self.pattern.finditer(message) if match.end() > match.start()]
+
+
+def snapshot(sources, levels, limit=None):
+    """
+    Copies of the level indexes of (instance, LogBuffer) sources, newest first, safe to read from another
+    thread. With `limit` only the newest `limit` records of each level are copied.
+    """
+    lists = []
+    for instance, buffer in sources:
+        for level in levels:
+            index = buffer.by_level.get(level)
+            if index:
+                lists.append((instance, list(itertools.islice(reversed(index), limit))))
+    return lists
+
+
+def newest(lists, query, limit):
+    """ The last `limit` (instance, record) pairs of snapshot() lists that match the query, oldest first. """
+    search = query.search
+    # Each list is searched before the merge, so the merge only orders matches
+    streams = [zip(itertools.repeat(instance), records if search is None else
+                   (record for record in records if search(record.message)))
+               for instance, records in lists]
+    merged = heapq.merge(*streams, key=lambda item: (item[1].timestamp, item[1].seq), reverse=True)
+    found = list(itertools.islice(merged, limit))
+    found.reverse()
+    return found
@@ -0,0 +1,173 @@
+import codecs
+import queue
+import threading
+import time
+
+# --- Constants ---
+READ_CHUNK_SIZE = 64 * 1024    # Bytes requested per read from a process pipe
+RATE_WINDOW_SECONDS = 1.0      # Window used to measure the peak ingestion rate
+
+
+class IngestStats:
+    """ Counts lines and bytes read from a process pipe and derives rates from them. """
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.started_at = time.monotonic()
+        self.peak_lines_per_sec = 0.0
+        self.peak_bytes_per_sec = 0.0
+        self._window_start = self.started_at
+        self._window_lines = 0
+        self._window_bytes = 0
+
+    def add(self, lines, nbytes):
+        # Only the reader thread writes here, so plain attribute updates are enough.
+        self.lines += lines
+        self.bytes += nbytes
+        self._window_lines += lines
+        self._window_bytes += nbytes
+
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW_SECONDS:
+            self.peak_lines_per_sec = max(self.peak_lines_per_sec, self._window_lines / elapsed)
+            self.peak_bytes_per_sec = max(self.peak_bytes_per_sec, self._window_bytes / elapsed)
+            self._window_start = now
+            self._window_lines = 0
+            self._window_bytes = 0
+
+    def elapsed(self):
+        return max(time.monotonic() - self.started_at, 1e-9)
+
+    def lines_per_sec(self):
+        return self.lines / self.elapsed()
+
+    def bytes_per_sec(self):
+        return self.bytes / self.elapsed()
+
+    def summary(self):
+        # Runs shorter than one rate window never close a window; their average is their peak.
+        peak_lines = max(self.peak_lines_per_sec, self.lines_per_sec())
+        peak_bytes = max(self.peak_bytes_per_sec, self.bytes_per_sec())
+        return (f"Ingested {self.lines} lines ({self.bytes / 1024:.1f} KiB) in {self.elapsed():.0f}s: "
+                f"avg {self.lines_per_sec():.0f} lines/s, {self.bytes_per_sec() / 1024:.1f} KiB/s; "
+                f"peak {peak_lines:.0f} lines/s, {peak_bytes / 1024:.1f} KiB/s")
+
+
+class OutputReader(threading.Thread):
+    """
+    Reads a binary process pipe in large chunks and hands complete lines to on_lines in batches.
+
+    One call to on_lines is made per chunk, so a burst of output costs one callback instead of
+    one per line. Multi-byte UTF-8 sequences split across chunks are handled by an incremental decoder.
+    """
+
+    def __init__(self, stream, on_lines, stats=None, chunk_size=READ_CHUNK_SIZE):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.on_lines = on_lines
+        self.stats = stats if stats is not None else IngestStats()
+        self.chunk_size = chunk_size
+
+    def _read_chunk(self):
+        # read1() returns as soon as some data is available instead of waiting for a full chunk.
+        read = getattr(self.stream, "read1", self.stream.read)
+        return read(self.chunk_size)
+
+    def run(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while True:
+            chunk = self._read_chunk()
+            if not chunk:
+                break
+            text = pending + decoder.decode(chunk)
+            parts = text.split("\n")
+            pending = parts.pop()  # Last element is an incomplete line (or empty)
+            lines = [part.strip() for part in parts]
+            self.stats.add(len(lines), len(chunk))
+            if lines:
+                self.on_lines(lines)
+
+        tail = (pending + decoder.decode(b"", final=True)).strip()
+        if tail:
+            self.stats.add(1, 0)
+            self.on_lines([tail])
+
+
+def coalesce(items):
+    """
+    Merges consecutive line batches bound for the same handler.
+
+    Each item is (handler, lines, is_batch). Line batches are merged so the handler can apply them
+    in one widget update; any other item acts as a barrier so ordering is kept.
+    """
+    merged = []
+    for handler, payload, is_batch in items:
+        if is_batch and merged and merged[-1][2] and merged[-1][0] == handler:
+            merged[-1][1].extend(payload)
+        else:
+            merged.append((handler, list(payload) if is_batch else payload, is_batch))
+    return merged
+
+
+class CallQueue:
+    """
+    Hands calls from background threads to the one thread that owns the application state.
+
+    The Tk frontend drains it once per frame, the headless frontend from its main loop. Line batches
+    posted with post_lines() are coalesced per drain, everything else runs in posting order.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self.diagnostics = None   # ui_diagnostics.LoopDiagnostics timing each drain and handler, when enabled
+
+    def post(self, func, *args):
+        """ Queues func(*args). Safe to call from any thread. """
+        self._queue.put((func, args, False))
+
+    def post_lines(self, handler, lines):
+        """ Queues a batch of output lines for handler(lines). Safe to call from any thread. """
+        self._queue.put((handler, lines, True))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def drain(self, max_items, timeout=None, on_error=None):
+        """
+        Runs up to max_items queued calls and returns how many were taken. With a timeout, waits that
+        long for the first item. Exceptions are passed to on_error() if given, so one failing call
+        does not drop the rest of the batch.
+        """
+        items = []
+        try:
+            if timeout is not None:
+                items.append(self._queue.get(timeout=timeout))
+            while len(items) < max_items:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        diagnostics = self.diagnostics
+        if diagnostics is not None:
+            diagnostics.drain_started(len(items) + self._queue.qsize())
+            drain_started = time.perf_counter()
+        for handler, payload, is_batch in coalesce(items):
+            if diagnostics is not None:
+                started = time.perf_counter()
+            try:
+                if is_batch:
+                    handler(payload)
+                else:
+                    handler(*payload)
+            except Exception:
+                if on_error is None:
+                    raise
+                on_error()
+            if diagnostics is not None:
+                diagnostics.handler_finished(handler, time.perf_counter() - started)
+        if diagnostics is not None:
+            diagnostics.drain_finished(len(items), time.perf_counter() - drain_started)
+        return len(items)
@@ -0,0 +1,181 @@
+"""
+Opt-in HTTP endpoint with worker metrics for fleet monitoring ([metrics] in manager.cfg).
+
+    GET /metrics        Prometheus text format
+    GET /metrics.json   The same values as JSON
+
+Counters live in one WorkerMetrics per instance and are only written by the state thread while it
+handles worker output: a few integer additions per progress line, no locks. Everything else (state,
+task progress, rate, ETA, restarts) is published by the supervisor together with the status file, as
+one dict that is replaced whole. The server thread only reads, so it never blocks or slows the
+state thread, and a scrape always sees complete values.
+"""
+import json
+import threading
+import time
+
+# --- Constants ---
+DEFAULT_BIND = "127.0.0.1"
+DEFAULT_PORT = 9187
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STATES = ("running", "stopping", "busy", "restarting", "failed", "idle")   # WorkerSupervisor.state()
+
+
+class WorkerMetrics:
+    """ Cumulative counters of one worker instance, written by the state thread only. """
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.tasks = 0
+        self.status = None          # Last published supervisor status(), replaced whole
+        # Figures of the current task already counted; None until a task start gives a known baseline
+        self._task_games = None
+        self._task_wld = None
+
+    def worker_started(self):
+        # A worker that starts mid-task reports cumulative figures; its first line only sets the baseline
+        self._task_games = None
+        self._task_wld = None
+
+    def task_started(self):
+        self.tasks += 1
+        self._task_games = 0
+        self._task_wld = (0, 0, 0)
+
+    def progress(self, event):
+        """ Counts what a 'Games: N, Wins: ...' line adds to the previous one of the same task. """
+        if self._task_games is not None and event.games > self._task_games:
+            self.games += event.games - self._task_games
+        self._task_games = event.games
+        if event.wins is None:
+            return
+        if self._task_wld is not None:
+            wins, losses, draws = self._task_wld
+            self.wins += max(event.wins - wins, 0)
+            self.losses += max(event.losses - losses, 0)
+            self.draws += max(event.draws - draws, 0)
+        self._task_wld = (event.wins, event.losses, event.draws)
+
+    def publish(self, status):
+        self.status = status
+
+
+# --- Exposition ---
+def _families(name, metrics):
+    """ (metric, type, help, labels, value) of one instance. """
+    status = metrics.status or {}
+    task = status.get("task") or {}
+    rates = status.get("throughput") or {}
+    watchdog = status.get("watchdog") or {}
+    resources = status.get("resources") or {}
+    labels = {"instance": name}
+    yield "fishtest_worker_up", "gauge", "1 if the worker process is running.", labels, int(status.get("state") in ("running", "stopping"))
+    for state in STATES:
+        yield "fishtest_worker_state", "gauge", "1 for the current state of the instance.", dict(labels, state=state), int(status.get("state") == state)
+    yield "fishtest_games_completed_total", "counter", "Games played since the manager started.", labels, metrics.games
+    for result, value in (("win", metrics.wins), ("loss", metrics.losses), ("draw", metrics.draws)):
+        yield "fishtest_game_results_total", "counter", "Game results of the tested engine since the manager started.", dict(labels, result=result), value
+    yield "fishtest_tasks_started_total", "counter", "Tasks started since the manager started.", labels, metrics.tasks
+    yield "fishtest_games_per_minute", "gauge", "Current game rate.", labels, rates.get("games_per_min")
+    yield "fishtest_session_games_per_minute", "gauge", "Average game rate over the play time of this session.", labels, rates.get("session_games_per_min")
+    yield "fishtest_task_games", "gauge", "Games played in the current task.", labels, task.get("games")
+    yield "fishtest_task_games_target", "gauge", "Games of the current task.", labels, task.get("total_games")
+    yield "fishtest_task_eta_seconds", "gauge", "Estimated time until the current task is finished.", labels, rates.get("eta")
+    yield "fishtest_worker_restarts_total", "counter", "Automatic restarts by the watchdog.", labels, watchdog.get("restarts")
+    yield "fishtest_worker_crashes_total", "counter", "Worker exits the watchdog did not ask for.", labels, watchdog.get("crashes")
+    yield "fishtest_worker_hangs_total", "counter", "Hangs detected by the watchdog.", labels, watchdog.get("hangs")
+    yield "fishtest_worker_downtime_seconds_total", "counter", "Time the worker was down after failures.", labels, watchdog.get("downtime_seconds")
+    yield "fishtest_worker_cpu_percent", "gauge", "CPU use of the worker process tree (100 = one core).", labels, resources.get("cpu_percent")
+    yield "fishtest_worker_memory_bytes", "gauge", "Resident memory of the worker process tree.", labels, resources.get("rss")
+    yield "fishtest_status_timestamp_seconds", "gauge", "When the published figures were last updated.", labels, status.get("updated_at")
+
+
+def _format_labels(labels):
+    return ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for key, value in labels.items())
+
+
+def render_prometheus(instances):
+    """ Prometheus text exposition of [(name, WorkerMetrics)]. Missing values are left out. """
+    families = {}
+    for name, metrics in instances:
+        for metric, kind, help_text, labels, value in _families(name, metrics):
+            if value is not None:
+                families.setdefault(metric, (kind, help_text, []))[2].append((labels, value))
+    lines = []
+    for metric, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, value in samples:
+            lines.append(f"{metric}{{{_format_labels(labels)}}} {float(value):g}")
+    return "\n".join(lines) + "\n"
+
+
+def render_json(instances):
+    return json.dumps({
+        "time": time.time(),
+        "instances": {name: {"games": metrics.games, "wins": metrics.wins, "losses": metrics.losses,
+                             "draws": metrics.draws, "tasks": metrics.tasks, "status": metrics.status}
+                      for name, metrics in instances},
+    }, indent=1)
+
+
+class MetricsServer:
+    """
+    Serves the metrics of all supervisors yielded by `source()` from a daemon thread.
+    `source` is called per request, so instances added or removed later are picked up.
+    """
+
+    def __init__(self, source, bind=DEFAULT_BIND, port=DEFAULT_PORT):
+        self.source = source
+        self.bind = bind
+        self.port = port
+        self.server = None
+        self.requests = 0
+
+    def _instances(self):
+        return [(core.name, core.metrics) for core in list(self.source())]
+
+    def start(self):
+        """ Starts listening. Raises OSError if the port cannot be used. """
+        import http.server  # Only loaded when the endpoint is enabled
+        metrics_server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                metrics_server.requests += 1
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body, content_type = render_prometheus(metrics_server._instances()), PROMETHEUS_CONTENT_TYPE
+                elif path == "/metrics.json":
+                    body, content_type = render_json(metrics_server._instances()), "application/json"
+                else:
+                    self.send_error(404, "Try /metrics or /metrics.json")
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self.server = http.server.ThreadingHTTPServer((self.bind, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def url(self):
+        return f"http://{self.bind}:{self.port}/metrics"
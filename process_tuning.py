@@ -0,0 +1,147 @@
+import subprocess
+import sys
+import threading
+
+# --- Constants ---
+PRIORITIES = ("idle", "below_normal", "normal", "above_normal")
+DEFAULT_PRIORITY = "normal"
+TUNE_INTERVAL_SECONDS = 2.0   # How often the process tree is scanned for newly spawned children
+# Nice values used outside Windows; raising the priority above normal needs root there
+POSIX_NICE = {"idle": 19, "below_normal": 10, "normal": 0, "above_normal": -5}
+
+
+def parse_cpu_list(spec):
+    """
+    Parses a CPU list such as "0-7,16-23" into a sorted list of CPU numbers.
+    An empty spec or "all" means no pinning and returns None. Raises ValueError on bad input.
+    """
+    spec = (spec or "").strip().lower()
+    if spec in ("", "all"):
+        return None
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        first, sep, last = part.partition("-")
+        if not first.isdigit() or (sep and not last.isdigit()):
+            raise ValueError(f"'{part}' is not a CPU number or range")
+        first, last = int(first), int(last) if sep else int(first)
+        if last < first:
+            raise ValueError(f"'{part}' is an empty range")
+        cpus.update(range(first, last + 1))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    """ Inverse of parse_cpu_list: [0, 1, 2, 5] -> "0-2,5". """
+    if not cpus:
+        return "all"
+    ranges = [[cpus[0], cpus[0]]]
+    for cpu in cpus[1:]:
+        if cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def priority_creationflags(priority):
+    """ Popen creationflags that start the process (and, by inheritance, its children) at this priority. """
+    if sys.platform != "win32":
+        return 0
+    return {
+        "idle": subprocess.IDLE_PRIORITY_CLASS,
+        "below_normal": subprocess.BELOW_NORMAL_PRIORITY_CLASS,
+        "above_normal": subprocess.ABOVE_NORMAL_PRIORITY_CLASS,
+    }.get(priority, 0)
+
+
+def _psutil_priority(psutil, priority):
+    if sys.platform == "win32":
+        return {
+            "idle": psutil.IDLE_PRIORITY_CLASS,
+            "below_normal": psutil.BELOW_NORMAL_PRIORITY_CLASS,
+            "normal": psutil.NORMAL_PRIORITY_CLASS,
+            "above_normal": psutil.ABOVE_NORMAL_PRIORITY_CLASS,
+        }[priority]
+    return POSIX_NICE[priority]
+
+
+def is_available():
+    """ True if psutil can be imported; without it only the start priority of the tree can be set on Windows. """
+    try:
+        import psutil  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ProcessTreeTuner(threading.Thread):
+    """
+    Pins a process and all its descendants to a CPU set and sets their priority.
+
+    Both are inherited by children, but the worker's engines and cutechess are started through shells and
+    Python processes that may reset them, so the tree is rescanned every TUNE_INTERVAL_SECONDS and each
+    process not seen before is tuned once. Processes are keyed by (pid, create_time) so a reused PID is
+    tuned again.
+    """
+
+    def __init__(self, pid, cpus=None, priority=DEFAULT_PRIORITY, interval=TUNE_INTERVAL_SECONDS, on_error=None):
+        super().__init__(daemon=True, name="ProcessTreeTuner")
+        import psutil
+        self.psutil = psutil
+        self.pid = pid
+        self.cpus = cpus
+        self.priority = priority
+        self.interval = interval
+        self.on_error = on_error or (lambda error: None)
+        self.tuned = 0
+        self._seen = set()
+        self._error_reported = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            self.apply()
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+
+    def apply(self):
+        """ Tunes processes of the tree not seen before. Returns how many were tuned. """
+        psutil = self.psutil
+        try:
+            root = psutil.Process(self.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0  # The tree is gone; the supervisor stops us once it notices
+
+        count = 0
+        alive = set()
+        for process in processes:
+            try:
+                key = (process.pid, process.create_time())
+            except psutil.Error:
+                continue
+            alive.add(key)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            try:
+                if self.cpus is not None:
+                    process.cpu_affinity(self.cpus)
+                if self.priority != DEFAULT_PRIORITY:
+                    process.nice(_psutil_priority(psutil, self.priority))
+                count += 1
+            except psutil.NoSuchProcess:
+                pass
+            except (psutil.Error, ValueError, OSError) as e:
+                # Report once: an invalid CPU or missing rights fails the same way for every process
+                if not self._error_reported:
+                    self._error_reported = True
+                    self.on_error(e)
+        # Forget exited processes so the set stays as small as the tree
+        self._seen &= alive
+        self.tuned += count
+        return count
@@ -0,0 +1,214 @@
+"""
+Check for a new release of the manager without asking GitHub on every launch.
+
+The answer is kept in a small JSON file in the per-user cache folder, shared by every copy of the manager on
+the machine. Within CHECK_TTL_SECONDS of the last answer nothing is sent at all; after that the request carries
+the ETag (and date) of the last answer, so an unchanged release costs a 304 that does not count against the
+GitHub rate limit. Failures are retried later and later (rate limits as long as the server asks), and only
+one copy of the manager asks at a time.
+
+    python release_check.py [--url URL] [--cache FILE] [--ttl-hours H] [--force]
+
+--url points the check at a local stand-in server, e.g. `python -m http.server` serving a latest.json.
+"""
+import argparse
+import collections
+import email.utils
+import json
+import os
+import time
+
+import watchdog
+from common import APP_NAME, RELEASE_CHECK_FILE, REPO_NAME, REPO_OWNER
+
+# --- Constants ---
+RELEASES_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/releases/latest"
+CHECK_TTL_SECONDS = 6 * 3600          # Answers younger than this are used without a request
+BACKOFF_BASE_SECONDS = 15 * 60        # First retry delay after a failed check, doubled per failure
+BACKOFF_MAX_SECONDS = 24 * 3600
+HTTP_TIMEOUT_SECONDS = 5
+LOCK_STALE_SECONDS = 60               # A lock file older than this was left by a crashed check
+
+# tag: latest release tag or None; status: cached, not modified, updated, backoff, busy or failed;
+# checked_at: time of the answer the tag comes from; message: what happened, for the log
+CheckResult = collections.namedtuple("CheckResult", ["tag", "status", "checked_at", "message"])
+
+
+class ReleaseCheck:
+    """ The cached release check for one URL. """
+
+    def __init__(self, url=RELEASES_URL, cache_file=RELEASE_CHECK_FILE, ttl=CHECK_TTL_SECONDS, clock=time.time):
+        self.url = url
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.clock = clock
+
+    # --- Cache file ---
+    def load(self):
+        """ The cached state for this URL, or an empty one. """
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) and state.get("url") == self.url else {}
+
+    def _save(self, state):
+        state["url"] = self.url
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=1)
+            os.replace(tmp_path, self.cache_file)
+        except OSError:
+            pass  # Without a writable cache the next launch simply asks again
+
+    def due(self, state=None):
+        """ True if run() would send a request now: the answer is stale and no retry delay is pending. """
+        state = self.load() if state is None else state
+        now = self.clock()
+        if now < state.get("retry_at", 0):
+            return False
+        return now - state.get("checked_at", 0) >= self.ttl
+
+    def cached(self, state=None):
+        """ The result run() gives while no request is due, without touching the network. """
+        state = self.load() if state is None else state
+        if self.clock() < state.get("retry_at", 0):
+            retry = time.strftime("%H:%M", time.localtime(state["retry_at"]))
+            return CheckResult(state.get("tag"), "backoff", state.get("checked_at"),
+                               f"App update check paused until {retry} after {state.get('failures', 0)} failure(s): "
+                               f"{state.get('last_error', 'unknown error')}")
+        return CheckResult(state.get("tag"), "cached", state.get("checked_at"), "")
+
+    # --- Network ---
+    def run(self, force=False):
+        """ Returns a CheckResult, asking the server only when due (or forced). Blocks for at most a few seconds. """
+        state = self.load()
+        if not force and not self.due(state):
+            return self.cached(state)
+        if not self._lock():
+            # Another copy of the manager is asking right now; its answer lands in the same file
+            return CheckResult(state.get("tag"), "busy", state.get("checked_at"), "")
+        try:
+            state = self.load()  # The lock holder before us may just have answered
+            if not force and not self.due(state):
+                return self.cached(state)
+            return self._request(state)
+        finally:
+            self._unlock()
+
+    def _request(self, state):
+        import urllib.error
+        import urllib.request
+        headers = {"User-Agent": APP_NAME, "Accept": "application/vnd.github+json"}
+        if state.get("tag") and state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("tag") and state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        now = self.clock()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url, headers=headers),
+                                        timeout=HTTP_TIMEOUT_SECONDS) as response:
+                data = json.loads(response.read().decode("utf-8"))
+                tag = data.get("tag_name", "") if isinstance(data, dict) else ""
+                if not tag:
+                    raise ValueError("no tag_name in the answer")
+                state.update(tag=tag, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"),
+                             checked_at=now, failures=0, retry_at=0, last_error=None)
+                self._save(state)
+                return CheckResult(tag, "updated", now, "")
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and state.get("tag"):
+                state.update(checked_at=now, failures=0, retry_at=0, last_error=None)
+                self._save(state)
+                return CheckResult(state["tag"], "not modified", now, "")
+            if e.code in (403, 429):
+                error = "GitHub API rate limit exceeded" if e.code == 403 else "too many requests"
+                return self._failed(state, error, _retry_after(e.headers, now))
+            return self._failed(state, f"HTTP {e.code}")
+        except (OSError, ValueError) as e:
+            return self._failed(state, str(getattr(e, "reason", e)))
+
+    def _failed(self, state, error, retry_at=None):
+        now = self.clock()
+        failures = state.get("failures", 0) + 1
+        delay = watchdog.backoff_delay(failures, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS)
+        state.update(failures=failures, retry_at=max(retry_at or 0, now + delay), last_error=error)
+        self._save(state)
+        return CheckResult(state.get("tag"), "failed", state.get("checked_at"), f"App update check failed ({error}).")
+
+    # --- One request per machine ---
+    @property
+    def _lock_path(self):
+        return self.cache_file + ".lock"
+
+    def _lock(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            try:
+                if time.time() - os.path.getmtime(self._lock_path) > LOCK_STALE_SECONDS:
+                    os.remove(self._lock_path)
+            except OSError:
+                pass
+            os.close(os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            return True  # No writable cache folder: check without coordination
+
+    def _unlock(self):
+        try:
+            os.remove(self._lock_path)
+        except OSError:
+            pass
+
+
+def _retry_after(headers, now):
+    """ When the server allows the next request (Retry-After or GitHub's X-RateLimit-Reset), or None. """
+    if headers is None:
+        return None
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return now + int(retry_after)
+        try:
+            return email.utils.parsedate_to_datetime(retry_after).timestamp()
+        except (TypeError, ValueError):
+            pass
+    reset = headers.get("X-RateLimit-Reset")
+    if reset and reset.strip().isdigit() and headers.get("X-RateLimit-Remaining") == "0":
+        return float(reset)
+    return None
+
+
+def is_newer(tag, current):
+    """ True if release `tag` (e.g. 'v1.2.0') is newer than version `current`. """
+    def parse_version(v_str):
+        # Remove 'v', split by '.', convert to integers
+        try:
+            return tuple(map(int, v_str.lstrip('v').split('.')))
+        except ValueError:
+            return (0, 0, 0)
+    return parse_version(tag) > parse_version(current)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check for a new release of the manager, using the shared cache.")
+    parser.add_argument("--url", default=RELEASES_URL, help="Release API URL or a local stand-in (default: GitHub)")
+    parser.add_argument("--cache", default=RELEASE_CHECK_FILE, help="Cache file (default: %(default)s)")
+    parser.add_argument("--ttl-hours", type=float, default=CHECK_TTL_SECONDS / 3600)
+    parser.add_argument("--force", action="store_true", help="Ask the server even if the cached answer is fresh")
+    args = parser.parse_args()
+
+    result = ReleaseCheck(args.url, args.cache, args.ttl_hours * 3600).run(force=args.force)
+    checked = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(result.checked_at)) if result.checked_at else "never"
+    print(f"{result.status}: latest release {result.tag or 'unknown'} (answer from {checked})")
+    if result.message:
+        print(result.message)
+
+
+if __name__ == "__main__":
+    main()
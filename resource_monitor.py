@@ -0,0 +1,192 @@
+import array
+import collections
+import threading
+import time
+
+# --- Constants ---
+SAMPLE_INTERVAL_SECONDS = 2.0    # Default time between two samples of the worker process tree
+MAX_INTERVAL_SECONDS = 30.0      # The interval is stretched up to this if sampling gets too expensive
+HISTORY_SAMPLES = 300            # Samples kept per metric (10 minutes at the default interval)
+OVERHEAD_BUDGET = 0.01           # Share of one core the sampler may use
+OVERHEAD_SMOOTHING = 0.2         # Weight of the newest measurement in the overhead average
+
+ResourceSample = collections.namedtuple("ResourceSample", [
+    "timestamp",         # time.time() of the sample
+    "cpu_percent",       # Sum over the tree; 100 means one fully used core
+    "rss",               # Resident memory of the tree in bytes
+    "threads",           # Threads in the tree
+    "processes",         # Processes in the tree
+    "read_rate",         # Bytes/s read by the tree since the previous sample
+    "write_rate",        # Bytes/s written by the tree since the previous sample
+    "top",               # [(pid, name, cpu_percent, rss, threads)] of the busiest processes
+    "overhead",          # Share of one core spent sampling (0.005 = 0.5%)
+])
+
+
+class SeriesRing:
+    """ Fixed-size ring of floats in a flat array: 8 bytes per sample and no allocation once full. """
+
+    def __init__(self, capacity=HISTORY_SAMPLES):
+        self.capacity = capacity
+        self._values = array.array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def values(self):
+        """ Oldest to newest. """
+        if self._count < self.capacity:
+            return self._values[:self._count].tolist()
+        return (self._values[self._next:] + self._values[:self._next]).tolist()
+
+    def latest(self, default=None):
+        return self._values[self._next - 1] if self._count else default
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+
+class ResourceHistory:
+    """ The recent samples of one worker as one SeriesRing per metric, plus the last full sample. """
+
+    METRICS = ("cpu_percent", "rss", "threads", "processes", "read_rate", "write_rate")
+
+    def __init__(self, capacity=HISTORY_SAMPLES):
+        self.series = {metric: SeriesRing(capacity) for metric in self.METRICS}
+        self.last = None
+
+    def append(self, sample):
+        self.last = sample
+        for metric, ring in self.series.items():
+            ring.append(getattr(sample, metric))
+
+    def clear(self):
+        self.last = None
+        for ring in self.series.values():
+            ring.clear()
+
+    def snapshot(self):
+        """ The last sample as plain data, for the status file. """
+        if self.last is None:
+            return None
+        return {
+            "cpu_percent": round(self.last.cpu_percent, 1),
+            "rss": self.last.rss,
+            "threads": self.last.threads,
+            "processes": self.last.processes,
+            "read_rate": round(self.last.read_rate),
+            "write_rate": round(self.last.write_rate),
+            "sampler_overhead_percent": round(self.last.overhead * 100, 3),
+        }
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples CPU, memory, threads and I/O of a process and its descendants on a background thread.
+
+    psutil.Process objects are kept between samples, keyed by (pid, create_time), because cpu_percent()
+    measures the time since the previous call on the same object. The CPU time this thread spends per
+    sample is measured; if the average exceeds OVERHEAD_BUDGET of one core the interval is stretched.
+    """
+
+    def __init__(self, pid, on_sample, interval=SAMPLE_INTERVAL_SECONDS, top_count=5):
+        super().__init__(daemon=True, name="ResourceSampler")
+        import psutil
+        self.psutil = psutil
+        self.pid = pid
+        self.on_sample = on_sample
+        self.interval = interval
+        self.top_count = top_count
+        self.overhead = 0.0
+        self._processes = {}
+        self._last_io = None        # (monotonic time, read bytes, write bytes)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            started = time.thread_time()
+            sample = self.sample()
+            cost = time.thread_time() - started
+            self.overhead += OVERHEAD_SMOOTHING * (cost / self.interval - self.overhead)
+            if self.overhead > OVERHEAD_BUDGET and self.interval < MAX_INTERVAL_SECONDS:
+                self.interval = min(MAX_INTERVAL_SECONDS, self.interval * 2)
+            if sample is None:
+                break  # The tree is gone
+            self.on_sample(sample._replace(overhead=self.overhead))
+
+    def stop(self):
+        self._stop_event.set()
+
+    def sample(self):
+        """ Takes one sample of the tree, or returns None if its root has exited. """
+        psutil = self.psutil
+        try:
+            root = self._processes.get("root") or psutil.Process(self.pid)
+            self._processes["root"] = root
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+
+        current = {}
+        rows = []
+        read_bytes = write_bytes = 0
+        for process in tree:
+            try:
+                key = (process.pid, process.create_time())
+                # Reuse the object from the previous sample so cpu_percent() covers the interval
+                process = self._processes.get(key, process)
+                with process.oneshot():
+                    cpu = process.cpu_percent()
+                    rss = process.memory_info().rss
+                    threads = process.num_threads()
+                    name = process.name()
+                    try:
+                        io = process.io_counters()
+                        read_bytes += io.read_bytes
+                        write_bytes += io.write_bytes
+                    except (AttributeError, psutil.AccessDenied):
+                        pass  # No per-process I/O counters on this platform
+            except psutil.Error:
+                continue
+            current[key] = process
+            rows.append((process.pid, name, cpu, rss, threads))
+        current["root"] = root
+        self._processes = current
+
+        now = time.monotonic()
+        read_rate = write_rate = 0.0
+        if self._last_io is not None:
+            elapsed = now - self._last_io[0]
+            # Exited children take their counters with them, so never report a negative rate
+            read_rate = max(0.0, (read_bytes - self._last_io[1]) / elapsed)
+            write_rate = max(0.0, (write_bytes - self._last_io[2]) / elapsed)
+        self._last_io = (now, read_bytes, write_bytes)
+
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return ResourceSample(
+            timestamp=time.time(),
+            cpu_percent=sum(row[2] for row in rows),
+            rss=sum(row[3] for row in rows),
+            threads=sum(row[4] for row in rows),
+            processes=len(rows),
+            read_rate=read_rate,
+            write_rate=write_rate,
+            top=rows[:self.top_count],
+            overhead=self.overhead,
+        )
+
+
+def format_bytes(count):
+    """ 1536 -> '1.5 KiB'. """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(count) < 1024 or unit == "GiB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
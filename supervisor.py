@@ -0,0 +1,815 @@
+import configparser
+import environment
+import json
+import os
+import sys
+import threading
+import time
+
+import launcher
+import log_archive
+import log_buffer
+import log_ingest
+import metrics
+import process_tuning
+import resource_monitor
+import task_history
+import throughput
+import watchdog
+import worker_output
+from common import CONFIG_FILE_NAME, EXIT_FILE_NAME, LOG_DIR, MSYS2_PATH, STATUS_FILE_NAME, USERNAME_DEFAULT, WORKER_DIR
+
+# --- Constants ---
+LOG_BUFFER_CAPACITY = 200_000    # Log records kept in memory (the log history source of truth)
+STATUS_WRITE_INTERVAL = 5.0      # Minimum seconds between progress-driven rewrites of the status file
+
+
+def pid_alive(pid):
+    """ True if a process with this PID exists. """
+    if sys.platform == "win32":
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_status_file(worker_dir=WORKER_DIR):
+    """ Returns the status last written by a running manager for this worker folder, or None. """
+    try:
+        with open(os.path.join(worker_dir, STATUS_FILE_NAME), encoding="utf-8") as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # A manager that crashed leaves a stale "running" status behind
+    if status.get("state") in ("running", "stopping", "restarting") and not (status.get("manager_pid") and pid_alive(status["manager_pid"])):
+        status["state"] = "unknown (manager not running)"
+    return status
+
+
+class WorkerSupervisor:
+    """
+    Runs and watches one fishtest worker, independently of any user interface.
+
+    All state lives on the thread that drains `calls` (the Tk thread in the GUI, the main loop in
+    headless mode). Background threads never touch it directly; they post to `calls`. Frontends
+    follow changes by setting the on_logs, on_state_changed and on_progress_changed callbacks.
+    """
+
+    def __init__(self, calls, worker_dir=WORKER_DIR, msys2_path=MSYS2_PATH, log_dir=LOG_DIR, name="worker"):
+        self.calls = calls
+        self.name = name
+        self.worker_dir = worker_dir
+        self.config_file = os.path.join(worker_dir, CONFIG_FILE_NAME)
+        self.msys2_path = msys2_path
+        self.log_dir = log_dir
+
+        self.worker_process = None
+        self.worker_starting = False    # start_worker() was called, the process is not up yet
+        self.stop_requested = False
+        self.pending_concurrency = None # Concurrency to restart with once the current task is done
+        self.is_long_operation_running = False
+        self.current_operation = ""
+        self.config = configparser.ConfigParser()
+        self._config_signature = None   # file_signature() of fishtest.cfg when it was last read
+        self.environment = environment.EnvironmentState(worker_dir, msys2_path)
+        # How the worker and commands are started and killed (replaced from manager.cfg by the InstanceManager)
+        self.launcher = launcher.create(launcher.DEFAULT_BACKEND, msys2_path)
+
+        # CPU placement of the worker process tree (set from manager.cfg by the InstanceManager)
+        self.cpu_affinity = None    # List of CPU numbers, or None for all CPUs
+        self.cpu_priority = process_tuning.DEFAULT_PRIORITY
+
+        # Shell command run in the worker folder instead of the MSYS2 worker, e.g. benchmarks/fake_worker.py
+        # (set from manager.cfg by the InstanceManager)
+        self.worker_command = None
+
+        # Resource usage of the worker process tree, sampled while it runs
+        self.resource_interval = resource_monitor.SAMPLE_INTERVAL_SECONDS
+        self.resources = resource_monitor.ResourceHistory()
+
+        # Steps of the installation last run by run_pipeline(), as snapshots
+        self.install_steps = []
+        self._install_step_states = {}   # Last logged status per step
+
+        # Task progress state
+        self.task_total_games = 0
+        self.task_current_games = 0
+        self.task_start_time = None
+        self.task_wld = None
+        self.task_phase = ""
+        self.current_task = None
+        self.output_parser = worker_output.create_parser()
+        self.throughput = throughput.ThroughputEstimator()
+        self.metrics = metrics.WorkerMetrics()
+        self.task_recorder = task_history.TaskRecorder(name)   # Its history is set by the InstanceManager
+
+        # Logging
+        self.log_records = log_buffer.LogBuffer(LOG_BUFFER_CAPACITY)
+        self.log_archive_failed = False
+        self.log_archive = log_archive.LogArchive(log_dir, is_task_start=self._is_task_start_record,
+                                                  on_error=lambda e: self.calls.post(self._on_log_archive_error, e))
+        self._status_written_at = 0.0
+
+        self.watchdog = watchdog.WorkerWatchdog(self)
+
+        # Frontend callbacks
+        self.on_logs = lambda records: None
+        self.on_state_changed = lambda: None
+        self.on_progress_changed = lambda: None
+        self.on_resources_changed = lambda: None
+        self.on_steps_changed = lambda: None
+
+    def start(self):
+        self.log_archive.start()
+        self.watchdog.start()
+
+    def shutdown(self):
+        """ Stops the watchdog and flushes the log archive. Call when the frontend exits. """
+        self.task_recorder.task_ended("manager closed")
+        self.watchdog.shutdown()
+        self.log_archive.close()
+
+    # --- Logging ---
+    def log(self, message, level="INFO"):
+        self.logs([(message, level)])
+
+    def logs(self, entries):
+        """ Records a list of (message, level) entries and hands them to the frontend in one call. """
+        if not entries:
+            return
+        records = self.log_records.extend([(message, level.upper()) for message, level in entries])
+        self.log_archive.append(records)
+        self.on_logs(records)
+
+    def _is_task_start_record(self, record):
+        # Called from the archive writer thread; the parser keeps no state, so sharing it is safe.
+        return record.level == "WORKER" and isinstance(self.output_parser.parse(record.message), worker_output.TaskStarted)
+
+    def _on_log_archive_error(self, error):
+        # Report only the first failure; a full disk would otherwise add a new error on every flush.
+        if not self.log_archive_failed:
+            self.log_archive_failed = True
+            self.log(f"Could not write the log archive in '{self.log_dir}': {error}", level="WARNING")
+
+    # --- Configuration and environment ---
+    def load_config(self):
+        """ (Re-)reads fishtest.cfg if it changed on disk since the last read. """
+        signature = environment.file_signature(self.config_file)
+        if signature is not None and signature == self._config_signature:
+            return
+        self._config_signature = signature
+        self.config.read(self.config_file)
+        if 'login' not in self.config:
+            self.config['login'] = {
+                'username': USERNAME_DEFAULT, 'password': ''
+            }
+        if 'parameters' not in self.config:
+            self.config['parameters'] = {
+                'concurrency': '3'
+            }
+
+    def save_config(self):
+        """ Writes the config to fishtest.cfg. Returns True on success, failures are logged. """
+        try:
+            environment.write_config_atomic(self.config, self.config_file)
+            self._config_signature = None
+            self.environment.invalidate()
+            self.load_config()
+            self.log(f"Settings saved to {CONFIG_FILE_NAME}.", level="SUCCESS")
+            self._handle_github_token()
+            return True
+        except PermissionError:
+            self.log(f"Failed to save settings. Permission denied writing to {self.config_file}.", level="ERROR")
+        except Exception as e:
+            self.log(f"Failed to save settings due to an unexpected IO error: {e}", level="ERROR")
+        return False
+
+    def _handle_github_token(self):
+        token = self.config.get('Fishtest', 'github_token', fallback='').strip()
+        if token:
+            try:
+                # In Windows, the file can be .netrc or _netrc
+                netrc_path = os.path.join(os.path.expanduser("~"), "_netrc")
+                netrc_content = f"machine api.github.com\nlogin {token}\npassword x-oauth-basic\n"
+                with open(netrc_path, "w") as f:
+                    f.write(netrc_content)
+                self.log(f"Created/Updated '{netrc_path}' for GitHub API authentication.")
+            except Exception as e:
+                self.log(f"Failed to create _netrc file: {e}", level="ERROR")
+
+    @property
+    def username(self):
+        return self.config.get('login', 'username', fallback=USERNAME_DEFAULT)
+
+    @property
+    def concurrency(self):
+        return self.config.get('parameters', 'concurrency', fallback='3')
+
+    def has_credentials(self):
+        user = self.username
+        password = self.config.get('login', 'password', fallback='')
+        return bool(user) and user != USERNAME_DEFAULT and bool(password)
+
+    def is_msys2_installed(self):
+        return self.environment.msys2_installed
+
+    def is_worker_installed(self):
+        return self.environment.worker_installed
+
+    # --- Worker Start/Stop Logic ---
+    def is_worker_running(self):
+        return self.worker_process is not None and self.worker_process.poll() is None
+
+    def start_worker(self):
+        self.log("Attempting to start the worker...")
+
+        # Clean up fish.exit before starting the process
+        self._remove_exit_file("The worker may not start correctly: ")
+
+        # Reset progress state
+        self.worker_starting = True
+        self.stop_requested = False
+        self.task_total_games = 0
+        self.task_current_games = 0
+        self.task_start_time = None
+        self.task_wld = None
+        self.task_phase = ""
+        self.current_task = None
+
+        # The worker.py script must run from inside the worker folder
+        launch = self.launcher.worker(self.worker_dir)
+        if self.worker_command:
+            self.log(f"Running '{self.worker_command}' in place of the worker.", level="WARNING")
+            launch = self.launcher.shell(self.worker_command, os.path.abspath(self.worker_dir))
+
+        threading.Thread(target=self._execute_worker_process, args=(launch,), daemon=True).start()
+
+    def _execute_worker_process(self, launch):
+        stats = log_ingest.IngestStats()
+        tuner = sampler = None
+        exit_code = None
+        try:
+            # Start the tree at the chosen priority right away (on Windows children inherit the priority class)
+            self.worker_process = self.launcher.popen(launch, self.cpu_priority)
+            tuner = self._start_process_tuner(self.worker_process.pid)
+            sampler = self._start_resource_sampler(self.worker_process.pid)
+            self.calls.post(self._on_worker_started)
+            # --- Read output in chunks and hand it over in batches for progress info ---
+            reader = log_ingest.OutputReader(self.worker_process.stdout,
+                                             lambda lines: self.calls.post_lines(self._process_worker_lines, lines),
+                                             stats)
+            reader.start()
+            reader.join()
+            self.worker_process.stdout.close()
+            exit_code = self.worker_process.wait()
+            self.calls.post(self.log, f"Worker output: {stats.summary()}")
+        except Exception as e:
+            self.calls.post(self.log, f"Worker failed to start: {e}", "FATAL")
+        finally:
+            for helper in (tuner, sampler):
+                if helper is not None:
+                    helper.stop()
+            self.calls.post(self._on_worker_stopped, exit_code)
+
+    def _start_process_tuner(self, pid):
+        """ Keeps the worker tree, including engines spawned later, on the configured CPUs and priority. """
+        if self.cpu_affinity is None and self.cpu_priority == process_tuning.DEFAULT_PRIORITY:
+            return None
+        description = f"CPUs {process_tuning.format_cpu_list(self.cpu_affinity)}, priority {self.cpu_priority}"
+        if not process_tuning.is_available():
+            self.calls.post(self.log, f"psutil is not installed: cannot apply {description} to the worker processes.", "WARNING")
+            return None
+        tuner = process_tuning.ProcessTreeTuner(
+            pid, self.cpu_affinity, self.cpu_priority,
+            on_error=lambda e: self.calls.post(self.log, f"Could not apply {description} to a worker process: {e}", "WARNING"))
+        tuner.start()
+        self.calls.post(self.log, f"Worker processes are kept on {description}.")
+        return tuner
+
+    def _start_resource_sampler(self, pid):
+        if not process_tuning.is_available():
+            self.calls.post(self.log, "psutil is not installed: the resource monitor is off.", "DEBUG")
+            return None
+        sampler = resource_monitor.ResourceSampler(pid, lambda sample: self.calls.post(self._on_resource_sample, sample),
+                                                   interval=self.resource_interval)
+        sampler.start()
+        return sampler
+
+    def _on_resource_sample(self, sample):
+        if self.worker_process is None:
+            return  # A late sample of a tree that has already been reported as stopped
+        self.resources.append(sample)
+        self.on_resources_changed()
+
+    def _on_worker_started(self):
+        self.worker_starting = False
+        self.resources.clear()
+        self.metrics.worker_started()
+        self.watchdog.worker_started()
+        self.write_status_file()
+        self.on_state_changed()
+
+    def stop_worker_gracefully(self):
+        """ Asks the worker to finish its task and exit. Returns True if the request was made. """
+        self.pending_concurrency = None  # A stop from the user (or the watchdog) wins over a planned restart
+        # Only return if the object is actually None
+        # If the object exists but is 'dead' (Zombie), we continue anyway.
+        if self.worker_process is None:
+            if self.watchdog.cancel_restart():
+                self.on_state_changed()
+                return True
+            self.log("Worker is not running.")
+            return False
+
+        # If poll() returns a value (is not None), the wrapper process is dead.
+        # But since we are inside this function, self.worker_process is NOT None.
+        # This is the "Zombie" state.
+        if self.worker_process.poll() is not None:
+            self.log("Wrapper process is dead. Attempting to stop the worker.", level="WARNING")
+
+        self.log(f"Stopping worker gracefully... (creating {EXIT_FILE_NAME} file)")
+        try:
+            with open(os.path.join(self.worker_dir, EXIT_FILE_NAME), "w") as f: pass
+        except Exception as e:
+            self.log(f"Could not create {EXIT_FILE_NAME} file: {e}. Consider a force stop.", level="ERROR")
+            return False
+        self.stop_requested = True
+        self.write_status_file()
+        self.on_state_changed()
+        return True
+
+    def stop_worker_forcefully(self):
+        # Check object existence only.
+        # This ensures we can clean up even if the wrapper process died silently.
+        if self.worker_process is None:
+            if self.watchdog.cancel_restart():
+                return self.on_state_changed()
+            return self.log("Worker is not running.")
+
+        self.log("Force stopping worker...")
+        self.stop_requested = True
+        self.pending_concurrency = None
+        try:
+            self.launcher.kill_tree(self.worker_process.pid)
+        except Exception as e:
+            # If the process is already dead (Zombie), killing its tree will fail.
+            self.log(f"Killing the worker process tree failed (process might be dead): {e}", level="WARNING")
+            try:
+                self.worker_process.terminate()
+            except Exception as e:
+                # Log this just in case, but usually it means the process is already gone.
+                self.log(f"Internal terminate() failed (ignoring): {e}", level="DEBUG")
+
+        # Clean up the lingering fish.exit file left from the previous *graceful* attempt (if any)
+        self._remove_exit_file()
+
+    def restart_with_concurrency(self, cores):
+        """
+        Lets the worker finish its current task (fish.exit), then writes `cores` as its concurrency to
+        fishtest.cfg and starts it again. Returns True if the switch was scheduled.
+        """
+        if self.worker_process is None or not self.stop_worker_gracefully():
+            return False
+        self.pending_concurrency = cores
+        self.log(f"The worker restarts with {cores} cores when its current task is done.")
+        return True
+
+    def _remove_exit_file(self, failure_hint=""):
+        exit_file_path = os.path.join(self.worker_dir, EXIT_FILE_NAME)
+        if os.path.exists(exit_file_path):
+            try:
+                os.remove(exit_file_path)
+                self.log(f"Cleaned up leftover {EXIT_FILE_NAME} file.")
+            except Exception as e:
+                self.log(f"Could not clean up leftover {EXIT_FILE_NAME} file. {failure_hint}{e}", level="ERROR")
+
+    def _on_worker_stopped(self, exit_code=None):
+        self.log("Worker process has stopped.", level="SUCCESS")
+        self.worker_process = None
+        self.worker_starting = False
+        # fish.exit may also come from another process (`main.py --headless stop`); the worker leaves it behind
+        requested = self.stop_requested or os.path.exists(os.path.join(self.worker_dir, EXIT_FILE_NAME))
+        self.stop_requested = False
+        pending_concurrency, self.pending_concurrency = self.pending_concurrency, None
+        self.throughput.pause()
+        if self.watchdog.recovering:
+            self.task_recorder.task_ended("hang")
+        elif requested:
+            self.task_recorder.task_ended("stopped")
+        else:
+            self.task_recorder.task_ended("worker exited" if exit_code == 0 else f"crashed (exit code {exit_code})")
+        self.watchdog.worker_exited(exit_code, requested)
+        if pending_concurrency is not None:
+            self.config.set('parameters', 'concurrency', str(pending_concurrency))
+            if self.save_config():
+                self.start_worker()
+        self.write_status_file()
+        self.on_state_changed()
+
+    # --- Worker progress tracking ---
+    def _process_worker_lines(self, lines):
+        """Parses a batch of worker lines, logs them in one call and updates the task progress."""
+        self.watchdog.output_seen()
+        events = self.output_parser.parse_lines(lines)
+        # Always log the lines with the WORKER tag, except errors reported by the worker
+        self.logs([(line, "ERROR" if isinstance(event, worker_output.ServerError) else "WORKER")
+                   for line, event in events])
+
+        progress_changed = False
+        for line, event in events:
+            if event is not None and self._process_worker_event(event):
+                progress_changed = True
+        if progress_changed:
+            self.on_progress_changed()
+            if time.monotonic() - self._status_written_at >= STATUS_WRITE_INTERVAL:
+                self.write_status_file()
+
+    def _process_worker_event(self, event):
+        """Applies a parsed worker event to the task state. Returns True if the progress changed."""
+        if isinstance(event, worker_output.GameStarted):
+            self.task_total_games = event.total
+            phase_ended = bool(self.task_phase)
+            self.task_phase = ""
+            self.throughput.resume()
+
+            # Game 1 starts a fresh task, so its progress can be timed from zero.
+            # If we resumed at Game 50, the first progress report only sets the baseline (or ETA would be wrong).
+            if event.number == 1:
+                self.task_current_games = 0
+                self.task_wld = None
+                self.task_start_time = time.time()
+                self.throughput.start_task(event.total)
+                self.throughput.update(0)
+                self.task_recorder.total_games(event.total)
+                return True
+            if self.throughput.task_total != event.total:
+                self.throughput.start_task(event.total)
+            self.task_recorder.total_games(event.total)
+
+            return phase_ended
+
+        if isinstance(event, worker_output.Progress):
+            self.metrics.progress(event)
+            self.task_current_games = event.games
+            if event.wins is not None:
+                self.task_wld = (event.wins, event.losses, event.draws)
+            self.task_recorder.progress(event.games, self.task_wld)
+            self.throughput.update(event.games)
+            if self.task_total_games and event.games >= self.task_total_games:
+                self.throughput.pause()
+            return True
+
+        # Everything below is time spent outside game play
+        if isinstance(event, (worker_output.TaskStarted, worker_output.NetDownload,
+                              worker_output.BuildStep, worker_output.RetryWait)):
+            self.throughput.pause()
+
+        if isinstance(event, worker_output.TaskStarted):
+            self.metrics.task_started()
+            self.task_recorder.task_started(event, self.concurrency)
+            self.current_task = event
+            self.throughput.start_task(0)
+            self.task_total_games = 0
+            self.task_current_games = 0
+            self.task_wld = None
+            self.task_phase = f"Starting task {event.run_id}/{event.task_id}"
+            return True
+
+        if isinstance(event, worker_output.NetDownload):
+            self.task_phase = f"Downloading {event.net}"
+            return True
+
+        if isinstance(event, worker_output.BuildStep):
+            self.task_phase = event.message.rstrip(".")
+            return True
+
+        if isinstance(event, worker_output.RetryWait):
+            self.task_phase = f"Waiting {int(event.seconds)}s before retrying"
+            return True
+
+        return False
+
+    def progress_text(self):
+        """ One-line task progress summary, including rate and ETA. Empty if there is nothing to show. """
+        if not (self.task_total_games > 0 and not self.task_phase):
+            # No game started yet: show what the worker is doing instead (download, build, ...)
+            return self.task_phase
+
+        base_text = f"Task Progress: {self.task_current_games} / {self.task_total_games}"
+        eta_text = ""
+
+        if self.task_wld:
+            base_text += " | W/L/D: {}/{}/{}".format(*self.task_wld)
+
+        rate = self.throughput.current_rate()
+        if rate:
+            base_text += f" | {rate:.1f} games/min"
+            session_rate = self.throughput.session_rate()
+            if session_rate:
+                base_text += f" (session {session_rate:.1f})"
+
+        # Show the ETA with its confidence band if the task is in progress
+        if self.task_current_games < self.task_total_games:
+            eta = self.throughput.eta(self.task_total_games - self.task_current_games)
+            if eta:
+                eta_seconds, eta_low, eta_high = eta
+                eta_text = f" (ETA: {throughput.format_duration(eta_seconds)}"
+                if eta_high - eta_low >= 60:
+                    eta_text += f", {throughput.format_duration(eta_low)}-{throughput.format_duration(eta_high)}"
+                eta_text += ")"
+        else:
+            eta_text = " (Finished)"
+
+        return base_text + eta_text
+
+    def progress_fraction(self):
+        if self.task_total_games > 0 and not self.task_phase:
+            return self.task_current_games / self.task_total_games
+        return 0.0
+
+    # --- Status reporting ---
+    def state(self):
+        if self.worker_process is not None:
+            return "stopping" if self.stop_requested else "running"
+        if self.is_long_operation_running:
+            return "busy"
+        if self.watchdog.restart_pending:
+            return "restarting"
+        if self.watchdog.gave_up:
+            return "failed"
+        return "idle"
+
+    def status(self):
+        """ Snapshot of the supervisor state as plain data, for the status file and other reporters. """
+        return {
+            "instance": self.name,
+            "state": self.state(),
+            "manager_pid": os.getpid(),
+            "worker_pid": self.worker_process.pid if self.worker_process is not None else None,
+            "worker_dir": self.worker_dir,
+            "user": self.username,
+            "concurrency": self.concurrency,
+            "cpu_affinity": process_tuning.format_cpu_list(self.cpu_affinity),
+            "cpu_priority": self.cpu_priority,
+            "operation": self.current_operation if self.is_long_operation_running else "",
+            "task": {
+                "run_id": self.current_task.run_id if self.current_task else None,
+                "task_id": self.current_task.task_id if self.current_task else None,
+                "phase": self.task_phase,
+                "games": self.task_current_games,
+                "total_games": self.task_total_games,
+                "wld": list(self.task_wld) if self.task_wld else None,
+            },
+            "throughput": self.throughput.snapshot(),
+            "watchdog": self.watchdog.snapshot(),
+            "resources": self.resources.snapshot(),
+            "progress": self.progress_text(),
+            "updated_at": time.time(),
+        }
+
+    def write_status_file(self):
+        """
+        Publishes status() next to the worker so `main.py --headless status` can read it from another process,
+        and to the metrics endpoint.
+        """
+        self._status_written_at = time.monotonic()
+        status = self.status()
+        self.metrics.publish(status)
+        if not os.path.isdir(self.worker_dir):
+            return
+        path = os.path.join(self.worker_dir, STATUS_FILE_NAME)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(status, f, indent=1)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass  # Status reporting is best effort and must never disturb the worker
+
+    # --- Commands (install, update, uninstall steps) ---
+    def run_command(self, command, start_message="", end_message="", on_complete=None, on_failed=None):
+        """
+        Runs a command in a background thread, logging its output as CMD lines. `command` is a command line
+        for the system shell or a launcher.Launch (e.g. from self.launcher.bash()).
+        on_complete() runs on the state thread if the command succeeded, on_failed() if it did not.
+        """
+        launch = command if isinstance(command, launcher.Launch) else self.launcher.shell(command)
+        def run():
+            self.calls.post(self._set_operation, True, start_message.replace('---', '').strip())
+            if start_message: self.calls.post(self.log, start_message)
+            stats = log_ingest.IngestStats()
+            rc = None
+            try:
+                process = self.launcher.popen(launch)
+                reader = log_ingest.OutputReader(process.stdout,
+                                                 lambda lines: self.calls.post_lines(self._log_command_lines, lines),
+                                                 stats)
+                reader.start()
+                reader.join()
+                rc = process.wait()
+                self.calls.post(self.log, f"Command output: {stats.summary()}")
+                if end_message: self.calls.post(self.log, end_message)
+                if rc != 0:
+                    self.calls.post(self.log, f"Process finished with non-zero exit code: {rc}", "ERROR")
+            except Exception as e:
+                self.calls.post(self.log, f"executing command: {e}", "FATAL")
+            finally:
+                self.calls.post(self._set_operation, False, "")
+            # Posted after the operation ended, so on_complete may start the next command
+            if rc == 0 and on_complete:
+                self.calls.post(on_complete)
+            elif rc != 0 and on_failed:
+                self.calls.post(on_failed)
+        # Mark the operation as running right away so no second one can be started meanwhile
+        self.is_long_operation_running = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def run_autotune(self, engine=None, use_cache=True, on_complete=None):
+        """
+        Benchmarks concurrency levels with the installed engine in a background thread (see autotune.py).
+        on_complete(result) runs on the state thread with the result dict; it is not called on failure.
+        """
+        import autotune  # Only needed here; keeps hashlib and platform out of the startup path
+        engine = engine or autotune.find_engine(self.worker_dir)
+        if engine is None:
+            self.log(f"No engine found in '{os.path.join(self.worker_dir, 'testing')}'. "
+                     "Let the worker finish one task first, or choose an engine binary.", level="ERROR")
+            return
+        if use_cache:
+            cached = autotune.load_cached(autotune.machine_fingerprint(engine))
+            if cached:
+                created = time.strftime('%Y-%m-%d %H:%M', time.localtime(cached["created_at"]))
+                self.log(f"Using the concurrency benchmark from {created}: recommended concurrency {cached['recommended']}.")
+                if on_complete: on_complete(cached)
+                return
+
+        def run():
+            try:
+                result = autotune.tune(engine, on_progress=lambda message: self.calls.post(self.log, message))
+            except Exception as e:
+                self.calls.post(self.log, f"Concurrency benchmark failed: {e}", "ERROR")
+                result = None
+            self.calls.post(self._set_operation, False, "")
+            if result is not None:
+                self.calls.post(self.log, f"Recommended concurrency: {result['recommended']} "
+                                          f"(highest total nps with per-process nps above "
+                                          f"{result['threshold']:.0%} of a single process).", "SUCCESS")
+                if on_complete: self.calls.post(on_complete, result)
+
+        self.log(f"--- Benchmarking concurrency levels with {os.path.basename(engine)} ---")
+        self._set_operation(True, "Auto-tuning concurrency")
+        threading.Thread(target=run, daemon=True).start()
+
+    def update_worker_files(self, source="", worker_dirs=None, on_complete=None, cache=None, on_failed=None):
+        """
+        Brings the worker files up to date in a background thread, downloading only the files that changed
+        (see worker_update.py). worker_dirs defaults to this worker's folder; passing all instance folders
+        shares the downloads. The Python environment is only rebuilt where a requirements file changed.
+        With an ArtifactCache, files and wheels are taken from and kept in it.
+        on_complete() runs on the state thread once the files and environments are updated, on_failed() if
+        the update stopped early. This supervisor stays busy until then.
+        """
+        import worker_update  # Only needed here; keeps hashlib and urllib out of the startup path
+        worker_dirs = worker_dirs or [self.worker_dir]
+        token = self.config.get('Fishtest', 'github_token', fallback='').strip() or None
+
+        def run():
+            rebuild = None
+            try:
+                upstream = worker_update.source_from_spec(source, token)
+                self.calls.post(self.log, f"Comparing the worker files with {upstream.describe()}")
+                tree = upstream.tree()
+                plans = [worker_update.plan_update(os.path.abspath(worker_dir), tree) for worker_dir in worker_dirs]
+                for plan in plans:
+                    self.calls.post(self.log, f"{plan.worker_dir}: {plan.summary()}")
+                pending = [plan for plan in plans if not plan.up_to_date]
+                blobs = worker_update.download(upstream, pending, on_progress=lambda message: self.calls.post(self.log, message),
+                                               cache=cache)
+                for plan in pending:
+                    worker_update.apply_update(plan, blobs)
+                rebuild = [plan.worker_dir for plan in plans if plan.rebuild_env]
+                self.calls.post(self.log, "Worker files are up to date." if not pending else
+                                f"Updated {sum(len(p.added) + len(p.changed) + len(p.removed) for p in pending)} files "
+                                f"({resource_monitor.format_bytes(sum(len(data) for data in blobs.values()))} of new content).", "SUCCESS")
+            except Exception as e:
+                self.calls.post(self.log, f"Updating the worker files failed: {e}", "ERROR")
+            if rebuild:
+                # Still busy: the rebuild takes the operation over without a gap another start could use
+                self.calls.post(self._rebuild_worker_envs, rebuild, on_complete, cache and cache.wheel_dir, on_failed)
+                return
+            self.calls.post(self._set_operation, False, "")
+            if rebuild is not None and on_complete:
+                self.calls.post(on_complete)
+            elif rebuild is None and on_failed:
+                self.calls.post(on_failed)
+
+        self.log("--- Updating worker files ---")
+        self._set_operation(True, "Updating worker files")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _rebuild_worker_envs(self, worker_dirs, on_complete=None, wheel_dir=None, on_failed=None):
+        """ Recreates the Python environment of each folder in turn, in bash (from MSYS2 on Windows). """
+        import worker_update
+        worker_dir, rest = worker_dirs[0], worker_dirs[1:]
+        env_command = worker_update.rebuild_env_command(worker_dir, wheel_dir and self.launcher.bash_path(wheel_dir))
+        self.run_command(self.launcher.bash(worker_dir, env_command),
+                         start_message=f"--- Rebuilding the Python environment in {worker_dir} ---",
+                         end_message="--- Python environment rebuilt ---",
+                         on_complete=(lambda: self._rebuild_worker_envs(rest, on_complete, wheel_dir, on_failed)) if rest else on_complete,
+                         on_failed=on_failed)
+
+    def delete_worker_folder(self, on_complete=None):
+        """ Removes the worker folder in a background thread, where no elevated shell is needed to do it. """
+        import shutil
+        worker_dir = os.path.abspath(self.worker_dir)
+
+        def run():
+            try:
+                shutil.rmtree(worker_dir)
+                self.calls.post(self.log, "--- Worker folder deleted ---", "SUCCESS")
+                if on_complete: self.calls.post(on_complete)
+            except FileNotFoundError:
+                self.calls.post(self.log, "Worker directory not found.", "WARNING")
+            except Exception as e:
+                self.calls.post(self.log, f"Could not delete '{worker_dir}': {e}", "ERROR")
+            self.calls.post(self._set_operation, False, "")
+
+        self.log("--- Deleting worker folder ---")
+        self._set_operation(True, "Deleting worker folder")
+        threading.Thread(target=run, daemon=True).start()
+
+    def run_pipeline(self, pipeline, description, on_complete=None):
+        """
+        Runs an installer.InstallPipeline in a background thread. Step output is logged as CMD lines
+        prefixed with the step; install_steps follows the steps for the frontend (on_steps_changed).
+        on_complete() runs on the state thread if every step completed.
+        """
+        pipeline.on_changed = lambda snapshots, changed: self.calls.post(self._on_pipeline_changed, snapshots, changed)
+        pipeline.on_output = lambda step, lines: self.calls.post_lines(self._log_command_lines,
+                                                                      [f"[{step.name}] {line}" for line in lines])
+
+        def run():
+            started = time.monotonic()
+            success = False
+            try:
+                success = pipeline.run()
+            except Exception as e:
+                self.calls.post(self.log, f"{description} failed: {e}", "FATAL")
+            minutes, seconds = divmod(int(time.monotonic() - started), 60)
+            if success:
+                self.calls.post(self.log, f"--- {description} finished in {minutes}m {seconds:02d}s ---", "SUCCESS")
+            else:
+                self.calls.post(self.log, f"{description} did not finish. Run it again to continue at the failed step.", "ERROR")
+            self.calls.post(self._set_operation, False, "")
+            if success and on_complete:
+                self.calls.post(on_complete)
+
+        self.log(f"--- {description} ---")
+        self.install_steps = []
+        self._install_step_states = {}
+        self._set_operation(True, description)
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_pipeline_changed(self, snapshots, changed):
+        self.install_steps = snapshots
+        # Snapshots are taken on the step threads, so a status may show up before its own change arrives
+        if self._install_step_states.get(changed["name"]) != changed["status"]:
+            self._install_step_states[changed["name"]] = changed["status"]
+            elapsed = f" in {changed['elapsed']:.1f} s" if changed["elapsed"] is not None else ""
+            if changed["status"] == "running" and changed["attempts"] > 1:
+                self.log(f"Step '{changed['title']}': attempt {changed['attempts']}")
+            elif changed["status"] == "done":
+                self.log(f"Step '{changed['title']}' done{elapsed}.", "SUCCESS")
+            elif changed["status"] == "skipped":
+                self.log(f"Step '{changed['title']}' was completed by an earlier run, skipping it.")
+            elif changed["status"] == "failed":
+                self.log(f"Step '{changed['title']}' failed after {changed['attempts']} attempt(s){elapsed}: {changed['error']}", "ERROR")
+            elif changed["status"] == "blocked":
+                self.log(f"Step '{changed['title']}' was not run because a step it needs failed.", "WARNING")
+        self.on_steps_changed()
+
+    def _set_operation(self, running, description):
+        self.is_long_operation_running = running
+        if not running:
+            # Install, update and uninstall steps change the files the environment state caches
+            self.environment.invalidate()
+            self._config_signature = None
+        self.current_operation = description
+        self.on_state_changed()
+
+    def _log_command_lines(self, lines):
+        self.logs([(line, "CMD") for line in lines])
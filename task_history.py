@@ -0,0 +1,266 @@
+"""
+History of the tasks every worker instance played, kept in a local SQLite database (task_history.sqlite3).
+
+One row per task: start and end time, games, W/L/D, games per minute, concurrency and why it ended.
+A task that is still running has no end time yet and is updated as it progresses. The state thread only
+queues rows; a writer thread merges the updates of the same task and writes them in one transaction every
+few seconds, so the disk never slows down the window.
+
+The GUI shows it in its Task History window, `main.py --headless history` in the terminal.
+"""
+import contextlib
+import os
+import queue
+import threading
+import time
+
+from common import TASK_HISTORY_FILE
+
+# --- Constants ---
+FLUSH_INTERVAL_SECONDS = 3.0     # Longest time a queued row waits before it is written
+SCHEMA_VERSION = 1
+COLUMNS = ("uid", "instance", "run_id", "task_id", "url", "started_at", "ended_at", "updated_at", "games",
+           "total_games", "wins", "losses", "draws", "games_per_min", "concurrency", "exit_reason")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    uid TEXT PRIMARY KEY,
+    instance TEXT NOT NULL,
+    run_id TEXT,
+    task_id INTEGER,
+    url TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    updated_at REAL NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    total_games INTEGER,
+    wins INTEGER,
+    losses INTEGER,
+    draws INTEGER,
+    games_per_min REAL,
+    concurrency INTEGER,
+    exit_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_started_at ON tasks (started_at);
+CREATE INDEX IF NOT EXISTS tasks_instance_started_at ON tasks (instance, started_at);
+CREATE INDEX IF NOT EXISTS tasks_ended_at ON tasks (ended_at);
+"""
+
+
+def connect(path, read_only=False):
+    """ Opens the database, creating it and its schema unless `read_only`, which never writes to the disk. """
+    import sqlite3  # Imported on first use, by the writer thread, so it does not slow down the start
+    if read_only:
+        import pathlib
+        connection = sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro", timeout=10, uri=True)
+        connection.row_factory = sqlite3.Row
+        return connection
+    connection = sqlite3.connect(path, timeout=10)
+    connection.row_factory = sqlite3.Row
+    # WAL lets the history view read while the writer thread (or another manager) writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.commit()
+    return connection
+
+
+class TaskHistory:
+    """ The task database: rows are queued from any thread and written in batches by a writer thread. """
+
+    def __init__(self, path=TASK_HISTORY_FILE, on_error=None):
+        self.path = path
+        self.on_error = on_error
+        self._queue = queue.SimpleQueue()
+        self._closed = threading.Event()
+        self._thread = None
+
+    # --- Producer side (any thread) ---
+    def start(self, instances=()):
+        """ Starts the writer; tasks of these instances left open by a manager that did not exit cleanly are closed first. """
+        self._thread = threading.Thread(target=self._run, args=(list(instances),), daemon=True)
+        self._thread.start()
+
+    def record(self, row):
+        """ Queues the current state of a task (a dict with the COLUMNS). Never blocks on disk I/O. """
+        if not self._closed.is_set():
+            self._queue.put(dict(row))
+
+    def close(self, timeout=2.0):
+        """ Writes everything queued, waiting at most `timeout` seconds. """
+        self._closed.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # --- Writer thread ---
+    def _run(self, instances):
+        import sqlite3
+        try:
+            connection = connect(self.path)
+            if instances:
+                with connection:
+                    connection.execute(
+                        f"UPDATE tasks SET ended_at = updated_at, exit_reason = 'interrupted' "
+                        f"WHERE ended_at IS NULL AND instance IN ({','.join('?' * len(instances))})", instances)
+        except sqlite3.Error as e:
+            self._closed.set()  # Nothing can be written; stop queueing
+            self._report_error(e)
+            return
+        pending = {}   # uid -> latest row; a task updated many times before a flush is written once
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = ()
+            if row:
+                pending[row["uid"]] = row
+                if deadline is None:
+                    deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            if row is None or (pending and time.monotonic() >= deadline):
+                self._write(connection, pending)
+                pending = {}
+                deadline = None
+            if row is None:
+                connection.close()
+                return
+
+    def _write(self, connection, pending):
+        import sqlite3
+        if not pending:
+            return
+        try:
+            with connection:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO tasks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [tuple(row.get(column) for column in COLUMNS) for row in pending.values()])
+        except sqlite3.Error as e:
+            self._report_error(e)
+
+    def _report_error(self, error):
+        if self.on_error is not None:
+            self.on_error(error)
+
+    # --- Queries (any thread, each with its own connection) ---
+    def totals(self, since=None, instances=None):
+        """
+        Tasks, games, W/L/D and play time of the tasks started since `since` (all if None), of the given
+        instance names (all if None).
+        """
+        where, args = self._filter(since, instances)
+        with contextlib.closing(connect(self.path, read_only=True)) as connection:
+            row = connection.execute(
+                f"SELECT COUNT(*) AS tasks, COALESCE(SUM(games), 0) AS games, COALESCE(SUM(wins), 0) AS wins, "
+                f"COALESCE(SUM(losses), 0) AS losses, COALESCE(SUM(draws), 0) AS draws, "
+                f"COALESCE(SUM(COALESCE(ended_at, updated_at) - started_at), 0) AS seconds FROM tasks{where}", args).fetchone()
+        return dict(row)
+
+    def recent(self, limit=100, since=None, instances=None):
+        """ The latest tasks of the given instance names (all if None), newest first, as dicts. """
+        where, args = self._filter(since, instances)
+        with contextlib.closing(connect(self.path, read_only=True)) as connection:
+            rows = connection.execute(f"SELECT * FROM tasks{where} ORDER BY started_at DESC LIMIT ?",
+                                      args + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def _filter(self, since, instances):
+        clauses, args = [], []
+        if since is not None:
+            clauses.append("started_at >= ?")
+            args.append(since)
+        if instances is not None:
+            instances = list(instances)
+            clauses.append(f"instance IN ({','.join('?' * len(instances))})")
+            args.extend(instances)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+class TaskRecorder:
+    """
+    Follows the task of one worker instance and hands its row to the history on every change.
+    Driven by the supervisor on its state thread; does nothing while `history` is None.
+    """
+
+    def __init__(self, instance, history=None):
+        self.instance = instance
+        self.history = history
+        self.row = None
+
+    def task_started(self, event, concurrency):
+        self.task_ended("finished")  # The worker only fetches a new task once the previous one is done
+        now = time.time()
+        try:
+            concurrency = int(concurrency)
+        except (TypeError, ValueError):
+            concurrency = None
+        self.row = {"uid": os.urandom(16).hex(), "instance": self.instance, "run_id": event.run_id,
+                    "task_id": int(event.task_id), "url": event.url, "started_at": now, "updated_at": now,
+                    "games": 0, "concurrency": concurrency}
+        self._record()
+
+    def total_games(self, total):
+        if self.row is not None and self.row.get("total_games") != total:
+            self.row["total_games"] = total
+            self._record()
+
+    def progress(self, games, wld):
+        if self.row is None:
+            return
+        self.row["games"] = games
+        if wld is not None:
+            self.row["wins"], self.row["losses"], self.row["draws"] = wld
+        self._record()
+
+    def task_ended(self, reason):
+        if self.row is None:
+            return
+        self.row["ended_at"] = time.time()
+        self.row["exit_reason"] = reason
+        self._record()
+        self.row = None
+
+    def _record(self):
+        row = self.row
+        row["updated_at"] = row.get("ended_at") or time.time()
+        minutes = (row["updated_at"] - row["started_at"]) / 60
+        row["games_per_min"] = round(row["games"] / minutes, 2) if minutes > 0 else None
+        if self.history is not None:
+            self.history.record(row)
+
+
+# --- Formatting ---
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m" if seconds >= 3600 else f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def format_rows(rows):
+    """ The rows as a text table, newest first, for the GUI and the command line. """
+    lines = [f"{'Started':<16} {'Instance':<10} {'Task':<30} {'Games':>11} {'W/L/D':>14} {'g/min':>6} "
+             f"{'Time':>8} {'Cores':>5}  Ended"]
+    for row in rows:
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["started_at"]))
+        task = f"{(row['run_id'] or '')[:24]}/{row['task_id']}"
+        games = f"{row['games']}/{row['total_games']}" if row["total_games"] else str(row["games"])
+        wld = f"{row['wins']}/{row['losses']}/{row['draws']}" if row["wins"] is not None else "-"
+        rate = f"{row['games_per_min']:.1f}" if row["games_per_min"] is not None else "-"
+        duration = format_duration((row["ended_at"] or row["updated_at"]) - row["started_at"])
+        reason = row["exit_reason"] or "running"
+        lines.append(f"{started:<16} {row['instance'][:10]:<10} {task:<30} {games:>11} {wld:>14} {rate:>6} "
+                     f"{duration:>8} {row['concurrency'] or '-':>5}  {reason}")
+    return "\n".join(lines)
+
+
+def format_totals(label, totals):
+    hours = totals["seconds"] / 3600
+    return (f"{label:<10} {totals['tasks']:>6} tasks {totals['games']:>9,} games  W/L/D "
+            f"{totals['wins']:,}/{totals['losses']:,}/{totals['draws']:,}  {hours:,.1f} h")
+
+
+def period_starts():
+    """ (label, start time) of the summary periods: today, the last 7 and 30 days, and all time. """
+    now = time.time()
+    midnight = time.mktime(time.localtime(now)[:3] + (0, 0, 0, 0, 0, -1))
+    return [("Today", midnight), ("7 days", now - 7 * 86400), ("30 days", now - 30 * 86400), ("All", None)]
@@ -0,0 +1,158 @@
+import collections
+import math
+import time
+
+# --- Constants ---
+EWMA_TIME_CONSTANT = 120.0   # Seconds of game play after which an old rate has decayed to 1/e of its weight
+WINDOW_SECONDS = 600.0       # Game-play time covered by the sliding window
+MIN_SAMPLES_FOR_BAND = 3     # Interval rates needed before a confidence band is reported
+
+
+class ThroughputEstimator:
+    """
+    Estimates games/min and ETA from the cumulative game counts the worker reports.
+
+    Only time spent playing games counts: pause() stops the clock during builds, net downloads and
+    retry waits, resume() restarts it. The rate is tracked two ways, an exponentially weighted rate that
+    reacts quickly to speed changes and a sliding window over the last WINDOW_SECONDS of play. Session
+    totals survive across tasks, so the session rate is unaffected by resumes or restarts of a task.
+    """
+
+    def __init__(self, clock=time.monotonic, time_constant=EWMA_TIME_CONSTANT, window_seconds=WINDOW_SECONDS):
+        self.clock = clock
+        self.time_constant = time_constant
+        self.window_seconds = window_seconds
+
+        # Session-wide totals
+        self.session_games = 0
+        self.session_play_time = 0.0
+
+        # Game-play clock
+        self.paused = True
+        self._play_time = 0.0        # Accumulated game-play seconds
+        self._resumed_at = None      # Clock value when the game-play clock last resumed
+
+        # Per-task state
+        self.task_total = 0
+        self._last_games = None
+        self._last_play_time = 0.0
+        self._ewma_rate = None       # Games per second
+        self._window = collections.deque()   # (play_time, games, interval rate) samples
+
+    # --- Game-play clock ---
+    def play_time(self):
+        if self.paused:
+            return self._play_time
+        return self._play_time + (self.clock() - self._resumed_at)
+
+    def pause(self):
+        if not self.paused:
+            elapsed = self.clock() - self._resumed_at
+            self._play_time += elapsed
+            self.session_play_time += elapsed
+            self.paused = True
+
+    def resume(self):
+        if self.paused:
+            self._resumed_at = self.clock()
+            self.paused = False
+
+    # --- Input ---
+    def start_task(self, total):
+        """ Starts tracking a new task (or a resumed one). The first update() afterwards is only a baseline. """
+        self.task_total = total
+        self._last_games = None
+        self._ewma_rate = None
+        self._window.clear()
+
+    def update(self, games):
+        """ Records the cumulative number of games the worker reports for the current task. """
+        now = self.play_time()
+        if self._last_games is None or games < self._last_games:
+            # First report after a (re)start: games played before it are not ours to time
+            self._last_games = games
+            self._last_play_time = now
+            return
+
+        delta_games = games - self._last_games
+        delta_time = now - self._last_play_time
+        if delta_games <= 0 or delta_time <= 0:
+            return
+
+        rate = delta_games / delta_time
+        if self._ewma_rate is None:
+            self._ewma_rate = rate
+        else:
+            alpha = 1.0 - math.exp(-delta_time / self.time_constant)
+            self._ewma_rate += alpha * (rate - self._ewma_rate)
+
+        self._window.append((now, games, rate))
+        while self._window and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+
+        self.session_games += delta_games
+        self._last_games = games
+        self._last_play_time = now
+
+    # --- Output (games per minute, seconds for ETAs) ---
+    def current_rate(self):
+        """ Exponentially weighted games/min, or None before two reports were seen. """
+        return None if self._ewma_rate is None else self._ewma_rate * 60.0
+
+    def window_rate(self):
+        """ Games/min over the sliding window; falls back to the weighted rate with fewer than two samples. """
+        if len(self._window) < 2:
+            return self.current_rate()
+        (t0, g0, _), (t1, g1, _) = self._window[0], self._window[-1]
+        return (g1 - g0) / (t1 - t0) * 60.0 if t1 > t0 else None
+
+    def session_rate(self):
+        """ Games/min over all game-play time of this session. """
+        play_time = self.session_play_time + (0.0 if self.paused else self.clock() - self._resumed_at)
+        return self.session_games / play_time * 60.0 if play_time > 0 and self.session_games else None
+
+    def eta(self, remaining_games):
+        """
+        Returns (eta, low, high) in seconds for the remaining games, or None without a rate yet.
+
+        The band spreads the current rate by one standard deviation of the interval rates in the window.
+        """
+        rate = self.current_rate()
+        if not rate or remaining_games <= 0:
+            return None
+        eta = remaining_games / rate * 60.0
+
+        rates = [sample[2] * 60.0 for sample in self._window]
+        if len(rates) < MIN_SAMPLES_FOR_BAND:
+            return eta, eta, eta
+        mean = sum(rates) / len(rates)
+        spread = math.sqrt(sum((r - mean) ** 2 for r in rates) / (len(rates) - 1))
+        fast = rate + spread
+        slow = max(rate - spread, rate * 0.25)
+        return eta, remaining_games / fast * 60.0, remaining_games / slow * 60.0
+
+    def snapshot(self):
+        """ All figures as a dict, for display and export. """
+        remaining = self.task_total - (self._last_games or 0)
+        eta = self.eta(remaining) if self.task_total else None
+        return {
+            "games_per_min": self.current_rate(),
+            "window_games_per_min": self.window_rate(),
+            "session_games_per_min": self.session_rate(),
+            "session_games": self.session_games,
+            "play_time": self.play_time(),
+            "paused": self.paused,
+            "eta": eta[0] if eta else None,
+            "eta_low": eta[1] if eta else None,
+            "eta_high": eta[2] if eta else None,
+        }
+
+
+def format_duration(seconds):
+    """ Short human readable duration: 45s, 12m, 3h05m. """
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
@@ -0,0 +1,165 @@
+"""
+Event-loop diagnostics of the GUI, enabled with --diagnostics (or Ctrl+Shift+D while the window runs).
+
+Shows where the time of the Tk thread goes, to tell whether a freeze comes from log volume or from
+something else:
+
+    lag        How late a heartbeat timer fires; anything that keeps Tk busy delays it
+    queue      Calls posted by background threads and still waiting, seen at each drain
+    callbacks  Time per queued handler and per frontend callback, as histograms
+
+The GUI logs a summary of each interval and shows the live figures in an overlay toggled with
+Ctrl+Shift+D. While diagnostics are off nothing is measured: the call queue only checks one attribute.
+"""
+import bisect
+import os
+import time
+
+# --- Constants ---
+HEARTBEAT_MS = 50              # Interval of the lag heartbeat
+SUMMARY_SECONDS = 60           # Interval of the log summary
+STALL_SECONDS = 0.1            # Lag or callback time that the user notices
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TOP_CALLBACKS = 5              # Callbacks listed in summaries, by total time
+
+_active = None   # The LoopDiagnostics while diagnostics are on
+
+
+class Histogram:
+    """ Durations in fixed millisecond buckets, with count, total and maximum. """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def over(self, seconds):
+        """ Number of durations above a bucket bound (exact for the bounds in BUCKET_BOUNDS_MS). """
+        first = bisect.bisect_left(BUCKET_BOUNDS_MS, seconds * 1000) + 1
+        return sum(self.buckets[first:])
+
+    def percentile(self, fraction):
+        """ Upper bound of the bucket holding the given fraction of durations, in seconds. """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound / 1000, self.max)
+        return self.max
+
+
+def callback_name(handler):
+    """ Readable name of a queued handler; lambdas are told apart by where they are defined. """
+    name = getattr(handler, "__qualname__", None) or repr(handler)
+    code = getattr(handler, "__code__", None)
+    if name.endswith("<lambda>") and code is not None:
+        name = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+class LoopDiagnostics:
+    """ Lag, queue depth and callback costs of one interval; the maxima also over the whole run. """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.max_lag = 0.0
+        self.max_pending = 0
+        self.reset()
+
+    def reset(self):
+        self.interval_started_at = time.monotonic()
+        self.lag = Histogram()
+        self.drains = Histogram()
+        self.callbacks = {}
+        self.items = 0
+        self.interval_max_pending = 0
+        self.pending = 0
+
+    # --- Measurements ---
+    def heartbeat(self, lag):
+        self.lag.add(max(lag, 0.0))
+        self.max_lag = max(self.max_lag, lag)
+
+    def drain_started(self, pending):
+        self.pending = pending
+        self.interval_max_pending = max(self.interval_max_pending, pending)
+        self.max_pending = max(self.max_pending, pending)
+
+    def drain_finished(self, items, seconds):
+        self.items += items
+        self.drains.add(seconds)
+
+    def handler_finished(self, handler, seconds):
+        self.callback(callback_name(handler), seconds)
+
+    def callback(self, name, seconds):
+        histogram = self.callbacks.get(name)
+        if histogram is None:
+            histogram = self.callbacks[name] = Histogram()
+        histogram.add(seconds)
+
+    def timed(self, name, func):
+        """ Wraps a frontend callback so its time is recorded under `name`. """
+        def call(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.callback(name, time.perf_counter() - t0)
+        return call
+
+    # --- Reports ---
+    def _busiest(self):
+        return sorted(self.callbacks.items(), key=lambda item: item[1].total, reverse=True)[:TOP_CALLBACKS]
+
+    def summary(self):
+        """ One line about the current interval, for the log. """
+        seconds = max(time.monotonic() - self.interval_started_at, 1e-9)
+        lag = self.lag
+        parts = [
+            f"UI loop over {seconds:.0f}s: lag p50 {lag.percentile(0.5) * 1000:.0f} ms, "
+            f"p99 {lag.percentile(0.99) * 1000:.0f} ms, max {lag.max * 1000:.0f} ms "
+            f"({lag.over(STALL_SECONDS)} stalls > {STALL_SECONDS * 1000:.0f} ms)",
+            f"queue max {self.interval_max_pending} pending, {self.items} calls in {self.drains.count} drains "
+            f"(busy {self.drains.total / seconds:.0%})",
+        ]
+        busiest = ", ".join(f"{name} {h.count}x {h.total * 1000:.0f} ms (max {h.max * 1000:.0f})"
+                            for name, h in self._busiest())
+        if busiest:
+            parts.append(f"busiest: {busiest}")
+        return "; ".join(parts)
+
+    def overlay_text(self):
+        """ A few lines with the live figures, for the debug overlay. """
+        lag = self.lag
+        lines = [
+            f"lag    max {lag.max * 1000:5.0f} ms  p99 {lag.percentile(0.99) * 1000:4.0f} ms  run max {self.max_lag * 1000:.0f} ms",
+            f"queue  {self.pending:5} pending  max {self.interval_max_pending}  run max {self.max_pending}",
+            f"drain  max {self.drains.max * 1000:5.0f} ms  {self.items} calls",
+        ]
+        for name, h in self._busiest():
+            lines.append(f"{h.total * 1000:6.0f} ms {h.count:5}x max {h.max * 1000:4.0f}  {name}")
+        return "\n".join(lines)
+
+
+def enable():
+    """ Turns diagnostics on (once) and returns them. """
+    global _active
+    if _active is None:
+        _active = LoopDiagnostics()
+    return _active
+
+
+def active():
+    return _active
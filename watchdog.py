@@ -0,0 +1,182 @@
+import json
+import os
+import random
+import threading
+import time
+
+from common import EXIT_FILE_NAME
+
+# --- Constants ---
+TICK_SECONDS = 1.0               # How often the watchdog checks the worker
+HANG_TIMEOUT_SECONDS = 20 * 60   # No output for this long means the worker hangs
+HANG_KILL_GRACE_SECONDS = 120    # Time a hanging worker gets to react to fish.exit before it is killed
+BACKOFF_BASE_SECONDS = 10.0      # First restart delay
+BACKOFF_MAX_SECONDS = 600.0      # Restart delays double up to this limit
+QUICK_FAILURE_SECONDS = 120.0    # A run shorter than this counts towards the crash-loop limit
+CRASH_LOOP_LIMIT = 5             # Consecutive quick failures after which the watchdog gives up
+EVENTS_FILE_NAME = "watchdog.jsonl"
+
+
+def backoff_delay(failures, base=BACKOFF_BASE_SECONDS, maximum=BACKOFF_MAX_SECONDS, rng=random.random):
+    """
+    Delay before restart number `failures` (1-based): doubles each time up to `maximum`, with "equal jitter"
+    (half fixed, half random) so a fleet that lost the server at the same moment does not return in lockstep.
+    """
+    delay = min(maximum, base * 2 ** (failures - 1))
+    return delay / 2 + rng() * delay / 2
+
+
+class WorkerWatchdog:
+    """
+    Restarts a worker that stopped without being asked to and kills one that stopped printing output.
+
+    The supervisor reports starts and exits; everything else happens in check(), which a ticker thread
+    posts to the supervisor's call queue every TICK_SECONDS, so all state stays on the state thread.
+    Restarts back off exponentially; after CRASH_LOOP_LIMIT runs in a row that each ended within
+    QUICK_FAILURE_SECONDS the watchdog gives up. Restarts, hangs and downtime are counted in stats and
+    appended to watchdog.jsonl in the instance's log folder.
+    """
+
+    def __init__(self, core, clock=time.monotonic):
+        self.core = core
+        self.clock = clock
+        self.enabled = True
+        self.hang_timeout = HANG_TIMEOUT_SECONDS
+        self.crash_loop_limit = CRASH_LOOP_LIMIT
+
+        self.restart_at = None          # Clock value of a scheduled restart
+        self.gave_up = False
+        self.failures = 0               # Consecutive quick failures
+        self.started_at = None
+        self.last_output_at = None
+        self.hang_stop_at = None        # Clock value of the graceful stop sent to a hanging worker
+        self.recovering = False         # The watchdog itself stopped the worker, so it must come back
+        self.down_since = None          # Clock value of the unexpected exit being recovered from
+
+        self.stats = {"restarts": 0, "crashes": 0, "hangs": 0, "give_ups": 0, "downtime_seconds": 0.0}
+        self._ticker_stop = threading.Event()
+
+    @property
+    def restart_pending(self):
+        return self.restart_at is not None
+
+    # --- Ticker ---
+    def start(self):
+        def tick():
+            while not self._ticker_stop.wait(TICK_SECONDS):
+                self.core.calls.post(self.check)
+        threading.Thread(target=tick, daemon=True, name="WorkerWatchdog").start()
+
+    def shutdown(self):
+        self._ticker_stop.set()
+
+    # --- Reports from the supervisor ---
+    def worker_started(self):
+        now = self.clock()
+        self.started_at = now
+        self.last_output_at = now
+        self.hang_stop_at = None
+        self.recovering = False
+        self.restart_at = None
+        self.gave_up = False
+        if self.down_since is not None:
+            self.stats["downtime_seconds"] += now - self.down_since
+            self.down_since = None
+
+    def output_seen(self):
+        self.last_output_at = self.clock()
+
+    def worker_exited(self, exit_code, requested):
+        """ Decides whether to restart. `requested` is True when the user asked the worker to stop. """
+        now = self.clock()
+        uptime = now - self.started_at if self.started_at is not None else 0.0
+        self.started_at = None
+        if not self.enabled or (requested and not self.recovering):
+            self.failures = 0
+            return
+
+        if not self.recovering:
+            self.stats["crashes"] += 1
+        self.failures = self.failures + 1 if uptime < QUICK_FAILURE_SECONDS else 1
+        self.down_since = now
+
+        if self.failures >= self.crash_loop_limit:
+            self.gave_up = True
+            self.stats["give_ups"] += 1
+            self._record("gave_up", exit_code=exit_code, failures=self.failures)
+            self.core.log(f"Watchdog: the worker failed {self.failures} times in a row within "
+                          f"{int(QUICK_FAILURE_SECONDS)}s of starting. Not restarting it again; check the log.", level="FATAL")
+            return
+
+        delay = backoff_delay(self.failures)
+        self.restart_at = now + delay
+        reason = "was stopped after hanging" if self.recovering else f"stopped unexpectedly (exit code {exit_code})"
+        self._record("exit", exit_code=exit_code, uptime=round(uptime, 1), recovering=self.recovering, delay=round(delay, 1))
+        self.core.log(f"Watchdog: the worker {reason}. Restarting in {delay:.0f}s (attempt {self.failures}).", level="WARNING")
+
+    def cancel_restart(self):
+        """ Drops a scheduled restart. Returns True if there was one. """
+        if self.restart_at is None:
+            return False
+        self.restart_at = None
+        self.down_since = None
+        self.failures = 0
+        self.core.log("Watchdog: scheduled restart cancelled.")
+        return True
+
+    # --- Periodic check ---
+    def check(self):
+        now = self.clock()
+        if self.restart_at is not None and now >= self.restart_at:
+            if os.path.exists(os.path.join(self.core.worker_dir, EXIT_FILE_NAME)):
+                # Stopped from another process (`main.py --headless stop`) while the restart was pending;
+                # fish.exit is left in place, start_worker() would delete it
+                self._record("restart_cancelled", reason=EXIT_FILE_NAME)
+                self.cancel_restart()
+                self.core.write_status_file()
+                self.core.on_state_changed()
+                return
+            self.restart_at = None
+            self.stats["restarts"] += 1
+            self._record("restart", attempt=self.failures)
+            self.core.log(f"Watchdog: restarting the worker (attempt {self.failures}).", level="WARNING")
+            self.core.start_worker()
+            self.core.on_state_changed()
+            return
+
+        if not self.enabled or self.core.worker_process is None or self.last_output_at is None:
+            return
+        if self.hang_stop_at is not None:
+            # The graceful stop had its chance; a worker stuck in a game never reads fish.exit
+            if now - self.hang_stop_at >= HANG_KILL_GRACE_SECONDS:
+                self.hang_stop_at = now  # Do not repeat the kill every tick
+                self.core.log("Watchdog: the hanging worker did not stop. Killing it.", level="ERROR")
+                self.core.stop_worker_forcefully()
+            return
+        silent = now - self.last_output_at
+        if silent >= self.hang_timeout and not self.core.stop_requested:
+            self.stats["hangs"] += 1
+            self.recovering = True
+            self.hang_stop_at = now
+            self._record("hang", silent_seconds=round(silent))
+            self.core.log(f"Watchdog: no worker output for {silent / 60:.0f} minutes. Asking it to stop "
+                          f"(killing it in {HANG_KILL_GRACE_SECONDS}s if it does not).", level="ERROR")
+            self.core.stop_worker_gracefully()
+
+    # --- Reporting ---
+    def snapshot(self):
+        downtime = self.stats["downtime_seconds"]
+        if self.down_since is not None:
+            downtime += self.clock() - self.down_since
+        return dict(self.stats, downtime_seconds=round(downtime, 1), restart_pending=self.restart_pending,
+                    restart_in=round(max(0.0, self.restart_at - self.clock()), 1) if self.restart_pending else None,
+                    gave_up=self.gave_up, consecutive_failures=self.failures, enabled=self.enabled)
+
+    def _record(self, event, **fields):
+        """ Appends an event to watchdog.jsonl. Best effort, like the status file. """
+        try:
+            os.makedirs(self.core.log_dir, exist_ok=True)
+            with open(os.path.join(self.core.log_dir, EVENTS_FILE_NAME), "a", encoding="utf-8") as f:
+                f.write(json.dumps(dict(time=time.time(), instance=self.core.name, event=event, **fields)) + "\n")
+        except OSError:
+            pass
@@ -0,0 +1,90 @@
+import collections
+import re
+
+# --- Event types ---
+# One namedtuple per kind of line the fishtest worker prints. Lines that match nothing parse to None.
+WorkerStarted = collections.namedtuple("WorkerStarted", ["version", "remote"])
+TaskStarted = collections.namedtuple("TaskStarted", ["run_id", "task_id", "url"])
+Matchup = collections.namedtuple("Matchup", ["new_tag", "base_tag"])
+NetDownload = collections.namedtuple("NetDownload", ["net"])
+BuildStep = collections.namedtuple("BuildStep", ["message"])
+GameStarted = collections.namedtuple("GameStarted", ["number", "total", "white", "black"])
+GameFinished = collections.namedtuple("GameFinished", ["number", "white", "black", "result", "reason"])
+Score = collections.namedtuple("Score", ["wins", "losses", "draws", "points", "games"])
+Progress = collections.namedtuple("Progress", ["games", "wins", "losses", "draws", "pentanomial"])
+RetryWait = collections.namedtuple("RetryWait", ["seconds"])
+ServerError = collections.namedtuple("ServerError", ["message"])
+
+
+def _ints(text):
+    return [int(value) for value in text.replace(" ", "").split(",") if value]
+
+
+class WorkerOutputParser:
+    """
+    Turns worker output lines into typed events.
+
+    Lines are dispatched on their first word through a dict, so each line is only tried against the few
+    precompiled patterns registered for that word. Adding a new event type costs nothing for lines with
+    other prefixes. Patterns on the hot path (game and score lines) avoid lazy quantifiers, which
+    backtrack, since engine names never contain spaces.
+    """
+
+    def __init__(self):
+        self._rules = {}
+
+    def register(self, prefix, pattern, factory):
+        """
+        Adds a rule: lines whose first word is `prefix` and that match `pattern` (anchored at the start)
+        become factory(match). Rules for the same prefix are tried in registration order.
+        """
+        self._rules.setdefault(prefix, []).append((re.compile(pattern), factory))
+
+    def parse(self, line):
+        rules = self._rules.get(line.partition(" ")[0])
+        if rules is None:
+            return None
+        for pattern, factory in rules:
+            match = pattern.match(line)
+            if match:
+                return factory(match)
+        return None
+
+    def parse_lines(self, lines):
+        """ Returns (line, event) pairs for a batch of lines; event is None for unrecognized lines. """
+        parse = self.parse
+        return [(line, parse(line)) for line in lines]
+
+
+def create_parser():
+    """ Builds a parser with the rules for everything the fishtest worker prints that the manager uses. """
+    parser = WorkerOutputParser()
+    parser.register("Worker", r"Worker version (\S+) connecting to (\S+)",
+                    lambda m: WorkerStarted(m.group(1), m.group(2)))
+    parser.register("Working", r"Working on task (\w+)/(\d+) from (\S+)",
+                    lambda m: TaskStarted(m.group(1), int(m.group(2)), m.group(3)))
+    parser.register("Running", r"Running (.+?) vs (.+)$",
+                    lambda m: Matchup(m.group(1), m.group(2)))
+    parser.register("Downloading", r"Downloading (\S+\.nnue)",
+                    lambda m: NetDownload(m.group(1)))
+    for prefix in ("Building", "Verifying"):
+        parser.register(prefix, r".+", lambda m: BuildStep(m.group(0)))
+    parser.register("Started", r"Started game (\d+) of (\d+)(?: \((\S+) vs (\S+)\))?",
+                    lambda m: GameStarted(int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)))
+    parser.register("Finished", r"Finished game (\d+) \((\S+) vs (\S+)\): (\S+)(?: \{(.*)\})?",
+                    lambda m: GameFinished(int(m.group(1)), m.group(2), m.group(3), m.group(4), m.group(5)))
+    parser.register("Score", r"Score of \S+ vs \S+: (\d+) - (\d+) - (\d+)\s+\[([\d.]+)\] (\d+)",
+                    lambda m: Score(int(m.group(1)), int(m.group(2)), int(m.group(3)), float(m.group(4)),
+                                    int(m.group(5))))
+    parser.register("Games:", r"Games: (\d+), Wins: (\d+), Losses: (\d+), Draws: (\d+)"
+                              r"(?:, Pentanomial: \[([\d, ]+)\])?",
+                    lambda m: Progress(int(m.group(1)), int(m.group(2)), int(m.group(3)), int(m.group(4)),
+                                       _ints(m.group(5)) if m.group(5) else None))
+    # Fallback for progress lines in another layout: keep at least the game count
+    parser.register("Games:", r"Games: (\d+), Wins:",
+                    lambda m: Progress(int(m.group(1)), None, None, None, None))
+    parser.register("Waiting", r"Waiting (\d+(?:\.\d+)?) seconds before retrying",
+                    lambda m: RetryWait(float(m.group(1))))
+    for prefix in ("Exception", "Error", "Error:", "Traceback", "ConnectionError:", "HTTPError:"):
+        parser.register(prefix, r".+", lambda m: ServerError(m.group(0)))
+    return parser
@@ -0,0 +1,283 @@
+"""
+Incremental update of an installed worker from the upstream fishtest repository.
+
+Instead of deleting the worker folder and reinstalling everything, the git blob hash of every upstream
+worker file is compared with the local copy and only files that differ are downloaded. Downloads are
+staged and verified before any file is replaced, so a broken connection leaves the worker untouched.
+The Python environment, fishtest.cfg, nets and engine builds are never touched; the environment is
+only rebuilt when a requirements file changed.
+
+Upstream can be GitHub (default), a local folder holding a worker tree, or any HTTP server that serves
+a GitHub-style tree.json next to the files, which makes a local stand-in easy:
+
+    python worker_update.py manifest path/to/fishtest > path/to/fishtest/tree.json
+    python -m http.server -d path/to/fishtest 8000
+    python worker_update.py plan worker --source http://localhost:8000
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+
+from common import CONFIG_FILE_NAME, EXIT_FILE_NAME, STATUS_FILE_NAME
+
+# --- Constants ---
+GITHUB_TREE_URL = "https://api.github.com/repos/official-stockfish/fishtest/git/trees/master?recursive=1"
+GITHUB_RAW_URL = "https://raw.githubusercontent.com/official-stockfish/fishtest/master/"
+UPSTREAM_PREFIX = "worker/"               # Folder of the worker inside the upstream repository
+MANIFEST_FILE_NAME = ".update_manifest.json"
+STAGING_DIR_NAME = ".update_staging"
+HTTP_TIMEOUT_SECONDS = 30
+# Local state an update must never overwrite or delete, even if upstream had a file of that name
+PRESERVED_PATTERNS = ("env/*", "testing/*", "__pycache__/*", "*/__pycache__/*", "*.nnue", CONFIG_FILE_NAME,
+                      EXIT_FILE_NAME, STATUS_FILE_NAME, "fishtest.cmd", MANIFEST_FILE_NAME, STAGING_DIR_NAME + "/*")
+# A change to any of these means the Python environment has to be rebuilt
+REQUIREMENTS_FILES = ("requirements.txt", "pyproject.toml", "setup.py", "setup.cfg")
+
+
+def git_blob_sha(data):
+    """ The SHA-1 git gives a file's content, as listed in GitHub trees. """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def file_blob_sha(path):
+    with open(path, "rb") as f:
+        return git_blob_sha(f.read())
+
+
+def is_preserved(relpath):
+    return any(fnmatch.fnmatch(relpath, pattern) for pattern in PRESERVED_PATTERNS)
+
+
+def directory_tree(directory, prefix=""):
+    """ {relative path: blob sha} of the files in a folder, without preserved local state. """
+    tree = {}
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not is_preserved(os.path.relpath(os.path.join(root, d), directory).replace(os.sep, "/") + "/")]
+        for name in files:
+            relpath = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+            if not is_preserved(relpath):
+                tree[prefix + relpath] = file_blob_sha(os.path.join(root, name))
+    return tree
+
+
+# --- Upstream sources ---
+class DirectorySource:
+    """ A local folder holding a worker tree (e.g. an extracted fishtest checkout's 'worker' folder). """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def describe(self):
+        return self.directory
+
+    def tree(self):
+        return directory_tree(self.directory)
+
+    def fetch(self, relpath):
+        with open(os.path.join(self.directory, relpath), "rb") as f:
+            return f.read()
+
+
+class HttpSource:
+    """ A GitHub-style tree listing plus raw file downloads: GitHub itself, or a local stand-in. """
+
+    def __init__(self, tree_url=GITHUB_TREE_URL, raw_url=GITHUB_RAW_URL, prefix=UPSTREAM_PREFIX, token=None):
+        self.tree_url = tree_url
+        self.raw_url = raw_url if raw_url.endswith("/") else raw_url + "/"
+        self.prefix = prefix
+        self.token = token
+
+    def describe(self):
+        return self.raw_url
+
+    def _get(self, url):
+        import urllib.request
+        headers = {"User-Agent": "fishtest-worker-gui"}
+        if self.token and url.startswith("https://api.github.com/"):
+            headers["Authorization"] = f"token {self.token}"
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=HTTP_TIMEOUT_SECONDS) as response:
+            return response.read()
+
+    def tree(self):
+        listing = json.loads(self._get(self.tree_url))
+        if listing.get("truncated"):
+            raise RuntimeError("The upstream tree listing is truncated")
+        return {entry["path"][len(self.prefix):]: entry["sha"] for entry in listing["tree"]
+                if entry["type"] == "blob" and entry["path"].startswith(self.prefix)}
+
+    def fetch(self, relpath):
+        import urllib.parse
+        return self._get(self.raw_url + urllib.parse.quote(self.prefix + relpath))
+
+
+def source_from_spec(spec, token=None):
+    """ '' for GitHub, an http(s) URL of a stand-in serving tree.json, or a local worker folder. """
+    if not spec:
+        return HttpSource(token=token)
+    if spec.startswith(("http://", "https://")):
+        base = spec.rstrip("/") + "/"
+        return HttpSource(base + "tree.json", base)
+    return DirectorySource(os.path.abspath(spec))
+
+
+# --- Planning and applying ---
+class UpdatePlan:
+    """ What an update of one worker folder would change. """
+
+    def __init__(self, worker_dir, upstream, added, changed, removed, unchanged, rebuild_env):
+        self.worker_dir = worker_dir
+        self.upstream = upstream          # {relpath: sha} of the new version
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.unchanged = unchanged
+        self.rebuild_env = rebuild_env
+
+    @property
+    def up_to_date(self):
+        return not (self.added or self.changed or self.removed or self.rebuild_env)
+
+    def summary(self):
+        text = (f"{len(self.changed)} changed, {len(self.added)} new, {len(self.removed)} removed, "
+                f"{self.unchanged} unchanged")
+        return text + ("; the Python environment will be rebuilt" if self.rebuild_env else "")
+
+
+def load_manifest(worker_dir):
+    """ The upstream files installed by the last update, or None if the folder was never updated. """
+    try:
+        with open(os.path.join(worker_dir, MANIFEST_FILE_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def plan_update(worker_dir, upstream):
+    """ Compares a worker folder with the upstream tree {relpath: sha}. """
+    upstream = {path: sha for path, sha in upstream.items() if not is_preserved(path)}
+    added, changed, unchanged = [], [], 0
+    for relpath, sha in sorted(upstream.items()):
+        local_path = os.path.join(worker_dir, relpath)
+        if not os.path.isfile(local_path):
+            added.append(relpath)
+        elif file_blob_sha(local_path) != sha:
+            changed.append(relpath)
+        else:
+            unchanged += 1
+    # Only files a previous update installed are removed; anything else in the folder may be the user's
+    previous = load_manifest(worker_dir) or {}
+    removed = sorted(path for path in previous if path not in upstream and os.path.isfile(os.path.join(worker_dir, path)))
+    touched = set(added) | set(changed) | set(removed)
+    rebuild_env = (any(os.path.basename(path) in REQUIREMENTS_FILES for path in touched)
+                   or not os.path.isdir(os.path.join(worker_dir, "env")))
+    return UpdatePlan(worker_dir, upstream, added, changed, removed, unchanged, rebuild_env)
+
+
+def download(source, plans, on_progress=lambda message: None, cache=None):
+    """
+    Downloads every blob the plans need once (instances share most files) and verifies its hash.
+    Blobs already in the artifact cache (e.g. a shared one another machine filled) are read from it.
+    Returns {sha: content}. Raises RuntimeError if a download does not match the listing.
+    """
+    needed = {}
+    for plan in plans:
+        for relpath in plan.added + plan.changed:
+            needed.setdefault(plan.upstream[relpath], relpath)
+    blobs = {}
+    for count, (sha, relpath) in enumerate(sorted(needed.items(), key=lambda item: item[1]), start=1):
+        cached = cache and cache.get(f"git-blob:{sha}")
+        if cached:
+            with open(cached, "rb") as f:
+                data = f.read()
+            if git_blob_sha(data) == sha:
+                blobs[sha] = data
+                continue
+        on_progress(f"Downloading {relpath} ({count}/{len(needed)})")
+        data = source.fetch(relpath)
+        if git_blob_sha(data) != sha:
+            raise RuntimeError(f"{relpath} does not match the upstream listing (got {git_blob_sha(data)[:10]}, expected {sha[:10]})")
+        blobs[sha] = data
+        if cache:
+            cache.put_bytes(f"git-blob:{sha}", data)
+    return blobs
+
+
+def apply_update(plan, blobs):
+    """
+    Writes the new and changed files into a staging folder first, then moves them into place, so the
+    worker folder is only touched once everything needed is on disk.
+    """
+    staging = os.path.join(plan.worker_dir, STAGING_DIR_NAME)
+    shutil.rmtree(staging, ignore_errors=True)
+    for relpath in plan.added + plan.changed:
+        staged = os.path.join(staging, relpath)
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        with open(staged, "wb") as f:
+            f.write(blobs[plan.upstream[relpath]])
+    for relpath in plan.added + plan.changed:
+        target = os.path.join(plan.worker_dir, relpath)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(staging, relpath), target)
+    for relpath in plan.removed:
+        os.remove(os.path.join(plan.worker_dir, relpath))
+    shutil.rmtree(staging, ignore_errors=True)
+
+    manifest_path = os.path.join(plan.worker_dir, MANIFEST_FILE_NAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(plan.upstream, f, indent=1, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def rebuild_env_command(worker_dir, wheel_dir=None):
+    """
+    Shell command (run inside MSYS2, from the worker folder) that recreates the Python environment.
+    With wheel_dir (an MSYS2 path) the wheels are refreshed there when online and installed from there.
+    """
+    packages = "requests"
+    if os.path.isfile(os.path.join(worker_dir, "requirements.txt")):
+        packages += " -r requirements.txt"
+    pip = "env/bin/python3 -m pip"
+    steps = ["rm -rf env", "python3 -m venv env"]
+    if wheel_dir:
+        steps.append(f"({pip} download -q --retries 1 --timeout 15 -d '{wheel_dir}' pip setuptools wheel {packages} || true)")
+        pip += f" install -q --no-index --find-links '{wheel_dir}'"
+    else:
+        pip += " install -q"
+    steps += [f"{pip} --upgrade pip setuptools wheel", f"{pip} {packages}"]
+    return " && ".join(steps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental update of an installed fishtest worker.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    manifest_parser = commands.add_parser("manifest", help="Print a GitHub-style tree.json for a fishtest checkout")
+    manifest_parser.add_argument("directory", help="Folder that contains the 'worker' folder")
+    for name in ("plan", "apply"):
+        command_parser = commands.add_parser(name, help=f"{name.capitalize()} the update of a worker folder")
+        command_parser.add_argument("worker_dir")
+        command_parser.add_argument("--source", default="", help="Local worker folder or stand-in URL (default: GitHub)")
+    args = parser.parse_args()
+
+    if args.command == "manifest":
+        tree = directory_tree(os.path.join(args.directory, UPSTREAM_PREFIX), prefix=UPSTREAM_PREFIX)
+        print(json.dumps({"tree": [{"path": path, "type": "blob", "sha": sha} for path, sha in sorted(tree.items())],
+                          "truncated": False}, indent=1))
+        return
+
+    source = source_from_spec(args.source)
+    plan = plan_update(os.path.abspath(args.worker_dir), source.tree())
+    print(f"{plan.worker_dir}: {plan.summary()}")
+    for label, paths in (("changed", plan.changed), ("new", plan.added), ("removed", plan.removed)):
+        for path in paths:
+            print(f"  {label:<8} {path}")
+    if args.command == "apply" and not plan.up_to_date:
+        apply_update(plan, download(source, [plan], on_progress=print))
+        if plan.rebuild_env:
+            print(f"Rebuild the environment from MSYS2: {rebuild_env_command(plan.worker_dir)}")
+
+
+if __name__ == "__main__":
+    main()